@@ -0,0 +1,247 @@
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import degrees
+import queries
+import snapshot
+import util
+from graph import Graph
+
+# Frontier classes compared by the frontier benchmark
+FRONTIERS = {
+    "StackFrontier": util.StackFrontier,
+    "QueueFrontier": util.QueueFrontier,
+    "DequeStackFrontier": util.DequeStackFrontier,
+    "DequeQueueFrontier": util.DequeQueueFrontier,
+}
+
+# List-backed frontiers are quadratic, so only run them on small sizes
+LIST_FRONTIERS = {"StackFrontier", "QueueFrontier"}
+
+
+def parse_args(argv):
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="benchmark.py")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    search = subparsers.add_parser("search", help="compare search algorithms")
+    search.add_argument("directory", nargs="?", default="large")
+    search.add_argument("--pairs", type=int, default=100,
+                        help="number of random person pairs to query")
+    search.add_argument("--seed", type=int, default=0)
+
+    parallel = subparsers.add_parser(
+        "parallel", help="compare process pool sizes for many queries")
+    parallel.add_argument("directory", nargs="?", default="large")
+    parallel.add_argument("--search", choices=sorted(degrees.SEARCHES), default="csr")
+    parallel.add_argument("--pairs", type=int, default=1000)
+    parallel.add_argument("--seed", type=int, default=0)
+    parallel.add_argument("--processes", type=int, nargs="+",
+                          default=[1, 2, os.cpu_count() or 1])
+
+    names = subparsers.add_parser("names", help="time name index lookups")
+    names.add_argument("directory", nargs="?", default="large")
+    names.add_argument("--queries", type=int, default=100)
+    names.add_argument("--distance", type=int, default=2)
+    names.add_argument("--seed", type=int, default=0)
+
+    startup = subparsers.add_parser("startup", help="compare dataset load times")
+    startup.add_argument("directory", nargs="?", default="large")
+
+    memory = subparsers.add_parser("memory", help="compare dataset memory use")
+    memory.add_argument("directory", nargs="?", default="large")
+
+    frontiers = subparsers.add_parser("frontiers", help="compare frontier classes")
+    frontiers.add_argument("--sizes", type=int, nargs="+",
+                           default=[10 ** 5, 10 ** 6],
+                           help="number of nodes pushed through each frontier")
+    frontiers.add_argument("--list-limit", type=int, default=20000,
+                           help="largest size run on list-backed frontiers")
+    return parser.parse_args(argv)
+
+
+def random_pairs(n, seed):
+    """
+    Returns `n` random (source, target) person id pairs.
+    """
+    rng = random.Random(seed)
+    if degrees.graph is not None:
+        person_ids = list(degrees.graph.person_ids)
+    else:
+        person_ids = sorted(degrees.people)
+    return [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(n)]
+
+
+def time_search(search, pairs):
+    """
+    Runs `search` on every pair and returns the elapsed time
+    together with the path lengths found.
+    """
+    lengths = []
+    start = time.perf_counter()
+    for source, target in pairs:
+        path = search(source, target)
+        lengths.append(None if path is None else len(path))
+    return time.perf_counter() - start, lengths
+
+
+def time_frontier(frontier_class, size):
+    """
+    Adds `size` nodes to a frontier, checking membership of each state
+    before adding it, then removes them all. Returns the elapsed time.
+    """
+    nodes = [util.Node(state=i, parent=None, action=None) for i in range(size)]
+    start = time.perf_counter()
+    frontier = frontier_class()
+    for node in nodes:
+        if not frontier.contains_state(node.state):
+            frontier.add(node)
+    while not frontier.empty():
+        frontier.remove()
+    return time.perf_counter() - start
+
+
+def benchmark_frontiers(args):
+    for size in args.sizes:
+        for name, frontier_class in FRONTIERS.items():
+            if name in LIST_FRONTIERS and size > args.list_limit:
+                print(f"{name}: skipped for {size} nodes")
+                continue
+            elapsed = time_frontier(frontier_class, size)
+            print(f"{name}: {elapsed:.4f}s for {size} nodes "
+                  f"({size / elapsed:,.0f} nodes/s)")
+
+
+def benchmark_search(args):
+    print("Loading data...")
+    degrees.load_data(args.directory)
+    degrees.load_graph(args.directory)
+    degrees.load_landmarks(args.directory)
+    print("Data loaded.")
+
+    pairs = random_pairs(args.pairs, args.seed)
+    baseline = None
+    for name, search in degrees.SEARCHES.items():
+        elapsed, lengths = time_search(search, pairs)
+        if baseline is None:
+            baseline = lengths
+        elif lengths != baseline:
+            sys.exit(f"{name}: path lengths differ from {next(iter(degrees.SEARCHES))}")
+        print(f"{name}: {elapsed:.4f}s for {len(pairs)} pairs "
+              f"({elapsed / len(pairs) * 1000:.3f} ms/query)")
+
+
+def traced_memory(load, directory):
+    """
+    Returns the elapsed time and memory in bytes held by the
+    result of `load(directory)`.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = load(directory)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return elapsed, size
+
+
+def load_dicts(directory):
+    degrees.load_data(directory)
+    return degrees.names, degrees.people, degrees.movies
+
+
+def benchmark_memory(args):
+    for name, load in (("dicts", load_dicts), ("csr", Graph.from_csv)):
+        elapsed, size = traced_memory(load, args.directory)
+        print(f"{name}: {size / 2 ** 20:.1f} MiB loaded in {elapsed:.2f}s")
+
+
+def benchmark_parallel(args):
+    print("Loading data...")
+    degrees.load(args.directory, args.search)
+    print("Data loaded.")
+
+    pairs = random_pairs(args.pairs, args.seed)
+    search = degrees.SEARCHES[args.search]
+    start = time.perf_counter()
+    expected = [search(source, target) for source, target in pairs]
+    serial = time.perf_counter() - start
+    print(f"serial: {serial:.3f}s ({len(pairs) / serial:,.0f} queries/s)")
+
+    for processes in args.processes:
+        start = time.perf_counter()
+        paths = queries.solve_many(pairs, args.directory, args.search, processes)
+        elapsed = time.perf_counter() - start
+        if paths != expected:
+            sys.exit(f"{processes} processes: paths differ from serial search")
+        print(f"{processes} processes: {elapsed:.3f}s "
+              f"({len(pairs) / elapsed:,.0f} queries/s, {serial / elapsed:.2f}x)")
+
+
+def misspell(name, rng):
+    """
+    Returns `name` with one random character replaced.
+    """
+    i = rng.randrange(len(name))
+    return name[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + name[i + 1:]
+
+
+def benchmark_names(args):
+    print("Loading data...")
+    degrees.load_graph(args.directory)
+    lookup = degrees.name_lookup()
+    print("Data loaded.")
+
+    rng = random.Random(args.seed)
+    graph = degrees.graph
+    sample = [graph.person_names[rng.randrange(len(graph.person_ids))]
+              for _ in range(args.queries)]
+    for name, query in (
+        ("exact", lambda name: lookup.exact(name)),
+        ("prefix", lambda name: lookup.prefix(name[:3])),
+        ("fuzzy", lambda name: lookup.fuzzy(misspell(name, rng), args.distance)),
+    ):
+        start = time.perf_counter()
+        for person_name in sample:
+            query(person_name)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {elapsed / len(sample) * 1000:.3f} ms/query")
+
+
+def benchmark_startup(args):
+    path = os.path.join(args.directory, snapshot.SNAPSHOT_NAME)
+    if os.path.exists(path):
+        os.remove(path)
+    for name, load in (("csv", Graph.from_csv),
+                       ("snapshot build", snapshot.load),
+                       ("snapshot load", snapshot.load)):
+        start = time.perf_counter()
+        load(args.directory)
+        print(f"{name}: {time.perf_counter() - start:.3f}s")
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.benchmark == "frontiers":
+        benchmark_frontiers(args)
+    elif args.benchmark == "memory":
+        benchmark_memory(args)
+    elif args.benchmark == "names":
+        benchmark_names(args)
+    elif args.benchmark == "parallel":
+        benchmark_parallel(args)
+    elif args.benchmark == "startup":
+        benchmark_startup(args)
+    else:
+        benchmark_search(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
+import argparse
 import csv
 import sys
 
-from util import Node, QueueFrontier
+import landmarks
+import snapshot
+from lookup import NameLookup
+from util import Node, DequeQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,6 +16,18 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact CSR graph, loaded instead of `people` and `movies` for the csr search
+graph = None
+
+# Landmark BFS trees over `graph`, loaded for the landmarks search
+landmark_index = None
+
+# Prefix and fuzzy name index, built on first use by `name_lookup`
+lookup = None
+
+# Policies for choosing between several people with the same name
+AMBIGUITY_POLICIES = ("prompt", "most-movies", "none")
+
 
 def load_data(directory):
     """
@@ -52,24 +68,83 @@ def load_data(directory):
                 pass
 
 
+def load_graph(directory):
+    """
+    Load data into a compact CSR graph, memory-mapping a binary
+    snapshot of the CSV files when an up to date one exists.
+    """
+    global graph, names, lookup
+    graph = snapshot.load(directory)
+    names = graph.names
+    lookup = None
+
+
+def load_landmarks(directory, person_ids=None, count=landmarks.DEFAULT_COUNT):
+    """
+    Load BFS trees of landmark people over the CSR graph, building
+    and saving them on first use. Landmarks are the given person ids,
+    or else the `count` people starring in most movies.
+    """
+    global landmark_index
+    landmark_index = landmarks.load(graph, directory, person_ids, count)
+
+
+def load(directory, search, landmark_ids=None, landmark_count=landmarks.DEFAULT_COUNT):
+    """
+    Load data in the representation used by the named search.
+    """
+    if search == "csr":
+        load_graph(directory)
+    elif search == "landmarks":
+        load_graph(directory)
+        load_landmarks(directory, landmark_ids, landmark_count)
+    else:
+        load_data(directory)
+
+
+def parse_args(argv):
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="degrees.py")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument(
+        "--search", choices=sorted(SEARCHES), default="csr",
+        help="search algorithm used to find the shortest path"
+    )
+    parser.add_argument(
+        "--ambiguous", choices=AMBIGUITY_POLICIES, default="prompt",
+        help="how to choose between people with the same name"
+    )
+    parser.add_argument(
+        "--landmarks", nargs="+", metavar="PERSON_ID",
+        help="landmark people for the landmarks search"
+    )
+    parser.add_argument(
+        "--landmark-count", type=int, default=landmarks.DEFAULT_COUNT,
+        help="number of landmarks chosen when --landmarks is not given"
+    )
+    return parser.parse_args(argv)
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = parse_args(sys.argv[1:])
+    directory = args.directory
+    search = SEARCHES[args.search]
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load(directory, args.search, args.landmarks, args.landmark_count)
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    source = person_id_for_name(input("Name: "), args.ambiguous)
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_id_for_name(input("Name: "), args.ambiguous)
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = search(source, target)
 
     if path is None:
         print("Not connected.")
@@ -78,9 +153,9 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_record(path[i][1])["name"]
+            person2 = person_record(path[i + 1][1])["name"]
+            movie = movie_record(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
@@ -96,7 +171,7 @@ def shortest_path(source, target):
 
     # Initialize frontier and explored set
     source_node = Node(state=source, parent=None, action=None)
-    frontier = QueueFrontier()
+    frontier = DequeQueueFrontier()
     frontier.add(source_node)
     explored = set()
 
@@ -134,18 +209,131 @@ def shortest_path(source, target):
                 frontier.add(child)
 
 
-def person_id_for_name(name):
+def shortest_path_bidirectional(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, growing one frontier
+    from each end and stopping when they meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return list()
+
+    # Each side maps a visited person to the (movie_id, person_id) step
+    # leading back towards the side's origin
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+
+        # Expand a full level of the smaller frontier, so that the
+        # best meeting point found in that level is a shortest path
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, visited, other = forward_frontier, forward, backward
+        else:
+            frontier, visited, other = backward_frontier, backward, forward
+
+        next_frontier = []
+        meeting = None
+        for person_id in frontier:
+            for movie_id, neighbor_id in neighbors_for_person(person_id):
+                if neighbor_id in visited:
+                    continue
+                visited[neighbor_id] = (movie_id, person_id)
+                next_frontier.append(neighbor_id)
+                if neighbor_id in other and (
+                    meeting is None
+                    or path_length(other, neighbor_id) < path_length(other, meeting)
+                ):
+                    meeting = neighbor_id
+
+        if meeting is not None:
+            return join_paths(forward, backward, meeting)
+
+        if visited is forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+
+    return None
+
+
+def shortest_path_csr(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using the CSR graph.
+
+    If no possible path, returns None.
+    """
+    return graph.shortest_path(source, target)
+
+
+def shortest_path_landmarks(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using landmark BFS trees.
+
+    If no possible path, returns None.
+    """
+    return landmark_index.shortest_path(source, target)
+
+
+def path_length(visited, person_id):
+    """
+    Returns the number of steps from `person_id` back to the origin
+    of a search side.
+    """
+    length = 0
+    while visited[person_id] is not None:
+        person_id = visited[person_id][1]
+        length += 1
+    return length
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Returns the (movie_id, person_id) path from the forward origin
+    to the backward origin through `meeting`.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent_id = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path.append((movie_id, person_id))
+    return path
+
+
+def person_id_for_name(name, policy="prompt"):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    A trailing birth year, as in "Chris Evans (1981)", narrows down
+    the people considered. Remaining ambiguities are resolved by
+    `policy`: "prompt" asks which person is intended, "most-movies"
+    picks the person starring in most movies and "none" gives up.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = person_ids_for_name(name)
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
+        if policy == "most-movies":
+            return max(person_ids, key=movie_count)
+        elif policy == "none":
+            return None
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = person_record(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -160,6 +348,62 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def person_ids_for_name(name):
+    """
+    Returns the sorted IMDB ids of people with a name, narrowed down
+    by a trailing birth year in parentheses if there is one.
+    """
+    person_ids = names.get(name.lower(), set())
+    if not person_ids and name.endswith(")") and "(" in name:
+        name, _, birth = name[:-1].rpartition("(")
+        person_ids = {
+            person_id for person_id in names.get(name.strip().lower(), set())
+            if person_record(person_id)["birth"] == birth.strip()
+        }
+    return sorted(person_ids)
+
+
+def name_lookup():
+    """
+    Returns the prefix and fuzzy name index of the loaded people.
+    """
+    global lookup
+    if lookup is None:
+        if graph is not None:
+            lookup = NameLookup.from_graph(graph)
+        else:
+            lookup = NameLookup.from_names(names)
+    return lookup
+
+
+def movie_count(person_id):
+    """
+    Returns the number of movies a person starred in.
+    """
+    if graph is not None:
+        i = graph.person_index[person_id]
+        return graph.person_offsets[i + 1] - graph.person_offsets[i]
+    return len(people[person_id]["movies"])
+
+
+def person_record(person_id):
+    """
+    Returns a dictionary with the name and birth of a person.
+    """
+    if graph is not None:
+        return graph.person(person_id)
+    return people[person_id]
+
+
+def movie_record(movie_id):
+    """
+    Returns a dictionary with the title and year of a movie.
+    """
+    if graph is not None:
+        return graph.movie(movie_id)
+    return movies[movie_id]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
@@ -173,5 +417,14 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+# Search algorithms selectable from the command line
+SEARCHES = {
+    "bfs": shortest_path,
+    "bidirectional": shortest_path_bidirectional,
+    "csr": shortest_path_csr,
+    "landmarks": shortest_path_landmarks,
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,208 @@
+import csv
+from array import array
+
+
+class Graph():
+    """
+    Compact person <-> movie graph.
+
+    People and movies are interned to dense integer indices, and the
+    bipartite star relation is stored twice in compressed sparse row
+    form: `person_offsets`/`person_movies` lists the movies of each
+    person, and `movie_offsets`/`movie_stars` lists the stars of each
+    movie. The movies of person `i` are
+    `person_movies[person_offsets[i]:person_offsets[i + 1]]`.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 person_index=None, movie_index=None, names=None):
+        """
+        Build the graph from parallel per-person and per-movie sequences
+        and the CSR arrays. `person_index` and `movie_index` map ids
+        to indices and `names` maps lowercase names to sets of person
+        ids; they are built as dictionaries unless given.
+        """
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        if person_index is None:
+            person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        if movie_index is None:
+            movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        if names is None:
+            names = {}
+            for person_id, name in zip(person_ids, person_names):
+                names.setdefault(name.lower(), set()).add(person_id)
+        self.person_index = person_index
+        self.movie_index = movie_index
+        self.names = names
+
+    @classmethod
+    def from_stars(cls, person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years, star_people, star_movies):
+        """
+        Build a graph from parallel per-person and per-movie lists,
+        and parallel arrays of the person and movie index of each star.
+        """
+        person_offsets, person_movies = csr(len(person_ids), star_people, star_movies)
+        movie_offsets, movie_stars = csr(len(movie_ids), star_movies, star_people)
+        return cls(person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years,
+                   person_offsets, person_movies, movie_offsets, movie_stars)
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Load a graph from the people, movies and stars CSV files
+        in `directory`.
+        """
+        person_ids, person_names, person_births = [], [], []
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        star_people, star_movies = array("q"), array("q")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    person = person_index[row["person_id"]]
+                    movie = movie_index[row["movie_id"]]
+                except KeyError:
+                    continue
+                star_people.append(person)
+                star_movies.append(movie)
+
+        return cls.from_stars(person_ids, person_names, person_births,
+                              movie_ids, movie_titles, movie_years,
+                              star_people, star_movies)
+
+    @classmethod
+    def from_dicts(cls, people, movies):
+        """
+        Build a graph from the `people` and `movies` dictionaries
+        filled by `degrees.load_data`.
+        """
+        person_ids = list(people)
+        movie_ids = list(movies)
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        star_people, star_movies = array("q"), array("q")
+        for i, person_id in enumerate(person_ids):
+            for movie_id in people[person_id]["movies"]:
+                star_people.append(i)
+                star_movies.append(movie_index[movie_id])
+
+        return cls.from_stars(person_ids,
+                              [people[person_id]["name"] for person_id in person_ids],
+                              [people[person_id]["birth"] for person_id in person_ids],
+                              movie_ids,
+                              [movies[movie_id]["title"] for movie_id in movie_ids],
+                              [movies[movie_id]["year"] for movie_id in movie_ids],
+                              star_people, star_movies)
+
+    def person(self, person_id):
+        """
+        Returns a dictionary of name and birth for a person.
+        """
+        i = self.person_index[person_id]
+        return {"name": self.person_names[i], "birth": self.person_births[i]}
+
+    def movie(self, movie_id):
+        """
+        Returns a dictionary of title and year for a movie.
+        """
+        i = self.movie_index[movie_id]
+        return {"title": self.movie_titles[i], "year": self.movie_years[i]}
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, searching the
+        CSR arrays directly.
+
+        If no possible path, returns None.
+        """
+        if source == target:
+            return list()
+        source = self.person_index[source]
+        target = self.person_index[target]
+
+        person_offsets, person_movies = self.person_offsets, self.person_movies
+        movie_offsets, movie_stars = self.movie_offsets, self.movie_stars
+
+        # Parent person and connecting movie of every reached person.
+        # A movie only needs expanding once, since all its stars are
+        # reached the first time it is expanded.
+        parent_person = array("q", [-1]) * len(self.person_ids)
+        parent_movie = array("q", [-1]) * len(self.person_ids)
+        expanded_movies = bytearray(len(self.movie_ids))
+        parent_person[source] = source
+
+        queue = [source]
+        for person in queue:
+            for movie in person_movies[person_offsets[person]:person_offsets[person + 1]]:
+                if expanded_movies[movie]:
+                    continue
+                expanded_movies[movie] = 1
+                for star in movie_stars[movie_offsets[movie]:movie_offsets[movie + 1]]:
+                    if parent_person[star] != -1:
+                        continue
+                    parent_person[star] = person
+                    parent_movie[star] = movie
+                    if star == target:
+                        return self.trace_path(parent_person, parent_movie, source, target)
+                    queue.append(star)
+
+        return None
+
+    def trace_path(self, parent_person, parent_movie, source, target):
+        """
+        Returns the (movie_id, person_id) path from source to target
+        recorded in the parent arrays.
+        """
+        path = []
+        person = target
+        while person != source:
+            path.append((self.movie_ids[parent_movie[person]], self.person_ids[person]))
+            person = parent_person[person]
+        path.reverse()
+        return path
+
+
+def csr(size, rows, columns):
+    """
+    Returns (offsets, values) compressed sparse row arrays grouping
+    `columns` by their matching entry in `rows`, for rows 0 to size - 1.
+    """
+    offsets = array("q", [0]) * (size + 1)
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    position = offsets[:-1]
+    values = array("q", [0]) * len(columns)
+    for row, column in zip(rows, columns):
+        values[position[row]] = column
+        position[row] += 1
+    return offsets, values
@@ -0,0 +1,308 @@
+import heapq
+import math
+import os
+from array import array
+
+import snapshot
+
+# Bump whenever the landmark file layout changes
+MAGIC = b"LANDMARK"
+VERSION = 1
+
+LANDMARKS_NAME = ".degrees.landmarks"
+
+# Number of landmarks chosen when none are given
+DEFAULT_COUNT = 8
+
+
+class LandmarkIndex():
+    """
+    Single-source BFS trees over people for a set of landmark people.
+
+    `distances[k][i]` is the number of steps between landmark `k` and
+    person `i`, and `parents[k][i]` is the next person on a shortest
+    path from `i` towards landmark `k` (-1 if `i` is not connected).
+    """
+
+    def __init__(self, graph, landmarks, distances, parents):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.distances = distances
+        self.parents = parents
+        self.landmark_position = {person: k for k, person in enumerate(landmarks)}
+
+    @classmethod
+    def build(cls, graph, landmarks):
+        """
+        Build the BFS tree of every landmark person index.
+        """
+        distances, parents = [], []
+        for landmark in landmarks:
+            distance, parent = bfs_tree(graph, landmark)
+            distances.append(distance)
+            parents.append(parent)
+        return cls(graph, array("q", landmarks), distances, parents)
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        Queries from or to a landmark walk its BFS tree; other
+        queries search within bounds given by landmark distances.
+
+        If no possible path, returns None.
+        """
+        if source == target:
+            return list()
+        source = self.graph.person_index[source]
+        target = self.graph.person_index[target]
+
+        if source in self.landmark_position:
+            people = self.tree_path(self.landmark_position[source], target)
+            if people is not None:
+                people.reverse()
+        elif target in self.landmark_position:
+            people = self.tree_path(self.landmark_position[target], source)
+        else:
+            people = self.search(source, target)
+
+        return None if people is None else self.to_path(people)
+
+    def tree_path(self, k, person):
+        """
+        Returns the person indices from `person` up to landmark `k`,
+        or None if they are not connected.
+        """
+        parent = self.parents[k]
+        if parent[person] == -1:
+            return None
+        people = [person]
+        while person != self.landmarks[k]:
+            person = parent[person]
+            people.append(person)
+        return people
+
+    def search(self, source, target):
+        """
+        Returns the person indices of a shortest path from source to
+        target, or None if they are not connected.
+
+        For every landmark L, d(source, L) + d(L, target) is the length
+        of a path through L, and |d(L, source) - d(L, target)| is a
+        lower bound on d(source, target). The best path through a
+        landmark is returned unless the lower bounds leave room for a
+        strictly shorter path and a bidirectional search, cut off at
+        that length, finds one.
+        """
+        upper, route, lower = math.inf, None, 0
+        for k, distance in enumerate(self.distances):
+            from_source, to_target = distance[source], distance[target]
+            if (from_source == -1) != (to_target == -1):
+                # The landmark reaches exactly one of them
+                return None
+            if to_target != -1:
+                lower = max(lower, abs(from_source - to_target))
+                if from_source + to_target < upper:
+                    upper, route = from_source + to_target, k
+
+        if lower < upper:
+            people = self.bounded_search(source, target, upper)
+            if people is not None:
+                return people
+        if route is None:
+            return None
+
+        # No shorter path exists, so the route through the landmark is shortest
+        return self.tree_path(route, source) + self.tree_path(route, target)[-2::-1]
+
+    def bounded_search(self, source, target, upper):
+        """
+        Returns the person indices of a shortest path from source to
+        target shorter than `upper`, or None if there is none, growing
+        one breadth-first frontier from each end.
+        """
+        graph = self.graph
+        person_offsets, person_movies = graph.person_offsets, graph.person_movies
+        movie_offsets, movie_stars = graph.movie_offsets, graph.movie_stars
+
+        sides = []
+        for origin in (source, target):
+            depth = array("i", [-1]) * len(graph.person_ids)
+            parent = array("i", [-1]) * len(graph.person_ids)
+            depth[origin] = 0
+            parent[origin] = origin
+            sides.append({
+                "depth": depth,
+                "parent": parent,
+                "expanded_movies": bytearray(len(graph.movie_ids)),
+                "frontier": [origin],
+                "level": 0,
+            })
+        forward, backward = sides
+
+        # Stop once no strictly shorter path than `upper` can be found
+        while (forward["frontier"] and backward["frontier"]
+               and forward["level"] + backward["level"] + 1 < upper):
+
+            # Expand a full level of the smaller frontier
+            if len(forward["frontier"]) <= len(backward["frontier"]):
+                side, other = forward, backward
+            else:
+                side, other = backward, forward
+            depth, parent = side["depth"], side["parent"]
+            expanded_movies, other_depth = side["expanded_movies"], other["depth"]
+            level = side["level"] + 1
+
+            best, meeting = upper, None
+            next_frontier = []
+            for person in side["frontier"]:
+                for movie in person_movies[person_offsets[person]:person_offsets[person + 1]]:
+                    if expanded_movies[movie]:
+                        continue
+                    expanded_movies[movie] = 1
+                    for star in movie_stars[movie_offsets[movie]:movie_offsets[movie + 1]]:
+                        if depth[star] != -1:
+                            continue
+                        depth[star] = level
+                        parent[star] = person
+                        next_frontier.append(star)
+                        if other_depth[star] != -1 and level + other_depth[star] < best:
+                            best, meeting = level + other_depth[star], star
+
+            if meeting is not None:
+                people = self.walk(forward["parent"], meeting)
+                people.reverse()
+                return people + self.walk(backward["parent"], meeting)[1:]
+            side["frontier"] = next_frontier
+            side["level"] = level
+
+        return None
+
+    def walk(self, parent, person):
+        """
+        Returns the person indices from `person` back to the origin
+        of a parent array.
+        """
+        people = [person]
+        while parent[person] != person:
+            person = parent[person]
+            people.append(person)
+        return people
+
+    def to_path(self, people):
+        """
+        Returns the (movie_id, person_id) path along a list of person
+        indices, choosing a movie shared by each consecutive pair.
+        """
+        graph = self.graph
+        path = []
+        for previous, person in zip(people, people[1:]):
+            movies = set(graph.person_movies[
+                graph.person_offsets[person]:graph.person_offsets[person + 1]])
+            movie = next(
+                movie for movie in graph.person_movies[
+                    graph.person_offsets[previous]:graph.person_offsets[previous + 1]]
+                if movie in movies
+            )
+            path.append((graph.movie_ids[movie], graph.person_ids[person]))
+        return path
+
+
+def bfs_tree(graph, source):
+    """
+    Returns (distance, parent) arrays of a breadth-first search over
+    people from person index `source`.
+    """
+    distance = array("i", [-1]) * len(graph.person_ids)
+    parent = array("i", [-1]) * len(graph.person_ids)
+    expanded_movies = bytearray(len(graph.movie_ids))
+    distance[source] = 0
+    parent[source] = source
+
+    queue = [source]
+    for person in queue:
+        for movie in graph.person_movies[
+                graph.person_offsets[person]:graph.person_offsets[person + 1]]:
+            if expanded_movies[movie]:
+                continue
+            expanded_movies[movie] = 1
+            for star in graph.movie_stars[
+                    graph.movie_offsets[movie]:graph.movie_offsets[movie + 1]]:
+                if distance[star] == -1:
+                    distance[star] = distance[person] + 1
+                    parent[star] = person
+                    queue.append(star)
+    return distance, parent
+
+
+def busiest_people(graph, count):
+    """
+    Returns the indices of the `count` people starring in most movies.
+    """
+    offsets = graph.person_offsets
+    return sorted(heapq.nlargest(count, range(len(graph.person_ids)),
+                                 key=lambda i: offsets[i + 1] - offsets[i]))
+
+
+def write_index(index, path, key):
+    """
+    Write the BFS trees of a landmark index to `path` tagged with `key`.
+    """
+    sections = [array("q", index.landmarks).tobytes()]
+    for distance, parent in zip(index.distances, index.parents):
+        sections.append(array("i", distance).tobytes())
+        sections.append(array("i", parent).tobytes())
+    snapshot.write_sections(path, MAGIC, VERSION, key, sections)
+
+
+def read_index(graph, path, key, landmarks):
+    """
+    Memory-map the landmark index at `path`.
+
+    Returns None if the file is missing, stale, corrupt or was built
+    for different landmarks.
+    """
+    mapped = snapshot.read_sections(path, MAGIC, VERSION, key)
+    if mapped is None:
+        return None
+    buffer, sections = mapped
+    try:
+        stored = sections[0].cast("q")
+        trees = [section.cast("i") for section in sections[1:]]
+    except (IndexError, TypeError, ValueError):
+        return None
+    if (list(stored) != list(landmarks) or len(trees) != 2 * len(landmarks)
+            or any(len(tree) != len(graph.person_ids) for tree in trees)):
+        return None
+
+    index = LandmarkIndex(graph, stored, trees[0::2], trees[1::2])
+
+    # Keep the mapping open for as long as the index is alive
+    index.mapping = buffer
+    return index
+
+
+def load(graph, directory, person_ids=None, count=DEFAULT_COUNT):
+    """
+    Load the landmark index for `directory`, building and saving it
+    if missing or out of date. Landmarks are the given person ids,
+    or else the `count` people starring in most movies.
+    """
+    if person_ids:
+        landmarks = sorted(graph.person_index[person_id] for person_id in person_ids)
+    else:
+        landmarks = busiest_people(graph, count)
+
+    path = os.path.join(directory, LANDMARKS_NAME)
+    key = snapshot.source_key(directory)
+    index = read_index(graph, path, key, landmarks)
+    if index is not None:
+        return index
+
+    index = LandmarkIndex.build(graph, landmarks)
+    try:
+        write_index(index, path, key)
+    except OSError:
+        pass
+    return index
@@ -0,0 +1,165 @@
+import bisect
+import os
+
+
+class NameLookup():
+    """
+    Exact, prefix and bounded edit distance lookup of people by name.
+
+    Works over `keys`, a sorted sequence of lowercase names that may
+    repeat one name for several people, where `person_id_at(i)` is the
+    id of the person named `keys[i]`. `reversed_keys` and
+    `reversed_person_id_at` are the same for the reversed names.
+    """
+
+    def __init__(self, keys, person_id_at, reversed_keys, reversed_person_id_at):
+        self.keys = keys
+        self.person_id_at = person_id_at
+        self.reversed_keys = reversed_keys
+        self.reversed_person_id_at = reversed_person_id_at
+
+    @classmethod
+    def from_names(cls, names):
+        """
+        Build a lookup from a dictionary of lowercase names
+        to sets of person ids.
+        """
+        entries = sorted((name, person_id)
+                         for name in names for person_id in names[name])
+        reversed_entries = sorted((name[::-1], person_id) for name, person_id in entries)
+        return cls([name for name, _ in entries],
+                   [person_id for _, person_id in entries].__getitem__,
+                   [name for name, _ in reversed_entries],
+                   [person_id for _, person_id in reversed_entries].__getitem__)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Build a lookup over the people of a CSR graph, reusing the
+        sorted name permutation of a memory-mapped snapshot.
+        """
+        if isinstance(graph.names, dict):
+            return cls.from_names(graph.names)
+        names, person_ids = graph.names, graph.person_ids
+        return cls(names.keys, lambda i: person_ids[names.order[i]],
+                   names.reversed_keys, lambda i: person_ids[names.reversed_order[i]])
+
+    def exact(self, name):
+        """
+        Returns the set of ids of people with exactly this name,
+        ignoring case.
+        """
+        name = name.lower()
+        i = bisect.bisect_left(self.keys, name)
+        person_ids = set()
+        while i < len(self.keys) and self.keys[i] == name:
+            person_ids.add(self.person_id_at(i))
+            i += 1
+        return person_ids
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` (name, person_ids) pairs for the names
+        starting with `prefix`, in alphabetical order.
+        """
+        prefix = prefix.lower()
+        matches = []
+        i = bisect.bisect_left(self.keys, prefix)
+        while i < len(self.keys) and self.keys[i].startswith(prefix):
+            name = self.keys[i]
+            if matches and matches[-1][0] == name:
+                matches[-1][1].add(self.person_id_at(i))
+            elif len(matches) == limit:
+                break
+            else:
+                matches.append((name, {self.person_id_at(i)}))
+            i += 1
+        return matches
+
+    def fuzzy(self, name, max_distance=2, limit=10):
+        """
+        Returns up to `limit` (distance, name, person_ids) triples for
+        the names within `max_distance` edits of `name`, closest first.
+
+        If a name is within k edits of the query, one half of the query
+        matches the corresponding part of the name within k // 2 edits.
+        The sorted names are walked forwards anchored on the first half
+        of the query, and the reversed names anchored on the second.
+        """
+        query = name.lower()
+        half = len(query) // 2
+        budget = max_distance // 2
+        matches = {}
+        walk(self.keys, self.person_id_at, query,
+             max_distance, half, budget, matches, False)
+        walk(self.reversed_keys, self.reversed_person_id_at, query[::-1],
+             max_distance, len(query) - half, budget, matches, True)
+
+        ranked = sorted((distance, key, person_ids)
+                        for key, (distance, person_ids) in matches.items())
+        return ranked[:limit]
+
+
+def walk(keys, person_id_at, query, max_distance, anchor, budget, matches, reverse):
+    """
+    Adds to `matches` the keys within `max_distance` edits of `query`
+    whose start matches `query[:anchor]` within `budget` edits, mapping
+    each key (reversed back if `reverse`) to its distance and ids.
+
+    Walks the sorted keys as an implicit trie, sharing edit distance
+    rows between keys with a common prefix and skipping every key
+    under a prefix that can no longer match.
+    """
+    rows = [list(range(len(query) + 1))]
+    anchored = [anchor <= budget]
+    previous = ""
+
+    i = 0
+    while i < len(keys):
+        key = keys[i]
+        common = len(os.path.commonprefix([previous[:len(rows) - 1], key]))
+        del rows[common + 1:]
+        del anchored[common + 1:]
+        previous = key
+
+        for depth in range(common, len(key)):
+            row = edit_row(rows[-1], key[depth], query)
+            rows.append(row)
+            anchored.append(anchored[-1] or row[anchor] <= budget)
+            if min(row) > max_distance or (
+                    not anchored[-1] and min(row[:anchor + 1]) > budget):
+                i = skip_prefix(keys, key[:depth + 1], i)
+                break
+        else:
+            distance = rows[-1][-1]
+            if distance <= max_distance:
+                name = key[::-1] if reverse else key
+                matches.setdefault(name, (distance, set()))[1].add(person_id_at(i))
+            i += 1
+
+
+def edit_row(row, char, query):
+    """
+    Returns the next row of the Levenshtein table between `query` and
+    a name, given the row for the name's prefix and its next character.
+    """
+    next_row = [row[0] + 1]
+    for j, query_char in enumerate(query, 1):
+        next_row.append(min(next_row[j - 1] + 1, row[j] + 1,
+                            row[j - 1] + (query_char != char)))
+    return next_row
+
+
+def skip_prefix(keys, prefix, start):
+    """
+    Returns the position of the first key after `start`
+    that does not begin with `prefix`.
+    """
+    low, high = start, len(keys)
+    while low < high:
+        middle = (low + high) // 2
+        if keys[middle].startswith(prefix) or keys[middle] < prefix:
+            low = middle + 1
+        else:
+            high = middle
+    return low
@@ -0,0 +1,328 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+
+# Most names a /names request returns, and most edits it allows
+MAX_NAMES = 100
+MAX_DISTANCE = 4
+
+
+def parse_args(argv):
+    """
+    Parse command line arguments.
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("directory", nargs="?", default="large")
+    common.add_argument(
+        "--search", choices=sorted(degrees.SEARCHES), default="csr",
+        help="search algorithm used to find the shortest path"
+    )
+    common.add_argument(
+        "--ambiguous", choices=("error", "most-movies"), default="error",
+        help="how to choose between people with the same name"
+    )
+
+    parser = argparse.ArgumentParser(prog="queries.py")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    batch = subparsers.add_parser(
+        "batch", parents=[common],
+        help="answer source,target name pairs read as CSV")
+    batch.add_argument("--input", default="-",
+                       help="CSV file of name pairs, or - for stdin")
+    batch.add_argument("--processes", type=int, default=1,
+                       help="number of worker processes answering queries")
+
+    serve = subparsers.add_parser(
+        "serve", parents=[common],
+        help="answer GET /path?source=...&target=... and "
+             "/names?prefix=... or /names?fuzzy=... over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8050)
+    return parser.parse_args(argv)
+
+
+def resolve(name, policy="error"):
+    """
+    Returns the person id for a name without prompting, choosing
+    between people with the same name according to `policy`.
+    Raises LookupError if the name is unknown, or ambiguous under
+    the "error" policy.
+    """
+    person_ids = degrees.person_ids_for_name(name)
+    if len(person_ids) == 0:
+        suggestions = [
+            degrees.person_record(min(person_ids))["name"]
+            for _, _, person_ids in degrees.name_lookup().fuzzy(name, limit=3)
+        ]
+        hint = f" (did you mean {' or '.join(suggestions)}?)" if suggestions else ""
+        raise LookupError(f"person not found: {name}{hint}")
+    elif len(person_ids) > 1 and policy == "error":
+        raise LookupError(f"ambiguous name: {name} ({', '.join(person_ids)})")
+    return max(person_ids, key=degrees.movie_count)
+
+
+def answer(source_name, target_name, search, policy="error"):
+    """
+    Returns a JSON-serializable result for a query between two names,
+    including its latency.
+    """
+    start = time.perf_counter()
+    result = {"source": source_name, "target": target_name}
+    try:
+        source = resolve(source_name, policy)
+        target = resolve(target_name, policy)
+    except LookupError as e:
+        result["error"] = str(e)
+    else:
+        path = search(source, target)
+        result["degrees"] = None if path is None else len(path)
+        result["path"] = None if path is None else [
+            {"movie_id": movie_id,
+             "movie": degrees.movie_record(movie_id)["title"],
+             "person_id": person_id,
+             "person": degrees.person_record(person_id)["name"]}
+            for movie_id, person_id in path
+        ]
+    result["latency_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+class Stats():
+    """
+    Counts answered queries, their total latency and the time spent
+    answering them. Queries per second are over the time spent
+    answering, so a server's idle time does not count.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.latency_ms = 0
+        self.busy_s = 0
+
+    def record(self, result, seconds=None):
+        """
+        Count a result that took `seconds` to answer, its latency
+        unless given.
+        """
+        self.queries += 1
+        self.latency_ms += result["latency_ms"]
+        self.busy_s += result["latency_ms"] / 1000 if seconds is None else seconds
+
+    def summary(self):
+        return {
+            "queries": self.queries,
+            "elapsed_s": time.perf_counter() - self.start,
+            "busy_s": self.busy_s,
+            "queries_per_second": self.queries / self.busy_s if self.busy_s else 0,
+            "mean_latency_ms": self.latency_ms / self.queries if self.queries else 0,
+        }
+
+
+def answer_row(row, search, policy="error"):
+    """
+    Returns the result for a (source, target) CSV row.
+    """
+    if len(row) != 2:
+        return {"row": row, "error": "expected source,target", "latency_ms": 0}
+    return answer(row[0], row[1], search, policy)
+
+
+def bounded_int(query, name, default, low, high):
+    """
+    Returns the integer query parameter `name`, or `default` if
+    missing, capped at `high`. Raises ValueError if it is not an
+    integer or is below `low`.
+    """
+    value = int(query.get(name, [default])[0])
+    if value < low:
+        raise ValueError(f"{name} must be at least {low}")
+    return min(value, high)
+
+
+def lookup_names(query):
+    """
+    Returns matching names for a /names request, by prefix or by
+    bounded edit distance. Raises ValueError for an invalid limit
+    or distance.
+    """
+    lookup = degrees.name_lookup()
+    limit = bounded_int(query, "limit", 10, 1, MAX_NAMES)
+    if "prefix" in query:
+        matches = [(None, name, person_ids) for name, person_ids
+                   in lookup.prefix(query["prefix"][0], limit)]
+    else:
+        distance = bounded_int(query, "distance", 2, 0, MAX_DISTANCE)
+        matches = lookup.fuzzy(query["fuzzy"][0], distance, limit)
+    return [
+        {"name": degrees.person_record(person_id)["name"],
+         "person_id": person_id,
+         "birth": degrees.person_record(person_id)["birth"],
+         "distance": distance}
+        for distance, _, person_ids in matches
+        for person_id in sorted(person_ids)
+    ]
+
+
+# Search and ambiguity policy used by pool worker processes,
+# set by `init_worker`
+worker_search = None
+worker_policy = "error"
+
+
+def init_worker(directory, search, policy="error"):
+    """
+    Prepare a pool worker. Forked workers share the parent's loaded
+    data copy-on-write, so data is only loaded if it is missing.
+    """
+    global worker_search, worker_policy
+    if degrees.graph is None and not degrees.people:
+        degrees.load(directory, search)
+    worker_search = degrees.SEARCHES[search]
+    worker_policy = policy
+
+
+def worker_answer_row(row):
+    return answer_row(row, worker_search, worker_policy)
+
+
+def worker_shortest_path(pair):
+    return worker_search(*pair)
+
+
+def make_pool(directory, search, processes=None, policy="error"):
+    """
+    Returns a process pool whose workers answer queries with the
+    named search over the dataset in `directory`.
+
+    Workers are forked where possible so that the already loaded
+    graph is shared read-only instead of being loaded again.
+    """
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    context = multiprocessing.get_context(start_method)
+    return context.Pool(processes, initializer=init_worker,
+                        initargs=(directory, search, policy))
+
+
+def solve_many(pairs, directory, search, processes=None, chunksize=16):
+    """
+    Returns the shortest paths for a list of (source, target) person
+    id pairs, computed in parallel by a process pool, in input order.
+    """
+    with make_pool(directory, search, processes) as pool:
+        return pool.map(worker_shortest_path, pairs, chunksize)
+
+
+def run_batch(rows, search, output, pool=None, chunksize=16, policy="error"):
+    """
+    Answers every (source, target) row, writing one JSON line per
+    result to `output` in input order. Rows are answered by `pool`
+    workers if given. Returns the batch statistics.
+    """
+    stats = Stats()
+    rows = (row for row in rows if row)
+    if pool is None:
+        results = (answer_row(row, search, policy) for row in rows)
+    else:
+        results = pool.imap(worker_answer_row, rows, chunksize)
+    # Workers answer in parallel, so the batch is timed as a whole
+    # rather than by adding up latencies
+    last = time.perf_counter()
+    for result in results:
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        now = time.perf_counter()
+        stats.record(result, now - last)
+        last = now
+    return stats
+
+
+def make_handler(search, stats, policy="error"):
+    """
+    Returns an HTTP request handler class answering queries with `search`.
+    """
+
+    class QueryHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query, keep_blank_values=True)
+            if url.path == "/stats":
+                self.send_json(200, stats.summary())
+            elif url.path == "/path" and "source" in query and "target" in query:
+                result = answer(query["source"][0], query["target"][0], search, policy)
+                stats.record(result)
+                self.send_json(200 if "error" not in result else 404, result)
+            elif url.path == "/names" and ("prefix" in query or "fuzzy" in query):
+                try:
+                    self.send_json(200, lookup_names(query))
+                except ValueError:
+                    self.send_json(400, {"error": "limit must be a positive integer "
+                                                  "and distance a non-negative one"})
+            else:
+                self.send_json(400, {"error": "expected /path?source=...&target=..., "
+                                              "/names?prefix=..., /names?fuzzy=... or /stats"})
+
+        def send_json(self, status, body):
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    return QueryHandler
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    search = degrees.SEARCHES[args.search]
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load(args.directory, args.search)
+    print("Data loaded.", file=sys.stderr)
+
+    if args.mode == "batch":
+        pool = None
+        if args.processes > 1:
+            pool = make_pool(args.directory, args.search, args.processes, args.ambiguous)
+        try:
+            if args.input == "-":
+                rows = csv.reader(sys.stdin)
+                stats = run_batch(rows, search, sys.stdout, pool, policy=args.ambiguous)
+            else:
+                with open(args.input, encoding="utf-8", newline="") as f:
+                    rows = csv.reader(f)
+                    stats = run_batch(rows, search, sys.stdout, pool, policy=args.ambiguous)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        print(json.dumps(stats.summary()), file=sys.stderr)
+    else:
+        stats = Stats()
+        handler = make_handler(search, stats, args.ambiguous)
+        server = HTTPServer((args.host, args.port), handler)
+        print(f"Serving on http://{args.host}:{server.server_port}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            print(json.dumps(stats.summary()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import zlib
+from array import array
+
+from graph import Graph
+
+# Bump whenever the snapshot layout changes
+MAGIC = b"DEGREES\0"
+VERSION = 2
+
+SNAPSHOT_NAME = ".degrees.snapshot"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Magic, version, source key length, body length, body checksum
+HEADER = struct.Struct("<8sIIQI")
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as an offsets array
+    into a UTF-8 blob.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class SortedKeys():
+    """
+    Sequence view of `table` in the order given by `order`,
+    with an optional transform applied to every key.
+    """
+
+    def __init__(self, table, order, transform=None):
+        self.table = table
+        self.order = order
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        key = self.table[self.order[i]]
+        return key if self.transform is None else self.transform(key)
+
+
+class SortedIndex():
+    """
+    Read-only mapping from the strings of a table to their index,
+    answered by binary search over a sorted permutation.
+    """
+
+    def __init__(self, table, order):
+        self.order = order
+        self.keys = SortedKeys(table, order)
+
+    def __getitem__(self, key):
+        i = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            raise KeyError(key)
+        return self.order[i]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class NameIndex():
+    """
+    Read-only mapping from lowercase names to the set of matching
+    person ids, answered by binary search over a sorted permutation.
+    `reversed_order` sorts the reversed names, for suffix searches.
+    """
+
+    def __init__(self, person_names, person_ids, order, reversed_order):
+        self.person_ids = person_ids
+        self.order = order
+        self.reversed_order = reversed_order
+        self.keys = SortedKeys(person_names, order, str.lower)
+        self.reversed_keys = SortedKeys(person_names, reversed_order,
+                                        lambda name: name.lower()[::-1])
+
+    def get(self, name, default=None):
+        i = bisect.bisect_left(self.keys, name)
+        matches = set()
+        while i < len(self.keys) and self.keys[i] == name:
+            matches.add(self.person_ids[self.order[i]])
+            i += 1
+        return matches or default
+
+    def __getitem__(self, name):
+        matches = self.get(name)
+        if matches is None:
+            raise KeyError(name)
+        return matches
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+
+def source_key(directory):
+    """
+    Returns the size and modification time of each source CSV file,
+    used to detect a stale snapshot.
+    """
+    key = []
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        key.append([name, stat.st_size, stat.st_mtime_ns])
+    return json.dumps(key).encode()
+
+
+def write_snapshot(graph, path, key):
+    """
+    Write `graph` to a snapshot file at `path` tagged with `key`.
+    """
+    sections = []
+
+    def add_array(values):
+        sections.append(array("q", values).tobytes())
+
+    def add_strings(strings):
+        offsets = array("q", [0])
+        blob = bytearray()
+        for s in strings:
+            blob += s.encode("utf-8")
+            offsets.append(len(blob))
+        add_array(offsets)
+        sections.append(bytes(blob))
+
+    for values in (graph.person_offsets, graph.person_movies,
+                   graph.movie_offsets, graph.movie_stars):
+        add_array(values)
+    for strings in (graph.person_ids, graph.person_names, graph.person_births,
+                    graph.movie_ids, graph.movie_titles, graph.movie_years):
+        add_strings(strings)
+    add_array(sorted(range(len(graph.person_ids)), key=graph.person_ids.__getitem__))
+    add_array(sorted(range(len(graph.movie_ids)), key=graph.movie_ids.__getitem__))
+    add_array(sorted(range(len(graph.person_names)),
+                     key=lambda i: graph.person_names[i].lower()))
+    add_array(sorted(range(len(graph.person_names)),
+                     key=lambda i: graph.person_names[i].lower()[::-1]))
+    write_sections(path, MAGIC, VERSION, key, sections)
+
+
+def write_sections(path, magic, version, key, sections):
+    """
+    Write a list of byte sections to a file at `path`, with a header
+    holding `magic`, `version`, `key` and a checksum of the sections.
+    """
+    # Every section is prefixed with its length and padded to 8 bytes
+    body = bytearray()
+    for section in sections:
+        body += struct.pack("<Q", len(section))
+        body += section
+        body += bytes(-len(section) % 8)
+
+    header = HEADER.pack(magic, version, len(key), len(body), zlib.crc32(body))
+    padding = bytes(-(len(header) + len(key)) % 8)
+
+    # Write to a temporary file first so readers never see a partial file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(header + key + padding)
+        f.write(body)
+    os.replace(temporary, path)
+
+
+def read_snapshot(path, key):
+    """
+    Memory-map the snapshot at `path` and return it as a graph.
+
+    Returns None if the snapshot is missing, was built from different
+    source files, or is corrupt.
+    """
+    mapped = read_sections(path, MAGIC, VERSION, key)
+    if mapped is None:
+        return None
+    buffer, sections = mapped
+    sections = iter(sections)
+
+    def next_array():
+        return next(sections).cast("q")
+
+    def next_strings():
+        return StringTable(next_array(), next(sections))
+
+    try:
+        person_offsets, person_movies, movie_offsets, movie_stars = [
+            next_array() for _ in range(4)]
+        (person_ids, person_names, person_births,
+         movie_ids, movie_titles, movie_years) = [next_strings() for _ in range(6)]
+        (person_order, movie_order,
+         name_order, reversed_name_order) = [next_array() for _ in range(4)]
+    except (StopIteration, TypeError, ValueError):
+        return None
+    if next(sections, None) is not None:
+        return None
+
+    graph = Graph(person_ids, person_names, person_births,
+                  movie_ids, movie_titles, movie_years,
+                  person_offsets, person_movies, movie_offsets, movie_stars,
+                  person_index=SortedIndex(person_ids, person_order),
+                  movie_index=SortedIndex(movie_ids, movie_order),
+                  names=NameIndex(person_names, person_ids,
+                                  name_order, reversed_name_order))
+
+    # Keep the mapping open for as long as the graph is alive
+    graph.snapshot = buffer
+    return graph
+
+
+def read_sections(path, magic, version, key):
+    """
+    Memory-map a file written by `write_sections` and return the
+    mapping together with a list of memoryviews of its sections.
+
+    Returns None if the file is missing, has a different magic,
+    version or key, or is corrupt.
+    """
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        view = memoryview(buffer)
+        (file_magic, file_version, key_length,
+         body_length, checksum) = HEADER.unpack_from(view)
+        start = HEADER.size + key_length
+        start += -start % 8
+        if (file_magic != magic or file_version != version
+                or view[HEADER.size:HEADER.size + key_length] != key
+                or start + body_length != len(view)):
+            return None
+        body = view[start:]
+        if zlib.crc32(body) != checksum:
+            return None
+
+        sections = []
+        position = 0
+        while position < len(body):
+            (length,) = struct.unpack_from("<Q", body, position)
+            position += 8
+            sections.append(body[position:position + length])
+            position += length + (-length % 8)
+    except (struct.error, ValueError):
+        return None
+    return buffer, sections
+
+
+def load(directory):
+    """
+    Load the graph for `directory`, from its snapshot if up to date,
+    otherwise from the CSV files, writing a new snapshot.
+    """
+    path = os.path.join(directory, SNAPSHOT_NAME)
+    key = source_key(directory)
+    graph = read_snapshot(path, key)
+    if graph is not None:
+        return graph
+
+    graph = Graph.from_csv(directory)
+    try:
+        write_snapshot(graph, path, key)
+    except OSError:
+        pass
+    return graph
@@ -0,0 +1,316 @@
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import degrees
+import landmarks
+import queries
+from lookup import NameLookup
+import snapshot
+import util
+from graph import Graph
+
+
+def reset_data():
+    """
+    Forget any previously loaded dataset.
+    """
+    degrees.names = {}
+    degrees.graph = None
+    degrees.landmark_index = None
+    degrees.lookup = None
+    degrees.people.clear()
+    degrees.movies.clear()
+
+
+def build_random_graph(num_people, num_movies, stars_per_movie, seed=0):
+    """
+    Replace the loaded dataset with a random cast of people and movies.
+    """
+    rng = random.Random(seed)
+    reset_data()
+    for i in range(num_people):
+        person_id = str(i)
+        degrees.people[person_id] = {
+            "name": f"Person {i}", "birth": "", "movies": set()
+        }
+        degrees.names.setdefault(f"person {i}", set()).add(person_id)
+    for j in range(num_movies):
+        movie_id = f"m{j}"
+        stars = {str(rng.randrange(num_people)) for _ in range(stars_per_movie)}
+        degrees.movies[movie_id] = {"title": f"Movie {j}", "year": "", "stars": stars}
+        for person_id in stars:
+            degrees.people[person_id]["movies"].add(movie_id)
+    degrees.graph = Graph.from_dicts(degrees.people, degrees.movies)
+    degrees.landmark_index = landmarks.LandmarkIndex.build(
+        degrees.graph, landmarks.busiest_people(degrees.graph, 4))
+
+
+class TestDegreesMethods(unittest.TestCase):
+    def setUp(self):
+        build_random_graph(300, 120, 3)
+        rng = random.Random(1)
+        person_ids = sorted(degrees.people)
+        self.pairs = [(rng.choice(person_ids), rng.choice(person_ids))
+                      for _ in range(200)]
+
+    def assertValidPath(self, source, target, path):
+        current = source
+        for movie_id, person_id in path:
+            self.assertIn(current, degrees.movies[movie_id]["stars"])
+            self.assertIn(person_id, degrees.movies[movie_id]["stars"])
+            current = person_id
+        self.assertEqual(current, target)
+
+    def test_deque_frontiers(self):
+        for frontier_class, order in ((util.DequeStackFrontier, [3, 1, 2, 1]),
+                                      (util.DequeQueueFrontier, [1, 2, 1, 3])):
+            frontier = frontier_class()
+            for state in (1, 2, 1, 3):
+                frontier.add(util.Node(state=state, parent=None, action=None))
+            removed = []
+            while not frontier.empty():
+                self.assertEqual(frontier.contains_state(1), removed.count(1) < 2)
+                removed.append(frontier.remove().state)
+            self.assertEqual(removed, order)
+            self.assertFalse(frontier.contains_state(1))
+            with self.assertRaises(Exception):
+                frontier.remove()
+
+    def test_load_data(self):
+        reset_data()
+        degrees.load_data("small")
+        self.assertEqual(degrees.names["kevin bacon"], {"102"})
+        self.assertIn("112384", degrees.people["102"]["movies"])
+
+    def test_load_graph(self):
+        reset_data()
+        degrees.load_graph("small")
+        self.assertEqual(degrees.names["kevin bacon"], {"102"})
+        self.assertEqual(degrees.person_record("102")["name"], "Kevin Bacon")
+        self.assertEqual(degrees.movie_record("112384")["title"], "Apollo 13")
+        self.assertEqual(degrees.shortest_path_csr("102", "158"),
+                         [("112384", "158")])
+
+        # The default search starts from the snapshot, not the CSV dictionaries
+        reset_data()
+        degrees.load("small", degrees.parse_args([]).search)
+        self.assertIsNotNone(degrees.graph)
+        self.assertEqual(degrees.people, {})
+
+    def test_search_algorithms(self):
+        for source, target in self.pairs:
+            expected = degrees.shortest_path(source, target)
+            for name, search in degrees.SEARCHES.items():
+                path = search(source, target)
+                if expected is None:
+                    self.assertIsNone(path, name)
+                else:
+                    self.assertEqual(len(path), len(expected), name)
+                    self.assertValidPath(source, target, path)
+
+    def test_landmark_queries(self):
+        index = degrees.landmark_index
+        for landmark in index.landmarks:
+            source = degrees.graph.person_ids[landmark]
+            for target in degrees.people:
+                expected = degrees.shortest_path(source, target)
+                for start, end in ((source, target), (target, source)):
+                    path = index.shortest_path(start, end)
+                    if expected is None:
+                        self.assertIsNone(path)
+                    else:
+                        self.assertEqual(len(path), len(expected))
+                        self.assertValidPath(start, end, path)
+
+
+class TestQueries(unittest.TestCase):
+    def test_run_batch(self):
+        degrees.load("small", "csr")
+        rows = [["Kevin Bacon", "Tom Hanks"], ["Nobody", "Tom Hanks"], ["Kevin Bacon"]]
+        output = io.StringIO()
+        stats = queries.run_batch(rows, degrees.shortest_path_csr, output)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(stats.queries, 3)
+        self.assertEqual(results[0]["degrees"], 1)
+        self.assertEqual(results[0]["path"][0]["movie"], "Apollo 13")
+        self.assertIn("not found", results[1]["error"])
+        self.assertIn("error", results[2])
+        self.assertGreater(stats.summary()["queries_per_second"], 0)
+
+    def test_stats(self):
+        # A server idle for a minute between queries is not counted as busy
+        stats = queries.Stats()
+        stats.start -= 60
+        for _ in range(2):
+            stats.record({"latency_ms": 5})
+        summary = stats.summary()
+        self.assertGreaterEqual(summary["elapsed_s"], 60)
+        self.assertAlmostEqual(summary["busy_s"], 0.01)
+        self.assertAlmostEqual(summary["queries_per_second"], 200)
+
+    def test_lookup_names(self):
+        degrees.load("small", "csr")
+        self.assertEqual(len(queries.lookup_names({"prefix": [""], "limit": ["1"]})), 1)
+        self.assertLessEqual(len(queries.lookup_names({"prefix": [""], "limit": ["100000"]})),
+                             queries.MAX_NAMES)
+        for query in ({"prefix": [""], "limit": ["-1"]}, {"prefix": [""], "limit": ["0"]},
+                      {"prefix": [""], "limit": ["ten"]}, {"fuzzy": ["tom"], "distance": ["-1"]}):
+            with self.assertRaises(ValueError):
+                queries.lookup_names(query)
+
+    def test_solve_many(self):
+        degrees.load("small", "csr")
+        person_ids = list(degrees.graph.person_ids)
+        pairs = [(source, target) for source in person_ids for target in person_ids]
+        expected = [degrees.shortest_path_csr(source, target) for source, target in pairs]
+        self.assertEqual(queries.solve_many(pairs, "small", "csr", processes=2), expected)
+
+
+class TestNameLookup(unittest.TestCase):
+    def setUp(self):
+        self.names = {
+            "tom hanks": {"158"}, "tom cruise": {"129"}, "tom hardy": {"362"},
+            "chris evans": {"1", "2"}, "kevin bacon": {"102"},
+        }
+        self.lookup = NameLookup.from_names(self.names)
+
+    def test_exact(self):
+        self.assertEqual(self.lookup.exact("Chris Evans"), {"1", "2"})
+        self.assertEqual(self.lookup.exact("Chris"), set())
+
+    def test_prefix(self):
+        self.assertEqual(self.lookup.prefix("tom h"),
+                         [("tom hanks", {"158"}), ("tom hardy", {"362"})])
+        self.assertEqual([name for name, _ in self.lookup.prefix("T", limit=1)],
+                         ["tom cruise"])
+
+    def test_fuzzy(self):
+        self.assertEqual(self.lookup.fuzzy("tom hnaks", 2), [(2, "tom hanks", {"158"})])
+        self.assertEqual([name for _, name, _ in self.lookup.fuzzy("tom har", 4)],
+                         ["tom hardy", "tom hanks"])
+        self.assertEqual(self.lookup.fuzzy("kevn bacon", 1), [(1, "kevin bacon", {"102"})])
+        self.assertEqual(self.lookup.fuzzy("Chris Evans", 0), [(0, "chris evans", {"1", "2"})])
+        self.assertEqual(self.lookup.fuzzy("nobody", 2), [])
+
+    def test_fuzzy_matches_brute_force(self):
+        rng = random.Random(0)
+        words = ["".join(rng.choice("abc") for _ in range(rng.randrange(1, 8)))
+                 for _ in range(300)]
+        lookup = NameLookup.from_names({word: {word} for word in words})
+        for query in ("ab", "cab", "aaaa", "bcbcb", "abcabca", ""):
+            for max_distance in range(4):
+                expected = sorted(
+                    (distance, word, {word}) for word in set(words)
+                    if (distance := levenshtein(query, word)) <= max_distance)
+                self.assertEqual(lookup.fuzzy(query, max_distance, limit=len(words)),
+                                 expected)
+
+    def test_person_id_for_name(self):
+        reset_data()
+        degrees.load_data("small")
+        degrees.names["kevin bacon"].add("158")
+        self.assertIsNone(degrees.person_id_for_name("Kevin Bacon", "none"))
+        self.assertEqual(degrees.person_id_for_name("Kevin Bacon", "most-movies"), "102")
+        self.assertEqual(degrees.person_id_for_name("Kevin Bacon (1958)"), "102")
+        self.assertIsNone(degrees.person_id_for_name("Kevin Bacon (1900)"))
+        with self.assertRaises(LookupError):
+            queries.resolve("Kevin Bacon")
+        self.assertEqual(queries.resolve("Kevin Bacon", "most-movies"), "102")
+        with self.assertRaisesRegex(LookupError, "Kevin Bacon"):
+            queries.resolve("Kevin Bacan")
+
+
+def levenshtein(a, b):
+    """
+    Returns the edit distance between two strings.
+    """
+    row = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j in range(1, len(b) + 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1,
+                                           previous + (char != b[j - 1]))
+    return row[-1]
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in snapshot.SOURCES:
+            shutil.copy(os.path.join("small", name), self.directory)
+        self.path = os.path.join(self.directory, snapshot.SNAPSHOT_NAME)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameGraph(self, graph, expected):
+        for attribute in ("person_ids", "person_names", "person_births",
+                          "movie_ids", "movie_titles", "movie_years",
+                          "person_offsets", "person_movies",
+                          "movie_offsets", "movie_stars"):
+            self.assertEqual(list(getattr(graph, attribute)),
+                             list(getattr(expected, attribute)), attribute)
+        for person_id in expected.person_ids:
+            self.assertEqual(graph.person_index[person_id],
+                             expected.person_index[person_id])
+        for name, person_ids in expected.names.items():
+            self.assertEqual(graph.names.get(name), person_ids)
+            self.assertEqual(NameLookup.from_graph(graph).exact(name), person_ids)
+        self.assertIsNone(graph.names.get("nobody"))
+        with self.assertRaises(KeyError):
+            graph.person_index["nobody"]
+
+    def test_round_trip(self):
+        expected = Graph.from_csv(self.directory)
+        snapshot.load(self.directory)
+        self.assertTrue(os.path.exists(self.path))
+        graph = snapshot.read_snapshot(self.path, snapshot.source_key(self.directory))
+        self.assertIsNotNone(graph)
+        self.assertSameGraph(graph, expected)
+        self.assertEqual(graph.shortest_path("102", "158"), [("112384", "158")])
+
+    def test_stale_snapshot(self):
+        snapshot.load(self.directory)
+        with open(os.path.join(self.directory, "people.csv"), "a") as f:
+            f.write('999,"New Person",2000\n')
+        key = snapshot.source_key(self.directory)
+        self.assertIsNone(snapshot.read_snapshot(self.path, key))
+        graph = snapshot.load(self.directory)
+        self.assertEqual(graph.names.get("new person"), {"999"})
+        self.assertIsNotNone(snapshot.read_snapshot(self.path, key))
+
+    def test_corrupt_snapshot(self):
+        snapshot.load(self.directory)
+        with open(self.path, "r+b") as f:
+            f.seek(-3, os.SEEK_END)
+            f.write(b"\xff")
+        key = snapshot.source_key(self.directory)
+        self.assertIsNone(snapshot.read_snapshot(self.path, key))
+        self.assertSameGraph(snapshot.load(self.directory),
+                             Graph.from_csv(self.directory))
+        self.assertIsNotNone(snapshot.read_snapshot(self.path, key))
+
+        with open(self.path, "wb") as f:
+            f.write(b"DEGREES")
+        self.assertIsNone(snapshot.read_snapshot(self.path, key))
+
+    def test_landmark_index(self):
+        graph = snapshot.load(self.directory)
+        built = landmarks.load(graph, self.directory, ["102"])
+        path = os.path.join(self.directory, landmarks.LANDMARKS_NAME)
+        key = snapshot.source_key(self.directory)
+        index = landmarks.read_index(graph, path, key, built.landmarks)
+        self.assertEqual(list(index.landmarks), [graph.person_index["102"]])
+        self.assertEqual(list(index.distances[0]), list(built.distances[0]))
+        self.assertEqual(index.shortest_path("158", "102"), [("112384", "102")])
+        other = [graph.person_index["158"]]
+        self.assertIsNone(landmarks.read_index(graph, path, key, other))
+
+
+if __name__ == '__main__':
+    unittest.main()
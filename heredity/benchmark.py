@@ -0,0 +1,176 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import heredity
+import network
+from families import random_family
+
+
+def parse_args(argv):
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="benchmark.py")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    methods = subparsers.add_parser(
+        "methods", help="compare inference methods on random pedigrees")
+    methods.add_argument("--people", type=int, nargs="+", default=[5, 6, 7, 100, 1000])
+    methods.add_argument("--methods", nargs="+", choices=heredity.METHODS,
+                         default=list(heredity.METHODS))
+    methods.add_argument("--related", type=float, default=0.05,
+                         help="fraction of couples who are both descendants")
+    methods.add_argument("--max-enumerate", type=int, default=8,
+                         help="largest pedigree to enumerate")
+    methods.add_argument("--seed", type=int, default=0)
+
+    enumerate_ = subparsers.add_parser(
+        "enumerate", help="compare batched and one at a time enumeration")
+    enumerate_.add_argument("--people", type=int, nargs="+", default=[6, 7, 8])
+    enumerate_.add_argument("--related", type=float, default=0.05)
+    enumerate_.add_argument("--seed", type=int, default=0)
+
+    query = subparsers.add_parser(
+        "query", help="time compiling, loading and querying a junction tree")
+    query.add_argument("--people", type=int, nargs="+", default=[100, 1000])
+    query.add_argument("--queries", type=int, default=10)
+    query.add_argument("--related", type=float, default=0.05)
+    query.add_argument("--seed", type=int, default=0)
+
+    sample = subparsers.add_parser(
+        "sample", help="time sampling methods and compare them with elimination")
+    sample.add_argument("--people", type=int, nargs="+", default=[100, 200, 400])
+    sample.add_argument("--samples", type=int, default=10000)
+    sample.add_argument("--processes", type=int, nargs="+",
+                        default=sorted({1, os.cpu_count() or 1}))
+    sample.add_argument("--related", type=float, default=0.05)
+    sample.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def benchmark_methods(people, methods, related, max_enumerate, seed):
+    for n in people:
+        family = random_family(n, seed, related)
+        width = elimination_width(family)
+        for name in methods:
+            if name == "enumerate" and n > max_enumerate:
+                continue
+            start = time.perf_counter()
+            heredity.METHODS[name](family)
+            elapsed = time.perf_counter() - start
+            print(f"{n} people, width {width}: {name} {elapsed:.3f} s")
+
+
+def scalar_enumerate(people):
+    """
+    Enumerate assignments one at a time with `joint_probability`
+    and `update`, as `main` used to.
+    """
+    probabilities = {person: {"gene": {2: 0, 1: 0, 0: 0}, "trait": {True: 0, False: 0}}
+                     for person in people}
+    names = set(people)
+    for have_trait in heredity.powerset(names):
+        if any(people[person]["trait"] is not None
+               and people[person]["trait"] != (person in have_trait) for person in names):
+            continue
+        for one_gene in heredity.powerset(names):
+            for two_genes in heredity.powerset(names - one_gene):
+                p = heredity.joint_probability(people, one_gene, two_genes, have_trait)
+                heredity.update(probabilities, one_gene, two_genes, have_trait, p)
+    heredity.normalize(probabilities)
+    return probabilities
+
+
+def benchmark_enumerate(people, related, seed):
+    for n in people:
+        family = random_family(n, seed, related)
+        for name, method in (("one at a time", scalar_enumerate),
+                             ("batched", heredity.enumerate_probabilities)):
+            start = time.perf_counter()
+            method(family)
+            elapsed = time.perf_counter() - start
+            print(f"{n} people: {name} {elapsed:.3f} s")
+
+
+def benchmark_query(people, queries, related, seed):
+    rng = random.Random(seed)
+    directory = tempfile.mkdtemp()
+    try:
+        for n in people:
+            family = random_family(n, seed, related)
+            path = os.path.join(directory, f"{n}.tree")
+
+            start = time.perf_counter()
+            tree = heredity.compile_family(family, path)
+            compiled = time.perf_counter() - start
+
+            start = time.perf_counter()
+            tree = heredity.compile_family(family, path)
+            loaded = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(queries):
+                heredity.query(tree, {person: rng.choice([None, True, False])
+                                      for person in family})
+            elapsed = (time.perf_counter() - start) / queries
+            print(f"{n} people, {tree.size()} entries: compile {compiled:.3f} s, "
+                  f"load {loaded:.3f} s, query {elapsed:.3f} s")
+    finally:
+        shutil.rmtree(directory)
+
+
+def benchmark_sample(people, samples, processes, related, seed):
+    for n in people:
+        family = random_family(n, seed, related)
+        exact = heredity.eliminate_probabilities(family)
+        for name, (method, diagnostic) in heredity.SAMPLERS.items():
+            for count in processes:
+                start = time.perf_counter()
+                estimate, value = method(family, samples, processes=count, seed=seed)
+                elapsed = time.perf_counter() - start
+                error = max(abs(estimate[person]["gene"][genes] - exact[person]["gene"][genes])
+                            for person in family for genes in (0, 1, 2))
+                print(f"{n} people, {name}, {count} processes: {elapsed:.2f} s, "
+                      f"largest error {error:.4f}, {diagnostic.lower()} {value:.4g}")
+
+
+def elimination_width(people):
+    """
+    Returns the most other variables any gene variable shares a factor
+    with when it is eliminated.
+    """
+    model = network.Network(people, heredity.PROBS)
+    neighbours = {name: set() for name in model.names}
+    for factor in model.factors:
+        for variable in factor.variables:
+            neighbours[variable].update(factor.variables)
+    width = 0
+    for variable in model.elimination_order():
+        adjacent = neighbours.pop(variable) - {variable}
+        width = max(width, len(adjacent))
+        for neighbour in adjacent:
+            neighbours[neighbour].update(adjacent - {neighbour})
+            neighbours[neighbour].discard(variable)
+    return width
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.benchmark == "methods":
+        benchmark_methods(args.people, args.methods, args.related,
+                          args.max_enumerate, args.seed)
+    elif args.benchmark == "enumerate":
+        benchmark_enumerate(args.people, args.related, args.seed)
+    elif args.benchmark == "query":
+        benchmark_query(args.people, args.queries, args.related, args.seed)
+    elif args.benchmark == "sample":
+        benchmark_sample(args.people, args.samples, args.processes, args.related, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Random pedigrees for tests and benchmarks
+"""
+
+import random
+
+
+def random_family(n, seed=0, related=0.05):
+    """
+    Returns a pedigree of `n` people in the format of `load_data`,
+    some with known traits. Couples are a descendant and a spouse from
+    outside the family, or with probability `related` two descendants.
+    """
+    rng = random.Random(seed)
+    people = {}
+
+    def add(mother=None, father=None):
+        name = f"P{len(people)}"
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": rng.choice([None, True, False]),
+        }
+        return name
+
+    unmarried = [add(), add()]
+    while len(people) < n:
+        mother = unmarried.pop(rng.randrange(len(unmarried))) if unmarried else add()
+        if unmarried and rng.random() < related:
+            father = unmarried.pop(rng.randrange(len(unmarried)))
+        else:
+            father = add()
+        for _ in range(rng.randint(1, 3)):
+            if len(people) < n:
+                unmarried.append(add(mother, father))
+    return people
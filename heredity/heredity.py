@@ -1,6 +1,19 @@
+import argparse
 import csv
 import itertools
+import json
+import os
 import sys
+from operator import add, mul
+
+import network
+import sampling
+
+# Number of assignments evaluated together by `joint_probabilities`
+BATCH_SIZE = 4096
+
+# Default number of samples drawn by the sampling methods
+SAMPLES = 100000
 
 PROBS = {
 
@@ -37,12 +50,165 @@ PROBS = {
 }
 
 
+def parse_args(argv):
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="heredity.py")
+    parser.add_argument("data", help="CSV file of people, their parents and traits")
+    parser.add_argument("--method", choices=[*METHODS, *SAMPLERS], default="eliminate",
+                        help="compute probabilities exactly by variable elimination "
+                             "or by enumerating every assignment of genes and traits, "
+                             "or estimate them by likelihood weighting or Gibbs sampling")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="number of samples to draw when sampling")
+    parser.add_argument("--chains", type=int,
+                        help="number of samples drawn together, or of Gibbs chains")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="sample in parallel with this many worker processes")
+    parser.add_argument("--seed", type=int, help="seed of the random samples")
+    parser.add_argument("--trait", type=trait_evidence, action="append", default=[],
+                        metavar="NAME=[0|1]",
+                        help="set or, if blank, clear the known trait of a person")
+    parser.add_argument("--json", action="store_true",
+                        help="print probabilities as JSON")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="compile the family without reading or writing "
+                             "its compiled junction tree")
+    return parser.parse_args(argv)
+
+
+def trait_evidence(text):
+    """
+    Parse a NAME=[0|1] command line argument into a name and trait.
+    """
+    name, _, value = text.rpartition("=")
+    if not name or value not in ("", "0", "1"):
+        raise argparse.ArgumentTypeError(f"expected NAME=0, NAME=1 or NAME=, got {text!r}")
+    return name, (True if value == "1" else False if value == "0" else None)
+
+
 def main():
+    args = parse_args(sys.argv[1:])
+    people = load_data(args.data)
+    for name, trait in args.trait:
+        if name not in people:
+            sys.exit(f"Unknown person: {name}")
+        people[name]["trait"] = trait
+
+    if args.method == "eliminate" and not args.no_cache:
+        tree = compile_family(people, tree_path(args.data))
+        probabilities = query(tree, {person: people[person]["trait"] for person in people})
+    elif args.method in SAMPLERS:
+        method, diagnostic = SAMPLERS[args.method]
+        options = {"chains": args.chains} if args.chains else {}
+        probabilities, value = method(people, args.samples, processes=args.processes,
+                                      seed=args.seed, **options)
+        print(f"{diagnostic}: {value:.4f}", file=sys.stderr)
+    else:
+        probabilities = METHODS[args.method](people)
+
+    if args.json:
+        print(to_json(probabilities))
+        return
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+def eliminate_probabilities(people):
+    """
+    Return the gene and trait probabilities of every person given the
+    known traits, computed exactly by variable elimination over the
+    Bayesian network of the family.
+    """
+    return network.Network(people, PROBS).probabilities()
+
+
+def weighting_probabilities(people, samples=SAMPLES, chains=1000, processes=1, seed=None):
+    """
+    Return the gene and trait probabilities of every person given the
+    known traits, estimated by likelihood weighting from `samples`
+    samples, and their effective sample size.
+    """
+    model = network.Network(people, PROBS)
+    evidence = {person: people[person]["trait"] for person in people}
+    marginals, size = sampling.likelihood_weighting(
+        model, evidence, samples, chains, processes, seed)
+    return network.probabilities(model.names, marginals, evidence, trait_table()), size
+
+
+def gibbs_probabilities(people, samples=SAMPLES, chains=100, processes=1, seed=None):
+    """
+    Return the gene and trait probabilities of every person given the
+    known traits, estimated by Gibbs sampling about `samples` samples
+    with `chains` chains, and the largest potential scale reduction
+    of anyone's number of genes across the chains.
+    """
+    model = network.Network(people, PROBS)
+    evidence = {person: people[person]["trait"] for person in people}
+    marginals, reduction = sampling.gibbs_sampling(
+        model, evidence, samples, chains, processes, seed)
+    return network.probabilities(model.names, marginals, evidence, trait_table()), reduction
+
+
+def trait_table():
+    """
+    Return the probability of a trait given the number of genes,
+    as a list indexed by genes and trait.
+    """
+    return [[PROBS["trait"][genes][trait] for trait in (False, True)] for genes in (0, 1, 2)]
+
+
+def tree_path(filename):
+    """
+    Return the path of the compiled junction tree of a family CSV file.
+    """
+    directory, name = os.path.split(filename)
+    return os.path.join(directory, f".{name}.tree")
+
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+def compile_family(people, path=None):
+    """
+    Return the junction tree of a family, read from `path` if it was
+    compiled there for the same parents and probabilities, otherwise
+    compiled, and written to `path` if given. Only the parents of
+    every person are compiled, so it answers `query` for any traits.
+    """
+    model = network.Network(people, PROBS)
+    if path is None:
+        return network.JunctionTree.compile(model)
+    return network.load(model, path)
+
+
+def query(tree, evidence):
+    """
+    Return the gene and trait probabilities of every person of a family
+    compiled by `compile_family`, given `evidence`, a dictionary of the
+    known traits of any people, in the format `main` prints.
+    """
+    return tree.probabilities(evidence)
+
+
+def to_json(probabilities):
+    """
+    Return probabilities in the format `main` prints as JSON,
+    whose keys are strings: "0" to "2" and "true" or "false".
+    """
+    return json.dumps(probabilities, indent=2)
+
+
+def enumerate_probabilities(people):
+    """
+    Return the gene and trait probabilities of every person given the
+    known traits, summing the joint probability of every assignment.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -60,38 +226,15 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    # Evaluate assignments of genes a batch at a time, with traits summed out
+    tables = state_tables(people)
+    for batch in assignment_batches(people):
+        p = joint_probabilities(people, tables, batch)
+        update_batch(probabilities, people, batch, p)
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -118,14 +261,14 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Lazily generate all possible subsets of set s.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
+    return (
+        set(subset) for subset in itertools.chain.from_iterable(
             itertools.combinations(s, r) for r in range(len(s) + 1)
         )
-    ]
+    )
 
 
 def num_genes(person, one_gene, two_genes):
@@ -212,6 +355,142 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
         probabilities[person]["trait"][person in have_trait] += p
 
 
+# A person's state in a batch is their number of genes. Offsets in the
+# state table of a child of the state of its mother and father.
+STATES = range(3)
+MOTHER_OFFSET = tuple(9 * state for state in STATES)
+FATHER_OFFSET = tuple(3 * state for state in STATES)
+
+
+def state_tables(people):
+    """
+    Return the probability of each state of every person, given the
+    states of their parents and times the likelihood of their known
+    trait, as a list of tables in the order of `people`. The table of
+    a person without both parents listed is indexed by their state,
+    and otherwise by 9 * mother's state + 3 * father's state + own state.
+
+    A person's unknown trait is summed out: both values together have
+    probability 1 whatever their genes, so it adds no factor.
+    """
+    # Precomputed 3x3x3 table of child's genes given mother's and father's
+    inheritance = network.inheritance_table(PROBS["mutation"])
+    tables = []
+    for person in people:
+        trait = people[person]["trait"]
+        likelihood = [1 if trait is None else PROBS["trait"][genes][trait] for genes in STATES]
+        if people[person]["mother"] is None or people[person]["father"] is None:
+            tables.append(tuple(PROBS["gene"][genes] * likelihood[genes] for genes in STATES))
+        else:
+            tables.append(tuple(p * likelihood[i % 3] for i, p in enumerate(inheritance)))
+    return tables
+
+
+class Batch():
+    """
+    Assignments of genes to the people of a family, in the order of
+    `people`. The first people have the states in `fixed` in every
+    assignment, and the others every combination of states in
+    `domains`, in the order of `itertools.product`.
+
+    `columns` holds the state of each person in every assignment: a
+    single state for the fixed people, and a tuple for the others.
+    """
+
+    def __init__(self, fixed, domains, columns):
+        self.fixed = fixed
+        self.domains = domains
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns[-1]) if self.domains else 1
+
+
+def assignment_batches(people, size=BATCH_SIZE):
+    """
+    Lazily generate every assignment of genes as batches of up to
+    `size` assignments, or of every state of the last person if more.
+    Only the states of the varied people are stored, once for all
+    batches, so memory does not grow with the family.
+    """
+    domains = [tuple(STATES)] * len(people)
+
+    # Vary as many of the last people within a batch as fit
+    split, count = len(domains), 1
+    while split and (split == len(domains) or count * len(domains[split - 1]) <= size):
+        split -= 1
+        count *= len(domains[split])
+    varied = domains[split:]
+    columns = list(zip(*itertools.product(*varied)))
+
+    for fixed in itertools.product(*domains[:split]):
+        yield Batch(fixed, varied, list(fixed) + columns)
+
+
+def joint_probabilities(people, tables, batch):
+    """
+    Return the probability of every assignment of genes in a batch from
+    `assignment_batches` together with the known traits, given
+    `state_tables(people)`, as a list.
+
+    Probabilities are multiplied one person at a time across the whole
+    batch, looking every state up in the person's table. People whose
+    state and parents' states are fixed contribute a single factor.
+    """
+    columns = dict(zip(people, batch.columns))
+    scale = 1
+    p = [1] * len(batch)
+    for person, table, states in zip(people, tables, batch.columns):
+        mother, father = people[person]["mother"], people[person]["father"]
+        if mother is not None and father is not None:
+            mother, father = columns[mother], columns[father]
+            if isinstance(states, int) and isinstance(mother, int) and isinstance(father, int):
+                scale *= table[MOTHER_OFFSET[mother] + FATHER_OFFSET[father] + states]
+                continue
+            mother = (itertools.repeat(MOTHER_OFFSET[mother]) if isinstance(mother, int)
+                      else map(MOTHER_OFFSET.__getitem__, mother))
+            father = (itertools.repeat(FATHER_OFFSET[father]) if isinstance(father, int)
+                      else map(FATHER_OFFSET.__getitem__, father))
+            if isinstance(states, int):
+                states = itertools.repeat(states, len(p))
+            states = map(add, map(add, mother, father), states)
+        elif isinstance(states, int):
+            scale *= table[states]
+            continue
+        p = list(map(mul, p, map(table.__getitem__, states)))
+    return list(map(mul, p, itertools.repeat(scale)))
+
+
+def update_batch(probabilities, people, batch, p):
+    """
+    Add to `probabilities` the joint probabilities `p` of a batch
+    of assignments from `assignment_batches`.
+
+    The varied people are summed out from the last: the assignments
+    with each of their states are every n-th one, for n states. A known
+    trait takes all of a person's probability, and an unknown one the
+    probability of each number of genes times that of the trait given it.
+    """
+    totals = {}
+    for person, domain in zip(reversed(list(people)), reversed(batch.domains)):
+        parts = [p[i::len(domain)] for i in range(len(domain))]
+        totals[person] = zip(domain, map(sum, parts))
+        p = list(map(sum, zip(*parts)))
+    for person, state in zip(people, batch.fixed):
+        totals[person] = [(state, p[0])]
+
+    for person in totals:
+        trait = people[person]["trait"]
+        for genes, total in totals[person]:
+            probabilities[person]["gene"][genes] += total
+            if trait is None:
+                has_trait = PROBS["trait"][genes][True] * total
+                probabilities[person]["trait"][True] += has_trait
+                probabilities[person]["trait"][False] += total - has_trait
+            else:
+                probabilities[person]["trait"][trait] += total
+
+
 def normalize(probabilities):
     """
     Update `probabilities` such that each probability distribution
@@ -226,5 +505,18 @@ def normalize(probabilities):
             probabilities[person]["trait"][trait] *= trait_factor
 
 
+# Ways to compute probabilities, by name
+METHODS = {
+    "eliminate": eliminate_probabilities,
+    "enumerate": enumerate_probabilities,
+}
+
+# Ways to estimate probabilities, by name, and what their diagnostic is
+SAMPLERS = {
+    "weighting": (weighting_probabilities, "Effective sample size"),
+    "gibbs": (gibbs_probabilities, "Largest potential scale reduction"),
+}
+
+
 if __name__ == "__main__":
     main()
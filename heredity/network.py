@@ -0,0 +1,433 @@
+"""
+Exact inference over the gene variables of a family by variable elimination
+"""
+
+import hashlib
+import heapq
+import itertools
+import json
+import os
+from operator import mul
+
+# Number of values of a gene variable, the copies of the gene a person has
+GENES = 3
+
+# Bump whenever the compiled tree layout changes
+VERSION = 1
+
+
+class Factor():
+    """
+    Table of nonnegative values over every assignment of gene counts to
+    `variables`, stored flat with the last variable varying fastest.
+    """
+
+    def __init__(self, variables, values):
+        self.variables = tuple(variables)
+        self.values = list(values)
+
+    def strides(self, variables):
+        """
+        Returns the step in `values` of each of `variables`,
+        or 0 for a variable the factor does not have.
+        """
+        steps = {}
+        step = 1
+        for variable in reversed(self.variables):
+            steps[variable] = step
+            step *= GENES
+        return [steps.get(variable, 0) for variable in variables]
+
+
+def product(factors):
+    """
+    Returns the product of `factors`, over the union of their variables.
+    """
+    variables = list(dict.fromkeys(
+        variable for factor in factors for variable in factor.variables))
+    indexed = [(factor.values, factor.strides(variables)) for factor in factors]
+    values = []
+    for assignment in itertools.product(range(GENES), repeat=len(variables)):
+        value = 1
+        for factor_values, strides in indexed:
+            value *= factor_values[sum(map(mul, assignment, strides))]
+        values.append(value)
+    return Factor(variables, values)
+
+
+def projection(variables, onto):
+    """
+    Returns the index in a table over `onto`, a subset of `variables`,
+    of every entry of a table over `variables`.
+    """
+    strides = Factor(onto, ()).strides(variables)
+    return [sum(map(mul, assignment, strides))
+            for assignment in itertools.product(range(GENES), repeat=len(variables))]
+
+
+def accumulate(values, index, size):
+    """
+    Returns the sums of `values` grouped by their entry in `index`,
+    scaled to add up to 1 unless they are all 0. Scaling messages keeps
+    long products of small probabilities from underflowing without
+    changing any marginal.
+    """
+    totals = [0] * size
+    for i, value in zip(index, values):
+        totals[i] += value
+    total = sum(totals)
+    if total:
+        totals = [value / total for value in totals]
+    return totals
+
+
+def inheritance_table(mutation):
+    """
+    Returns the probability of every number of copies of the gene a
+    child has given the number each parent has, flattened in the order
+    (mother, father, child) as in `Factor`.
+
+    A parent with 2 copies passes the gene on unless it mutates, one
+    with 1 copy passes it on with probability 0.5 and one with none
+    passes it on only if it mutates.
+    """
+    passes = [mutation, 0.5, 1 - mutation]
+    table = []
+    for mother, father in itertools.product(range(GENES), repeat=2):
+        m, f = passes[mother], passes[father]
+        table.extend([(1 - m) * (1 - f), m * (1 - f) + (1 - m) * f, m * f])
+    return table
+
+
+class Network():
+    """
+    Bayesian network of the number of copies of the gene every person
+    in `people`, as returned by `load_data`, has, with probabilities
+    from `probs` in the format of `PROBS`.
+
+    Each person has one factor: the unconditional gene distribution for
+    a person without both parents listed, otherwise the inheritance
+    table given their parents. Known traits are not part of the
+    network: they are applied by `JunctionTree.query` as the
+    likelihood of the trait given the person's genes, so trait
+    variables never enter the elimination.
+    """
+
+    def __init__(self, people, probs):
+        self.people = people
+        self.probs = probs
+        self.names = list(people)
+        self.factors = [self.person_factor(name) for name in self.names]
+
+    def person_factor(self, name):
+        """
+        Returns the factor of the gene variable of person `name`.
+        """
+        person = self.people[name]
+        if person["mother"] is None or person["father"] is None:
+            return Factor([name], [self.probs["gene"][genes] for genes in range(GENES)])
+        return Factor([person["mother"], person["father"], name],
+                      inheritance_table(self.probs["mutation"]))
+
+    def elimination_order(self):
+        """
+        Returns the order to eliminate gene variables in, chosen greedily
+        as the variable whose elimination links the fewest pairs of its
+        remaining neighbours (min-fill), then with the fewest neighbours,
+        then first in the family.
+
+        Scores are kept in a heap and only recomputed around the variable
+        just eliminated, since no others can change.
+        """
+        neighbours = {name: set() for name in self.names}
+        for factor in self.factors:
+            for variable in factor.variables:
+                neighbours[variable].update(factor.variables)
+        for name in self.names:
+            neighbours[name].discard(name)
+
+        def score(variable):
+            adjacent = neighbours[variable]
+            fill = sum(1 for a, b in itertools.combinations(adjacent, 2)
+                       if b not in neighbours[a])
+            return fill, len(adjacent)
+
+        index = {name: i for i, name in enumerate(self.names)}
+        scores = {name: score(name) for name in self.names}
+        heap = [(scores[name], index[name], name) for name in self.names]
+        heapq.heapify(heap)
+
+        order = []
+        eliminated = set()
+        while heap:
+            variable_score, _, variable = heapq.heappop(heap)
+            if variable in eliminated or variable_score != scores[variable]:
+                continue
+            order.append(variable)
+            eliminated.add(variable)
+
+            adjacent = neighbours.pop(variable)
+            for neighbour in adjacent:
+                neighbours[neighbour].discard(variable)
+                neighbours[neighbour].update(adjacent - {neighbour})
+            affected = set(adjacent)
+            for neighbour in adjacent:
+                affected.update(neighbours[neighbour])
+            for name in affected:
+                new_score = score(name)
+                if new_score != scores[name]:
+                    scores[name] = new_score
+                    heapq.heappush(heap, (new_score, index[name], name))
+        return order
+
+    def key(self):
+        """
+        Returns a hash of the parents of every person and the
+        probabilities, which determine the compiled junction tree.
+        """
+        family = [[name, self.people[name]["mother"], self.people[name]["father"]]
+                  for name in self.names]
+        return hashlib.sha256(json.dumps([family, repr(self.probs)]).encode()).hexdigest()
+
+    def probabilities(self, evidence=None):
+        """
+        Returns the gene and trait distribution of every person given
+        the traits in `evidence`, by default the known ones, in the
+        format `main` prints.
+        """
+        if evidence is None:
+            evidence = {name: self.people[name]["trait"] for name in self.names}
+        return JunctionTree.compile(self).probabilities(evidence)
+
+
+class Bucket():
+    """
+    Bucket of `variable` in a `JunctionTree`, over `variables`, which
+    start with it. `potential` is the product of the network factors
+    first eliminated with `variable`, `parent` the index of the bucket
+    its message goes to, or None, and the trait of every person in
+    `people` is applied to it as evidence.
+    """
+
+    def __init__(self, variable, variables, potential, parent, people):
+        self.variable = variable
+        self.variables = variables
+        self.potential = potential
+        self.parent = parent
+        self.people = people
+        self.children = []
+
+        # Gene count of every person of the bucket in each entry,
+        # and the entry of the message over all variables but the first
+        self.columns = {name: projection(variables, [name]) for name in variables}
+        self.separator = variables[1:]
+        self.upward = projection(variables, self.separator)
+
+
+class JunctionTree():
+    """
+    Buckets of variable elimination over a family `Network`, compiled
+    once without any trait evidence and queried with any.
+
+    Variables are eliminated in `Network.elimination_order`. Every
+    bucket holds the network factors first eliminated with its
+    variable, over every variable they and the messages it receives
+    involve. Its message goes to the bucket of the first variable
+    eliminated after it in the message's scope, forming a tree. A query
+    passes messages up that tree and back down, once each, over tables
+    precomputed here, so it takes time linear in the compiled size.
+
+    `names` lists the people in the order of the family,
+    `traits[genes][trait]` is the probability of the trait given the
+    number of copies of the gene, and `key` is the `Network.key` of the
+    network compiled.
+    """
+
+    def __init__(self, names, buckets, traits, key):
+        self.names = names
+        self.buckets = buckets
+        self.traits = traits
+        self.key = key
+        self.index = {bucket.variable: i for i, bucket in enumerate(buckets)}
+
+        # Entry of the parent's table in the message every bucket sends
+        self.downward = {}
+        for i, bucket in enumerate(buckets):
+            if bucket.parent is not None:
+                parent = buckets[bucket.parent]
+                parent.children.append(i)
+                self.downward[i] = projection(parent.variables, bucket.separator)
+
+    @classmethod
+    def compile(cls, network):
+        """
+        Compile the junction tree of `network`.
+        """
+        order = network.elimination_order()
+        position = {name: i for i, name in enumerate(order)}
+        first = {factor: min(factor.variables, key=position.__getitem__)
+                 for factor in network.factors}
+
+        scopes = {name: {name} for name in order}
+        for factor in network.factors:
+            scopes[first[factor]].update(factor.variables)
+
+        buckets = []
+        for i, name in enumerate(order):
+            variables = [name] + sorted(scopes[name] - {name}, key=position.__getitem__)
+            factors = [factor for factor in network.factors if first[factor] == name]
+            potential = product([Factor(variables, [1] * GENES ** len(variables))] + factors)
+            parent = position[variables[1]] if len(variables) > 1 else None
+            if parent is not None:
+                scopes[variables[1]].update(variables[1:])
+            people = [factor.variables[-1] for factor in factors]
+            buckets.append((name, variables, potential.values, parent, people))
+
+        traits = [[network.probs["trait"][genes][trait] for trait in (False, True)]
+                  for genes in range(GENES)]
+        return cls(network.names, [Bucket(*bucket) for bucket in buckets],
+                   traits, network.key())
+
+    def size(self):
+        """
+        Returns the number of entries of all tables of the tree.
+        """
+        return sum(len(bucket.potential) for bucket in self.buckets)
+
+    def query(self, evidence):
+        """
+        Returns the distribution of the number of copies of the gene
+        every person has, given `evidence`, a dictionary of the known
+        traits of any people, as a dictionary of lists indexed by
+        number of copies.
+        """
+        # Potentials with the evidence applied
+        local = []
+        for bucket in self.buckets:
+            values = bucket.potential
+            for name in bucket.people:
+                trait = evidence.get(name)
+                if trait is not None:
+                    likelihood = [self.traits[genes][trait] for genes in range(GENES)]
+                    values = list(map(mul, values,
+                                      map(likelihood.__getitem__, bucket.columns[name])))
+            local.append(values)
+
+        # Upward pass, in elimination order
+        upward = [None] * len(self.buckets)
+        for i, bucket in enumerate(self.buckets):
+            values = local[i]
+            for child in bucket.children:
+                values = list(map(mul, values,
+                                  map(upward[child].__getitem__, self.downward[child])))
+            upward[i] = accumulate(values, bucket.upward, GENES ** len(bucket.separator))
+
+        # Downward pass, from the last bucket. Products of the messages
+        # from all children but one come from prefix and suffix products.
+        downward = [None] * len(self.buckets)
+        marginals = {}
+        for i in reversed(range(len(self.buckets))):
+            bucket = self.buckets[i]
+            values = local[i]
+            if downward[i] is not None:
+                values = list(map(mul, values, map(downward[i].__getitem__, bucket.upward)))
+            incoming = [list(map(upward[child].__getitem__, self.downward[child]))
+                        for child in bucket.children]
+            prefixes = [values]
+            for message in incoming:
+                prefixes.append(list(map(mul, prefixes[-1], message)))
+            suffix = None
+            for j in reversed(range(len(incoming))):
+                child = bucket.children[j]
+                others = prefixes[j] if suffix is None else list(map(mul, prefixes[j], suffix))
+                downward[child] = accumulate(others, self.downward[child],
+                                             GENES ** len(self.buckets[child].separator))
+                suffix = incoming[j] if suffix is None else list(map(mul, suffix, incoming[j]))
+            marginals[bucket.variable] = accumulate(
+                prefixes[-1], bucket.columns[bucket.variable], GENES)
+        return marginals
+
+    def probabilities(self, evidence):
+        """
+        Returns the gene and trait distribution of every person given
+        `evidence`, as for `query`, in the format `main` prints.
+        """
+        return probabilities(self.names, self.query(evidence), evidence, self.traits)
+
+
+def probabilities(names, marginals, evidence, traits):
+    """
+    Returns the gene and trait distribution of every person in `names`
+    in the format `main` prints, given the distribution of their genes
+    in `marginals`, the known traits in `evidence` and the probability
+    `traits[genes][trait]` of a trait given the number of genes.
+    """
+    result = {}
+    for name in names:
+        genes = marginals[name]
+        trait = evidence.get(name)
+        if trait is None:
+            has_trait = sum(genes[count] * traits[count][True] for count in range(GENES))
+        else:
+            has_trait = 1.0 if trait else 0.0
+        result[name] = {
+            "gene": {count: genes[count] for count in (2, 1, 0)},
+            "trait": {True: has_trait, False: 1 - has_trait},
+        }
+    return result
+
+
+def write_tree(tree, path):
+    """
+    Write a compiled junction tree to `path`.
+    """
+    data = {
+        "version": VERSION,
+        "key": tree.key,
+        "names": tree.names,
+        "traits": tree.traits,
+        "buckets": [[bucket.variables, bucket.potential, bucket.parent, bucket.people]
+                    for bucket in tree.buckets],
+    }
+    # Write to a temporary file first so readers never see a partial file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(temporary, path)
+
+
+def read_tree(path, key):
+    """
+    Read the junction tree at `path`.
+
+    Returns None if the file is missing, out of date, compiled from
+    a network with a different `key`, or corrupt.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data["version"] != VERSION or data["key"] != key:
+            return None
+        buckets = [Bucket(variables[0], variables, potential, parent, people)
+                   for variables, potential, parent, people in data["buckets"]]
+        return JunctionTree(data["names"], buckets, data["traits"], key)
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return None
+
+
+def load(network, path):
+    """
+    Load the junction tree of `network` from `path` if compiled from
+    the same network, otherwise compile it and write it there.
+    """
+    key = network.key()
+    tree = read_tree(path, key)
+    if tree is not None:
+        return tree
+
+    tree = JunctionTree.compile(network)
+    try:
+        write_tree(tree, path)
+    except OSError:
+        pass
+    return tree
@@ -0,0 +1,356 @@
+"""
+Approximate inference over the gene variables of a family by sampling
+"""
+
+import itertools
+import math
+import multiprocessing
+import os
+import random
+from operator import add, mul
+
+import network
+from network import GENES
+
+# Gibbs sweeps discarded from the start of every chain
+BURN_IN = 100
+
+# Likelihoods multiplied into sample weights between rescalings, few
+# enough that their product cannot underflow
+RESCALE_EVERY = 50
+
+# Offset in a 3x3 table of a parent's gene count, and square of a gene count
+THREE = tuple(3 * genes for genes in range(GENES))
+SQUARE = tuple(genes * genes for genes in range(GENES))
+
+
+def draw(weights, randoms):
+    """
+    Returns a gene count drawn for every chain, given the unnormalized
+    probability of each count in lists `weights` and a uniform random
+    number per chain.
+    """
+    w0, w1, w2 = weights
+    return [0 if r * (a + b + c) < a else 1 if r * (a + b + c) < a + b else 2
+            for a, b, c, r in zip(w0, w1, w2, randoms)]
+
+
+class Sampler():
+    """
+    Samples the gene variables of a family `Network` given known traits
+    with many independent chains moved together: every step updates one
+    person across all chains, so a step over the whole family takes
+    time linear in its size.
+    """
+
+    def __init__(self, model, rng=random):
+        self.model = model
+        self.rng = rng
+
+        probs = model.probs
+        people = model.people
+        self.prior = [probs["gene"][genes] for genes in range(GENES)]
+        self.traits = [[probs["trait"][genes][trait] for trait in (False, True)]
+                       for genes in range(GENES)]
+        inheritance = network.inheritance_table(probs["mutation"])
+
+        # Probability of every gene count of a child given those of its
+        # parents, indexed by 3 * mother's count + father's count, and of
+        # the child's count given the other parent's when a parent has
+        # `genes` copies, indexed by 3 * other parent's count + child's count
+        self.inheritance = [inheritance[genes::GENES] for genes in range(GENES)]
+        self.as_mother = [inheritance[9 * genes:9 * genes + 9] for genes in range(GENES)]
+        self.as_father = [
+            [inheritance[9 * other + 3 * genes + child]
+             for other in range(GENES) for child in range(GENES)]
+            for genes in range(GENES)
+        ]
+
+        self.parents = {}
+        self.children = {name: [] for name in model.names}
+        for name in model.names:
+            mother, father = people[name]["mother"], people[name]["father"]
+            if mother is not None and father is not None:
+                self.parents[name] = (mother, father)
+                self.children[mother].append((name, father, self.as_mother))
+                self.children[father].append((name, mother, self.as_father))
+
+        # Parents before their children
+        self.order = []
+        placed = set()
+        for name in model.names:
+            stack = [name]
+            while stack:
+                person = stack[-1]
+                waiting = [parent for parent in self.parents.get(person, ())
+                           if parent not in placed]
+                if waiting:
+                    stack.extend(waiting)
+                    continue
+                stack.pop()
+                if person not in placed:
+                    placed.add(person)
+                    self.order.append(person)
+
+    def randoms(self, chains):
+        """
+        Returns a uniform random number for every chain.
+        """
+        random = self.rng.random
+        return [random() for _ in range(chains)]
+
+    def forward(self, chains):
+        """
+        Returns the gene counts of every person in `chains` samples from
+        the network without evidence, as a dictionary of lists.
+        """
+        genes = {}
+        for name in self.order:
+            if name in self.parents:
+                mother, father = self.parents[name]
+                rows = list(map(add, map(THREE.__getitem__, genes[mother]), genes[father]))
+                weights = [list(map(table.__getitem__, rows)) for table in self.inheritance]
+            else:
+                weights = [[p] * chains for p in self.prior]
+            genes[name] = draw(weights, self.randoms(chains))
+        return genes
+
+    def weighting(self, evidence, samples, chains):
+        """
+        Estimates the gene distribution of every person by likelihood
+        weighting, drawing `samples` samples `chains` at a time from the
+        network and weighting each by the likelihood of `evidence`.
+
+        Returns the total weight of every gene count of every person,
+        the sum and sum of squares of all weights, and the log of the
+        scale all weights are relative to, as for `combine`.
+        """
+        result = empty_weighting(self.order)
+        observed = [(name, [self.traits[genes][trait] for genes in range(GENES)])
+                    for name, trait in evidence.items() if trait is not None]
+        while samples > 0:
+            count = min(chains, samples)
+            samples -= count
+            genes = self.forward(count)
+            weights = [1] * count
+            log_scale = 0
+            for i, (name, likelihood) in enumerate(observed):
+                weights = list(map(mul, weights, map(likelihood.__getitem__, genes[name])))
+                if i % RESCALE_EVERY == RESCALE_EVERY - 1:
+                    top = max(weights)
+                    weights = [weight / top for weight in weights]
+                    log_scale += math.log(top)
+            totals = {name: [sum(itertools.compress(weights, map(value.__eq__, genes[name])))
+                             for value in range(GENES)]
+                      for name in self.order}
+            result = combine(result, (totals, sum(weights),
+                                      sum(map(mul, weights, weights)), log_scale))
+        return result
+
+    def gibbs(self, evidence, sweeps, chains, burn_in=BURN_IN):
+        """
+        Estimates the gene distribution of every person by Gibbs sampling
+        `chains` chains started from samples of the network. Every sweep
+        draws each person's gene count given everyone else's, and the
+        `sweeps` after the first `burn_in` are counted.
+
+        Returns the number of samples of every gene count of every
+        person, and the sum and sum of squares of every person's gene
+        count in each chain.
+        """
+        genes = self.forward(chains)
+        likelihoods = {name: [self.traits[count][trait] for count in range(GENES)]
+                       for name, trait in evidence.items() if trait is not None}
+        counts = {name: [0] * GENES for name in self.order}
+        sums = {name: [0] * chains for name in self.order}
+        squares = {name: [0] * chains for name in self.order}
+
+        for sweep in range(burn_in + sweeps):
+            for name in self.order:
+                genes[name] = draw(self.conditional(name, genes, likelihoods, chains),
+                                   self.randoms(chains))
+            if sweep < burn_in:
+                continue
+            for name in self.order:
+                column = genes[name]
+                for value in range(GENES):
+                    counts[name][value] += column.count(value)
+                sums[name] = list(map(add, sums[name], column))
+                squares[name] = list(map(add, squares[name], map(SQUARE.__getitem__, column)))
+        return counts, sums, squares
+
+    def conditional(self, name, genes, likelihoods, chains):
+        """
+        Returns the unnormalized probability of every gene count of
+        person `name` in every chain, given everyone else's.
+        """
+        likelihood = likelihoods.get(name, (1,) * GENES)
+        if name in self.parents:
+            mother, father = self.parents[name]
+            rows = list(map(add, map(THREE.__getitem__, genes[mother]), genes[father]))
+        children = [(tables, list(map(add, map(THREE.__getitem__, genes[other]), genes[child])))
+                    for child, other, tables in self.children[name]]
+
+        weights = []
+        for value in range(GENES):
+            if name in self.parents:
+                w = list(map(self.inheritance[value].__getitem__, rows))
+                if likelihood[value] != 1:
+                    w = list(map(mul, w, itertools.repeat(likelihood[value])))
+            else:
+                w = [self.prior[value] * likelihood[value]] * chains
+            for tables, child_rows in children:
+                w = list(map(mul, w, map(tables[value].__getitem__, child_rows)))
+            weights.append(w)
+        return weights
+
+
+def empty_weighting(names):
+    """
+    Returns the result of likelihood weighting without any samples.
+    """
+    return {name: [0] * GENES for name in names}, 0, 0, 0
+
+
+def combine(first, second):
+    """
+    Returns the sum of two results of `Sampler.weighting`. Each holds
+    weights relative to a scale, exp(log scale), shared by all its
+    samples, and the sum is relative to the larger scale.
+    """
+    if not second[1]:
+        return first
+    if not first[1] or first[3] < second[3]:
+        first, second = second, first
+    totals, weight_sum, square_sum, log_scale = first
+    other_totals, other_weight_sum, other_square_sum, other_log_scale = second
+    factor = math.exp(other_log_scale - log_scale)
+    totals = {name: [total + other * factor
+                     for total, other in zip(totals[name], other_totals[name])]
+              for name in totals}
+    return (totals, weight_sum + other_weight_sum * factor,
+            square_sum + other_square_sum * factor * factor, log_scale)
+
+
+def effective_sample_size(weight_sum, square_sum):
+    """
+    Returns the number of unweighted samples about as accurate as
+    weighted samples with these sums of weights and squared weights.
+    """
+    return weight_sum * weight_sum / square_sum if square_sum else 0
+
+
+def potential_scale_reduction(sums, squares, draws):
+    """
+    Returns the Gelman-Rubin potential scale reduction of a quantity
+    from its sum and sum of squares in each of several chains of
+    `draws` samples: near 1 once the chains agree, larger while the
+    spread between chains exceeds the spread within them.
+    """
+    chains = len(sums)
+    if chains < 2 or draws < 2:
+        return math.inf
+    means = [total / draws for total in sums]
+    within = sum((square - draws * mean * mean) / (draws - 1)
+                 for square, mean in zip(squares, means)) / chains
+    mean = sum(means) / chains
+    between = draws * sum((m - mean) ** 2 for m in means) / (chains - 1)
+    if within <= 0:
+        return 1.0 if between <= 0 else math.inf
+    pooled = (draws - 1) / draws * within + between / draws
+    return math.sqrt(pooled / within)
+
+
+# Sampler used by pool worker processes, set by `init_worker`
+worker_sampler = None
+
+
+def init_worker(model):
+    """
+    Prepare a pool worker. Forked workers share the parent's network
+    copy-on-write instead of receiving a copy.
+    """
+    global worker_sampler
+    worker_sampler = Sampler(model)
+
+
+def worker_run(task):
+    """
+    Runs `Sampler.weighting` or `Sampler.gibbs` in a pool worker
+    with its own seed.
+    """
+    seed, method, args = task
+    worker_sampler.rng = random.Random(seed)
+    return getattr(worker_sampler, method)(*args)
+
+
+def run(model, method, args, chunks, processes=1, seed=None):
+    """
+    Returns the results of `Sampler.<method>(*args)` for every one of
+    `chunks`, a list of the numbers of samples or sweeps and chains of
+    each, each with its own seed, in a pool of `processes` worker
+    processes if more than one.
+    """
+    rng = random.Random(seed)
+    tasks = [(rng.getrandbits(64), method, (*args, *chunk)) for chunk in chunks]
+    if processes is not None and processes <= 1:
+        init_worker(model)
+        return [worker_run(task) for task in tasks]
+    context = multiprocessing.get_context(
+        "fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    with context.Pool(processes, initializer=init_worker, initargs=(model,)) as pool:
+        return pool.map(worker_run, tasks)
+
+
+def split(total, parts):
+    """
+    Returns `total` split into `parts` nearly equal positive parts.
+    """
+    parts = max(1, min(parts, total))
+    return [total // parts + (i < total % parts) for i in range(parts)]
+
+
+def likelihood_weighting(model, evidence, samples, chains=1000, processes=1, seed=None):
+    """
+    Returns the gene distribution of every person of `model` given the
+    traits in `evidence` estimated by likelihood weighting from
+    `samples` samples, drawn `chains` at a time in each of `processes`
+    worker processes, and the effective sample size.
+    """
+    chunks = [(count, min(chains, count))
+              for count in split(samples, processes or os.cpu_count() or 1)]
+    result = empty_weighting(model.names)
+    for chunk_result in run(model, "weighting", (evidence,), chunks, processes, seed):
+        result = combine(result, chunk_result)
+    totals, weight_sum, square_sum, _ = result
+    marginals = {name: [total / weight_sum for total in totals[name]] for name in totals}
+    return marginals, effective_sample_size(weight_sum, square_sum)
+
+
+def gibbs_sampling(model, evidence, samples, chains=100, processes=1, seed=None,
+                   burn_in=BURN_IN):
+    """
+    Returns the gene distribution of every person of `model` given the
+    traits in `evidence` estimated by Gibbs sampling with `chains`
+    chains, split between `processes` worker processes, counting about
+    `samples` samples in all after `burn_in` sweeps of each chain, and
+    the largest potential scale reduction of anyone's gene count.
+    """
+    chains = max(2, min(chains, samples))
+    sweeps = max(2, samples // chains)
+    chunks = [(sweeps, count)
+              for count in split(chains, processes or os.cpu_count() or 1)]
+    results = run(model, "gibbs", (evidence,), chunks, processes, seed)
+    counts = {name: [0] * GENES for name in model.names}
+    sums = {name: [] for name in model.names}
+    squares = {name: [] for name in model.names}
+    for chunk_counts, chunk_sums, chunk_squares in results:
+        for name in counts:
+            counts[name] = list(map(add, counts[name], chunk_counts[name]))
+            sums[name].extend(chunk_sums[name])
+            squares[name].extend(chunk_squares[name])
+    marginals = {name: [count / (sweeps * chains) for count in counts[name]]
+                 for name in counts}
+    reduction = max((potential_scale_reduction(sums[name], squares[name], sweeps)
+                     for name in model.names), default=1.0)
+    return marginals, reduction
@@ -0,0 +1,151 @@
+import copy
+import itertools
+import math
+import os
+import random
+import tempfile
+import unittest
+
+import heredity
+import network
+import sampling
+from families import random_family
+
+
+class TestHeredity(unittest.TestCase):
+    def assertProbabilitiesEqual(self, first, second):
+        self.assertEqual(list(first), list(second))
+        for person in first:
+            for field in ("gene", "trait"):
+                self.assertEqual(list(first[person][field]), list(second[person][field]))
+                for value in first[person][field]:
+                    self.assertAlmostEqual(first[person][field][value],
+                                           second[person][field][value], places=12)
+
+    def test_inheritance_table(self):
+        table = network.inheritance_table(heredity.PROBS["mutation"])
+        for i in range(0, len(table), 3):
+            self.assertAlmostEqual(sum(table[i:i + 3]), 1)
+        # Mother with 2 copies and father with none: exactly one passed on
+        self.assertAlmostEqual(table[2 * 9 + 0 * 3 + 1], 0.99 ** 2 + 0.01 ** 2)
+
+    def test_joint_probabilities(self):
+        people = random_family(6, related=0.5)
+        tables = heredity.state_tables(people)
+        batches = list(heredity.assignment_batches(people, size=100))
+        self.assertGreater(len(batches), 1)
+        for batch in batches:
+            p = heredity.joint_probabilities(people, tables, batch)
+            self.assertEqual(len(p), len(batch))
+            for i, varied in enumerate(itertools.product(*batch.domains)):
+                genes = dict(zip(people, batch.fixed + varied))
+                one_gene = {person for person in genes if genes[person] == 1}
+                two_genes = {person for person in genes if genes[person] == 2}
+                # Unknown traits are summed out
+                known = {person for person in people if people[person]["trait"]}
+                unknown = [person for person in people if people[person]["trait"] is None]
+                expected = sum(heredity.joint_probability(
+                    people, one_gene, two_genes, known | have_trait)
+                    for have_trait in heredity.powerset(unknown))
+                self.assertAlmostEqual(p[i], expected, places=15)
+
+    def test_eliminate_families(self):
+        for i in range(3):
+            people = heredity.load_data(f"data/family{i}.csv")
+            self.assertProbabilitiesEqual(heredity.eliminate_probabilities(people),
+                                          heredity.enumerate_probabilities(people))
+
+    def test_eliminate_related_parents(self):
+        # A child of siblings, whose network has a loop
+        people = {name: {"name": name, "mother": mother, "father": father, "trait": trait}
+                  for name, mother, father, trait in [
+                      ("Ann", None, None, None), ("Bob", None, None, False),
+                      ("Cat", "Ann", "Bob", None), ("Dan", "Ann", "Bob", True),
+                      ("Eve", "Cat", "Dan", True), ("Fay", "Cat", "Dan", None)]}
+        families = [people] + [random_family(7, seed, related=0.5) for seed in range(2)]
+        for people in families:
+            self.assertProbabilitiesEqual(heredity.eliminate_probabilities(people),
+                                          heredity.enumerate_probabilities(people))
+
+    def test_elimination_order(self):
+        model = network.Network(random_family(300), heredity.PROBS)
+        order = model.elimination_order()
+        self.assertEqual(sorted(order), sorted(model.names))
+        probabilities = model.probabilities()
+        for person in probabilities:
+            self.assertAlmostEqual(sum(probabilities[person]["gene"].values()), 1)
+
+    def test_query(self):
+        people = random_family(7, related=0.5)
+        tree = heredity.compile_family(people)
+        rng = random.Random(0)
+        for _ in range(3):
+            observed = copy.deepcopy(people)
+            for person in observed:
+                observed[person]["trait"] = rng.choice([None, True, False])
+            evidence = {person: observed[person]["trait"] for person in observed}
+            self.assertProbabilitiesEqual(heredity.query(tree, evidence),
+                                          heredity.enumerate_probabilities(observed))
+
+    def test_compiled_tree(self):
+        people = heredity.load_data("data/family1.csv")
+        evidence = {"Ron": True}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "family1.tree")
+            expected = heredity.query(heredity.compile_family(people, path), evidence)
+            tree = network.read_tree(path, network.Network(people, heredity.PROBS).key())
+            self.assertIsNotNone(tree)
+            self.assertProbabilitiesEqual(heredity.query(tree, evidence), expected)
+
+            # A tree compiled for other parents is out of date
+            people["Ron"]["father"] = people["Ron"]["mother"] = None
+            self.assertIsNone(network.read_tree(
+                path, network.Network(people, heredity.PROBS).key()))
+
+    def assertProbabilitiesClose(self, first, second, delta):
+        for person in first:
+            for field in ("gene", "trait"):
+                for value in first[person][field]:
+                    self.assertAlmostEqual(first[person][field][value],
+                                           second[person][field][value], delta=delta)
+
+    def test_likelihood_weighting(self):
+        people = heredity.load_data("data/family1.csv")
+        exact = heredity.eliminate_probabilities(people)
+        estimate, size = heredity.weighting_probabilities(people, 50000, seed=0)
+        self.assertGreater(size, 1000)
+        self.assertProbabilitiesClose(estimate, exact, 0.02)
+
+        # Each trait seen makes samples less alike in weight
+        for person in people:
+            people[person]["trait"] = True
+        _, fewer = heredity.weighting_probabilities(people, 50000, seed=0)
+        self.assertLess(fewer, size)
+
+        # Weights of hundreds of traits are rescaled rather than underflow
+        estimate, size = heredity.weighting_probabilities(random_family(300), 1000, seed=0)
+        self.assertGreaterEqual(size, 1)
+        for person in estimate:
+            self.assertAlmostEqual(sum(estimate[person]["gene"].values()), 1)
+
+    def test_gibbs_sampling(self):
+        people = random_family(30)
+        exact = heredity.eliminate_probabilities(people)
+        runs = [heredity.gibbs_probabilities(people, 10000, chains=100, processes=2, seed=0)
+                for _ in range(2)]
+        # Every chunk of chains is seeded, so runs with the same seed agree
+        self.assertEqual(runs[0], runs[1])
+        estimate, reduction = runs[0]
+        self.assertLess(reduction, 1.1)
+        self.assertProbabilitiesClose(estimate, exact, 0.05)
+
+    def test_potential_scale_reduction(self):
+        # Chains stuck at different values never agree
+        self.assertEqual(sampling.potential_scale_reduction([0, 20], [0, 40], 10), math.inf)
+        # Chains with equal means and spread agree
+        self.assertAlmostEqual(sampling.potential_scale_reduction(
+            [5, 5], [5, 5], 10), math.sqrt(0.9))
+
+
+if __name__ == "__main__":
+    unittest.main()
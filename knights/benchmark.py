@@ -0,0 +1,131 @@
+import argparse
+import itertools
+import sys
+import time
+
+import compiler
+import logic
+import sat
+from random_puzzles import random_puzzle
+
+
+def parse_args(argv):
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="benchmark.py")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    entail = subparsers.add_parser(
+        "entail", help="compare SAT and model checking on random puzzles")
+    entail.add_argument("--characters", type=int, nargs="+", default=[4, 6, 8, 25, 50, 100])
+    entail.add_argument("--statements", type=int, default=2,
+                        help="statements made by each character")
+    entail.add_argument("--max-enumerate", type=int, default=8,
+                        help="most characters to check by enumerating models")
+    entail.add_argument("--seed", type=int, default=0)
+
+    evaluate = subparsers.add_parser(
+        "evaluate", help="compare tree walking and compiled evaluation of every model")
+    evaluate.add_argument("--characters", type=int, nargs="+", default=[6, 8, 10])
+    evaluate.add_argument("--statements", type=int, default=2)
+    evaluate.add_argument("--max-tree", type=int, default=8,
+                          help="most characters to evaluate by walking the tree")
+    evaluate.add_argument("--width", type=int, default=compiler.WIDTH,
+                          help="models evaluated at a time, a power of two")
+    evaluate.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def solve(characters, entails):
+    """
+    Returns the kinds known of every character as a list of "knight",
+    "knave" or None, and the time it took.
+    """
+    start = time.perf_counter()
+    kinds = []
+    for knight, knave in characters:
+        if entails(knight):
+            kinds.append("knight")
+        elif entails(knave):
+            kinds.append("knave")
+        else:
+            kinds.append(None)
+    return kinds, time.perf_counter() - start
+
+
+def benchmark_entail(sizes, statements, max_enumerate, seed):
+    for size in sizes:
+        characters, knowledge = random_puzzle(size, statements, seed)
+        base = sat.KnowledgeBase(knowledge)
+        kinds, elapsed = solve(characters, base.entails)
+        known = sum(kind is not None for kind in kinds)
+        print(f"{size} characters: SAT {elapsed:.3f} s, {known} known, "
+              f"{base.solver.variables} variables, {len(base.solver.clauses)} clauses, "
+              f"{base.solver.conflicts} conflicts")
+        if size <= max_enumerate:
+            expected, elapsed = solve(
+                characters, lambda symbol: logic.model_check(knowledge, symbol))
+            if expected != kinds:
+                sys.exit(f"{size} characters: SAT and model checking disagree")
+            print(f"{size} characters: model checking {elapsed:.3f} s")
+
+
+def count_models(knowledge, symbols, method, width):
+    """
+    Returns the number of models of `symbols` in which `knowledge` is
+    true, evaluating the sentence tree, or compiled to a function of one
+    or `width` models at a time.
+    """
+    if method == "tree":
+        count = 0
+        for values in itertools.product([False, True], repeat=len(symbols)):
+            count += knowledge.evaluate(dict(zip(symbols, values)))
+        return count
+
+    program = compiler.Program(knowledge, symbols)
+    if method == "compiled":
+        return sum(map(program.evaluate, range(1 << len(symbols))))
+
+    words = compiler.lane_words(len(symbols), width)
+    mask = (1 << (1 << len(words))) - 1
+    varied = len(symbols) - len(words)
+    count = 0
+    for chunk in range(1 << varied):
+        chunk_words = words + [-(chunk >> i & 1) for i in range(varied)]
+        count += (program.evaluate_words(chunk_words) & mask).bit_count()
+    return count
+
+
+def benchmark_evaluate(sizes, statements, max_tree, width, seed):
+    for size in sizes:
+        characters, knowledge = random_puzzle(size, statements, seed)
+        symbols = [symbol.name for character in characters for symbol in character]
+        counts = {}
+        for method in ["tree", "compiled", "words"]:
+            if method == "tree" and size > max_tree:
+                continue
+            start = time.perf_counter()
+            counts[method] = count_models(knowledge, symbols, method, width)
+            elapsed = time.perf_counter() - start
+            print(f"{size} characters: {method} {elapsed:.3f} s, "
+                  f"{(1 << len(symbols)) / elapsed:,.0f} models/s")
+        if len(set(counts.values())) > 1:
+            sys.exit(f"{size} characters: evaluations disagree: {counts}")
+
+        start = time.perf_counter()
+        kinds, _ = solve(characters, lambda symbol: compiler.model_check(
+            knowledge, symbol, width))
+        print(f"{size} characters: compiled model checking {time.perf_counter() - start:.3f} s")
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.benchmark == "entail":
+        benchmark_entail(args.characters, args.statements, args.max_enumerate, args.seed)
+    elif args.benchmark == "evaluate":
+        benchmark_evaluate(args.characters, args.statements, args.max_tree, args.width, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+from logic import And, Biconditional, Implication, Not, Or, Sentence, Symbol
+
+# Number of models evaluated at a time by default, one per bit of a word.
+# Python integers are arbitrary precision, so a word may span many machine
+# words; per-operation overhead dominates until well past 64 bits.
+WIDTH = 1024
+
+
+class Program():
+    """
+    Logical sentence compiled to Python functions over integer-indexed
+    symbols, where symbol i is the one at index i of `symbols`.
+
+    `evaluate(model)` evaluates the sentence in a bit-packed model, an
+    integer whose bit i is set if symbol i is true. `evaluate_words(words)`
+    evaluates it in many models at once: words[i] has a bit set for
+    every model in which symbol i is true, and the result has a bit set
+    for every model in which the sentence is true. Bits of the result
+    beyond those of the words are undefined.
+
+    Every subsentence is evaluated once per call, however many times it
+    occurs in the sentence.
+    """
+
+    def __init__(self, sentence, symbols=None):
+        Sentence.validate(sentence)
+        self.symbols = sorted(sentence.symbols()) if symbols is None else list(symbols)
+        self.index = {name: i for i, name in enumerate(self.symbols)}
+
+        self.source = "\n".join([
+            "def evaluate(m):",
+            f"    return {self.expression(sentence)}",
+            "",
+            *self.words_source(sentence),
+        ])
+        namespace = {}
+        exec(compile(self.source, "<sentence>", "exec"), namespace)
+        self.evaluate = namespace["evaluate"]
+        self.evaluate_words = namespace["evaluate_words"]
+
+    def bit(self, symbol):
+        try:
+            return self.index[symbol.name]
+        except KeyError:
+            raise Exception(f"variable {symbol.name} not in model")
+
+    def expression(self, sentence):
+        """Returns a Python expression of `sentence` in bit-packed model `m`."""
+        if isinstance(sentence, Symbol):
+            return f"(m & {1 << self.bit(sentence)} != 0)"
+        if isinstance(sentence, Not):
+            return f"(not {self.expression(sentence.operand)})"
+        if isinstance(sentence, And):
+            if not sentence.conjuncts:
+                return "True"
+            return "({})".format(" and ".join(map(self.expression, sentence.conjuncts)))
+        if isinstance(sentence, Or):
+            if not sentence.disjuncts:
+                return "False"
+            return "({})".format(" or ".join(map(self.expression, sentence.disjuncts)))
+        if isinstance(sentence, Implication):
+            antecedent = self.expression(sentence.antecedent)
+            return f"(not {antecedent} or {self.expression(sentence.consequent)})"
+        if isinstance(sentence, Biconditional):
+            return f"({self.expression(sentence.left)} == {self.expression(sentence.right)})"
+        raise TypeError(f"cannot compile {type(sentence).__name__}")
+
+    def words_source(self, sentence):
+        """Returns the lines of `evaluate_words`, one per distinct subsentence."""
+        lines = ["def evaluate_words(w):"]
+        if self.symbols:
+            lines.append("    {}, = w".format(", ".join(f"s{i}" for i in range(len(self.symbols)))))
+        names = {}
+
+        def name(sentence):
+            if isinstance(sentence, Symbol):
+                return f"s{self.bit(sentence)}"
+            if id(sentence) in names:
+                return names[id(sentence)][1]
+            if isinstance(sentence, Not):
+                value = f"~{name(sentence.operand)}"
+            elif isinstance(sentence, And):
+                value = " & ".join(map(name, sentence.conjuncts)) or "-1"
+            elif isinstance(sentence, Or):
+                value = " | ".join(map(name, sentence.disjuncts)) or "0"
+            elif isinstance(sentence, Implication):
+                value = f"~{name(sentence.antecedent)} | {name(sentence.consequent)}"
+            elif isinstance(sentence, Biconditional):
+                value = f"~({name(sentence.left)} ^ {name(sentence.right)})"
+            else:
+                raise TypeError(f"cannot compile {type(sentence).__name__}")
+            # Keep the sentence so that its id is not reused
+            names[id(sentence)] = (sentence, f"t{len(names)}")
+            lines.append(f"    {names[id(sentence)][1]} = {value}")
+            return names[id(sentence)][1]
+
+        lines.append(f"    return {name(sentence)}")
+        return lines
+
+    def pack(self, model):
+        """Returns a dictionary model of symbol names to values as an integer."""
+        return sum(1 << i for i, name in enumerate(self.symbols) if model[name])
+
+
+def lane_words(count, width=WIDTH):
+    """
+    Returns words for the first `count` symbols in which the bits of
+    each word, up to `width` of them, take every combination of values.
+    """
+    bits = min(count, width.bit_length() - 1)
+    lanes = (1 << (1 << bits)) - 1
+    words = []
+    for i in range(bits):
+        # Blocks of 2^i unset then 2^i set bits, repeated across the lanes
+        block = 1 << (i + 1)
+        words.append(lanes // ((1 << block) - 1) * (((1 << (block >> 1)) - 1) << (block >> 1)))
+    return words
+
+
+def model_check(knowledge, query, width=WIDTH):
+    """
+    Checks if knowledge base entails query, like `logic.model_check`,
+    evaluating `width` models at a time, a power of two.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    counterexample = Program(And(knowledge, Not(query)), symbols).evaluate_words
+
+    # The first symbols vary across the bits of a word, and the others
+    # between words in Gray code order, so one word changes at a time
+    words = lane_words(len(symbols), width)
+    mask = (1 << (1 << len(words))) - 1
+    varied = len(symbols) - len(words)
+    words.extend([0] * varied)
+    for chunk in range(1 << varied):
+        if chunk:
+            words[len(symbols) - varied + (chunk & -chunk).bit_length() - 1] ^= -1
+        if counterexample(words) & mask:
+            return False
+    return True
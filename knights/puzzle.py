@@ -1,3 +1,8 @@
+import argparse
+import sys
+
+import compiler
+import sat
 from logic import *
 
 AKnight = Symbol("A is a Knight")
@@ -75,7 +80,18 @@ knowledge3 = And(
     knight_knave_implications(CKnight, CKnave, AKnight),
 )
 
+def parse_args(argv):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(prog="puzzle.py")
+    parser.add_argument("--solver", choices=["sat", "compiled", "enumerate"], default="sat",
+                        help="decide entailment with a SAT solver, by evaluating "
+                             "a compiled sentence in many models at a time, "
+                             "or by enumerating every model")
+    return parser.parse_args(argv)
+
+
 def main():
+    args = parse_args(sys.argv[1:])
     symbols = [AKnight, AKnave, BKnight, BKnave, CKnight, CKnave]
     puzzles = [
         ("Puzzle 0", knowledge0),
@@ -88,8 +104,15 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            # Encode the knowledge once for every query
+            if args.solver == "sat":
+                entails = sat.KnowledgeBase(knowledge).entails
+            elif args.solver == "compiled":
+                entails = lambda symbol: compiler.model_check(knowledge, symbol)
+            else:
+                entails = lambda symbol: model_check(knowledge, symbol)
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if entails(symbol):
                     print(f"    {symbol}")
 
 
@@ -0,0 +1,43 @@
+import random
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+from puzzle import knight_knave_implications, puzzle_constraints
+
+# Kinds of statement a character can make about a few others
+STATEMENTS = [
+    lambda knight, knave, others: knight[others[0]],
+    lambda knight, knave, others: knave[others[0]],
+    lambda knight, knave, others: Biconditional(knight[others[0]], knight[others[1]]),
+    lambda knight, knave, others: Not(Biconditional(knight[others[0]], knight[others[1]])),
+    lambda knight, knave, others: Or(*(knave[other] for other in others)),
+    lambda knight, knave, others: And(*(knight[other] for other in others)),
+    lambda knight, knave, others: Implication(knight[others[0]], knave[others[1]]),
+]
+
+
+def random_puzzle(characters, statements=2, seed=0):
+    """
+    Returns the knight and knave symbols of every character of a random
+    knights and knaves puzzle, and its knowledge. Each character makes
+    `statements` statements about up to three others, true if a knight
+    and false if a knave of a hidden assignment.
+    """
+    rng = random.Random(seed)
+    knight = [Symbol(f"{i} is a Knight") for i in range(characters)]
+    knave = [Symbol(f"{i} is a Knave") for i in range(characters)]
+    hidden = {}
+    for i in range(characters):
+        hidden[knight[i].name] = rng.random() < 0.5
+        hidden[knave[i].name] = not hidden[knight[i].name]
+
+    knowledge = And(*(puzzle_constraints(knight[i], knave[i]) for i in range(characters)))
+    for i in range(characters):
+        for _ in range(statements):
+            others = rng.sample(range(characters), min(3, characters))
+            # Keep drawing until the statement is as true as its speaker
+            while True:
+                statement = rng.choice(STATEMENTS)(knight, knave, others)
+                if statement.evaluate(hidden) == hidden[knight[i].name]:
+                    break
+            knowledge.add(knight_knave_implications(knight[i], knave[i], statement))
+    return list(zip(knight, knave)), knowledge
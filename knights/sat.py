@@ -0,0 +1,335 @@
+import heapq
+
+from logic import And, Biconditional, Implication, Not, Or, Sentence, Symbol
+
+# Activity of a variable is bumped by a growing increment, so that
+# recent conflicts count for more; all activities are rescaled if large
+DECAY = 0.95
+RESCALE = 1e100
+
+
+class Solver():
+    """
+    CDCL SAT solver over clauses of integer literals, where variable v
+    is the literal v when true and -v when false.
+
+    Clauses are watched on their first two literals, so that a clause is
+    only visited when one of its watched literals becomes false. Each
+    conflict is analysed back to its first unique implication point, the
+    learned clause added, and the search jumps back to the level where
+    that clause becomes unit. Clauses and learned clauses are kept
+    between calls to `solve`, so a formula can be queried many times
+    under different assumptions.
+    """
+
+    def __init__(self):
+        self.variables = 0
+        self.clauses = []
+        self.learned = 0
+        self.watches = {}
+        self.value = {}
+        self.level = {}
+        self.reason = {}
+        self.trail = []
+        self.trail_lim = []
+        self.head = 0
+        self.activity = {}
+        self.increment = 1
+        self.phase = {}
+        self.order = []
+        self.ok = True
+        self.conflicts = 0
+        self.decisions = 0
+
+    def new_variable(self):
+        """Returns a new variable."""
+        self.variables += 1
+        v = self.variables
+        self.watches[v] = []
+        self.watches[-v] = []
+        self.activity[v] = 0
+        self.phase[v] = False
+        heapq.heappush(self.order, (0, v))
+        return v
+
+    def add_clause(self, literals):
+        """Adds the disjunction of `literals`; returns False if now unsatisfiable."""
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        clause = []
+        for lit in dict.fromkeys(literals):
+            if -lit in clause or self.value.get(lit) is True:
+                return True
+            if self.value.get(lit) is None:
+                clause.append(lit)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watch(clause)
+        return self.ok
+
+    def watch(self, clause):
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def assign(self, lit, reason):
+        v = abs(lit)
+        self.value[lit] = True
+        self.value[-lit] = False
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        """Assigns every literal implied by a unit clause; returns a conflicting clause or None."""
+        value, watches = self.value, self.watches
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watching = watches[false]
+            kept = []
+            for i, clause in enumerate(watching):
+                # Keep the false literal second
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], false
+                first = clause[0]
+                if value.get(first) is True:
+                    kept.append(clause)
+                    continue
+
+                # Watch another literal that is not false instead if any
+                for k in range(2, len(clause)):
+                    if value.get(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], false
+                        watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if value.get(first) is False:
+                        kept.extend(watching[i + 1:])
+                        watches[false] = kept
+                        return clause
+                    self.assign(first, clause)
+            watches[false] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the clause learned from a conflict, with the literal it
+        asserts first, and the level to jump back to.
+        """
+        level = len(self.trail_lim)
+        seen = set()
+        learned = [None]
+        count = 0
+        index = len(self.trail) - 1
+        clause = conflict
+        lit = None
+        while True:
+            for q in (clause if lit is None else clause[1:]):
+                v = abs(q)
+                if v not in seen and self.level[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if self.level[v] == level:
+                        count += 1
+                    else:
+                        learned.append(q)
+
+            # Resolve with the reason of the latest literal at this level seen
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            count -= 1
+            if count == 0:
+                break
+            clause = self.reason[abs(lit)]
+        learned[0] = -lit
+        self.increment /= DECAY
+
+        if len(learned) == 1:
+            return learned, 0
+        # Watch the literal assigned last besides the asserted one
+        second = max(range(1, len(learned)), key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[second] = learned[second], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def bump(self, v):
+        self.activity[v] += self.increment
+        if self.activity[v] > RESCALE:
+            for u in self.activity:
+                self.activity[u] /= RESCALE
+            self.increment /= RESCALE
+            self.order = [(-self.activity[u], u) for u in self.activity
+                          if u not in self.reason]
+            heapq.heapify(self.order)
+        elif v not in self.reason:
+            heapq.heappush(self.order, (-self.activity[v], v))
+
+    def backtrack(self, level):
+        """Undoes every assignment above `level`."""
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            v = abs(lit)
+            self.phase[v] = lit > 0
+            del self.value[lit], self.value[-lit], self.level[v], self.reason[v]
+            heapq.heappush(self.order, (-self.activity[v], v))
+        del self.trail[start:], self.trail_lim[level:]
+        self.head = len(self.trail)
+
+    def decide(self):
+        """Returns the unassigned variable of highest activity, or None."""
+        while self.order:
+            activity, v = heapq.heappop(self.order)
+            if v not in self.reason and -activity == self.activity[v]:
+                return v
+        return None
+
+    def solve(self, assumptions=()):
+        """Returns whether the clauses are satisfiable with every literal in `assumptions` true."""
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.watch(learned)
+                    self.learned += 1
+                    self.assign(learned[0], learned)
+                continue
+
+            # Decide the assumptions first, one level each
+            level = len(self.trail_lim)
+            if level < len(assumptions):
+                lit = assumptions[level]
+                if self.value.get(lit) is False:
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if self.value.get(lit) is None:
+                    self.assign(lit, None)
+                continue
+
+            v = self.decide()
+            if v is None:
+                return True
+            self.decisions += 1
+            self.trail_lim.append(len(self.trail))
+            self.assign(v if self.phase[v] else -v, None)
+
+    def model(self):
+        """Returns the value of every variable after a satisfiable `solve`."""
+        return {v: self.value.get(v) is True for v in range(1, self.variables + 1)}
+
+
+class KnowledgeBase():
+    """
+    Knowledge base of logical sentences converted to CNF for a `Solver`.
+
+    Every subsentence is given a variable equivalent to it by Tseitin
+    encoding, so the clauses grow linearly with the sentences, and each
+    distinct object is only encoded once. Sentences added as knowledge
+    are asserted directly where they are conjunctions or disjunctions.
+    """
+
+    def __init__(self, knowledge=None):
+        self.solver = Solver()
+        self.symbols = {}
+        self.literals = {}
+        self.true = None
+        if knowledge is not None:
+            self.add(knowledge)
+
+    def symbol(self, name):
+        """Returns the variable of the symbol called `name`."""
+        if name not in self.symbols:
+            self.symbols[name] = self.solver.new_variable()
+        return self.symbols[name]
+
+    def constant(self):
+        """Returns a literal that is always true."""
+        if self.true is None:
+            self.true = self.solver.new_variable()
+            self.solver.add_clause([self.true])
+        return self.true
+
+    def literal(self, sentence):
+        """Returns a literal equivalent to `sentence`, adding clauses defining it."""
+        if isinstance(sentence, Symbol):
+            return self.symbol(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if id(sentence) in self.literals:
+            return self.literals[id(sentence)][1]
+
+        add = self.solver.add_clause
+        if isinstance(sentence, (And, Or)):
+            operands = sentence.conjuncts if isinstance(sentence, And) else sentence.disjuncts
+            if not operands:
+                x = self.constant()
+                x = x if isinstance(sentence, And) else -x
+            elif len(operands) == 1:
+                x = self.literal(operands[0])
+            else:
+                # An Or is the negation of an And of the negated operands
+                sign = 1 if isinstance(sentence, And) else -1
+                children = [sign * self.literal(operand) for operand in operands]
+                x = self.solver.new_variable()
+                for child in children:
+                    add([-x, child])
+                add([x, *(-child for child in children)])
+                x *= sign
+        elif isinstance(sentence, Implication):
+            x = self.literal(Or(Not(sentence.antecedent), sentence.consequent))
+        elif isinstance(sentence, Biconditional):
+            a, b = self.literal(sentence.left), self.literal(sentence.right)
+            x = self.solver.new_variable()
+            add([-x, -a, b])
+            add([-x, a, -b])
+            add([x, a, b])
+            add([x, -a, -b])
+        else:
+            Sentence.validate(sentence)
+            raise TypeError(f"cannot encode {type(sentence).__name__}")
+
+        # Keep the sentence so that its id is not reused
+        self.literals[id(sentence)] = (sentence, x)
+        return x
+
+    def add(self, sentence):
+        """Adds `sentence` to the knowledge base."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.solver.add_clause([self.literal(disjunct) for disjunct in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            self.solver.add_clause([-self.literal(sentence.antecedent),
+                                    self.literal(sentence.consequent)])
+        else:
+            self.solver.add_clause([self.literal(sentence)])
+
+    def entails(self, query):
+        """Checks if the knowledge base entails `query`."""
+        return not self.solver.solve([-self.literal(query)])
+
+
+def model_check(knowledge, query):
+    """Checks if knowledge base entails query, like `logic.model_check`."""
+    return KnowledgeBase(knowledge).entails(query)
@@ -0,0 +1,123 @@
+import itertools
+import random
+import unittest
+
+import compiler
+import logic
+import sat
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+from random_puzzles import random_puzzle
+
+
+def random_sentence(rng, symbols, depth):
+    """Returns a random sentence over `symbols` nested up to `depth` deep."""
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(symbols)
+    kind = rng.choice([Not, And, Or, Implication, Biconditional])
+    if kind is Not:
+        return Not(random_sentence(rng, symbols, depth - 1))
+    if kind in (And, Or):
+        return kind(*(random_sentence(rng, symbols, depth - 1)
+                      for _ in range(rng.randint(1, 3))))
+    return kind(random_sentence(rng, symbols, depth - 1),
+                random_sentence(rng, symbols, depth - 1))
+
+
+class TestSat(unittest.TestCase):
+    def test_random_clauses(self):
+        # Random 3-SAT around the threshold where half are satisfiable
+        rng = random.Random(0)
+        results = set()
+        for _ in range(100):
+            clauses = [[rng.choice([-1, 1]) * v for v in rng.sample(range(1, 11), 3)]
+                       for _ in range(43)]
+            solver = sat.Solver()
+            for _ in range(10):
+                solver.new_variable()
+            for clause in clauses:
+                solver.add_clause(clause)
+            satisfiable = solver.solve()
+            results.add(satisfiable)
+            if satisfiable:
+                model = solver.model()
+                self.assertTrue(all(any(model[abs(lit)] == (lit > 0) for lit in clause)
+                                    for clause in clauses))
+            else:
+                self.assertFalse(any(
+                    all(any(values[abs(lit) - 1] == (lit > 0) for lit in clause)
+                        for clause in clauses)
+                    for values in itertools.product([False, True], repeat=10)))
+        self.assertEqual(results, {False, True})
+
+    def test_pigeonhole(self):
+        # 6 pigeons never fit in 5 holes, one to a hole
+        solver = sat.Solver()
+        holes = [[solver.new_variable() for _ in range(5)] for _ in range(6)]
+        for pigeon in holes:
+            solver.add_clause(pigeon)
+        for hole in range(5):
+            for first, second in itertools.combinations(holes, 2):
+                solver.add_clause([-first[hole], -second[hole]])
+        self.assertFalse(solver.solve())
+        self.assertGreater(solver.learned, 0)
+
+    def test_assumptions(self):
+        solver = sat.Solver()
+        a, b = solver.new_variable(), solver.new_variable()
+        solver.add_clause([-a, b])
+        self.assertFalse(solver.solve([a, -b]))
+        self.assertTrue(solver.solve([a]))
+        self.assertTrue(solver.model()[b])
+        # Failing under assumptions leaves the clauses satisfiable
+        self.assertTrue(solver.solve())
+
+    def test_model_check(self):
+        rng = random.Random(0)
+        symbols = [Symbol(name) for name in "ABCD"]
+        for _ in range(300):
+            knowledge = random_sentence(rng, symbols, 3)
+            query = random_sentence(rng, symbols, 2)
+            self.assertEqual(sat.model_check(knowledge, query),
+                             logic.model_check(knowledge, query))
+
+    def test_puzzle(self):
+        characters, knowledge = random_puzzle(5)
+        base = sat.KnowledgeBase(knowledge)
+        for knight, knave in characters:
+            for symbol in (knight, knave):
+                self.assertEqual(base.entails(symbol), logic.model_check(knowledge, symbol))
+
+
+class TestCompiler(unittest.TestCase):
+    def test_evaluate(self):
+        rng = random.Random(0)
+        symbols = [Symbol(name) for name in "ABCDE"]
+        names = [symbol.name for symbol in symbols]
+        for _ in range(100):
+            sentence = random_sentence(rng, symbols, 4)
+            program = compiler.Program(sentence, names)
+            words = program.evaluate_words(compiler.lane_words(len(names), 32))
+            for values in itertools.product([False, True], repeat=len(names)):
+                model = dict(zip(names, values))
+                m = program.pack(model)
+                self.assertEqual(program.evaluate(m), sentence.evaluate(model))
+                self.assertEqual(words >> m & 1, sentence.evaluate(model))
+
+    def test_missing_symbol(self):
+        with self.assertRaisesRegex(Exception, "variable B not in model"):
+            compiler.Program(And(Symbol("A"), Symbol("B")), ["A"])
+
+    def test_model_check(self):
+        rng = random.Random(1)
+        symbols = [Symbol(name) for name in "ABCDEFGH"]
+        for _ in range(100):
+            knowledge = random_sentence(rng, symbols, 4)
+            query = random_sentence(rng, symbols, 2)
+            expected = logic.model_check(knowledge, query)
+            # Fewer models than symbols, and more, at a time
+            for width in (4, compiler.WIDTH):
+                self.assertEqual(compiler.model_check(knowledge, query, width), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
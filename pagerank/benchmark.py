@@ -0,0 +1,276 @@
+import argparse
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+
+import cache
+import crawler
+import pagerank
+import sampling
+from graph import LinkGraph, update_pagerank
+from sampling import Sampler
+
+DAMPING = 0.85
+
+
+def parse_args(argv):
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="benchmark.py")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    iterate = subparsers.add_parser(
+        "iterate", help="time power iteration on synthetic graphs")
+    iterate.add_argument("--nodes", type=int, nargs="+", default=[10 ** 4, 10 ** 5, 10 ** 6])
+    iterate.add_argument("--degree", type=int, default=8,
+                         help="mean number of links per page")
+    iterate.add_argument("--tolerance", type=float, default=1e-6)
+    iterate.add_argument("--seed", type=int, default=0)
+
+    sample = subparsers.add_parser(
+        "sample", help="compare random surfer samplers on a synthetic graph")
+    sample.add_argument("--nodes", type=int, default=10 ** 4)
+    sample.add_argument("--degree", type=int, default=8)
+    sample.add_argument("--samples", type=int, default=10 ** 6)
+    sample.add_argument("--walkers", type=int, nargs="+", default=[1, 100, 10000])
+    sample.add_argument("--seed", type=int, default=0)
+
+    converge = subparsers.add_parser(
+        "converge", help="time parallel sampling until an accuracy target")
+    converge.add_argument("--nodes", type=int, default=10 ** 4)
+    converge.add_argument("--degree", type=int, default=8)
+    converge.add_argument("--target", type=float, default=0.05,
+                          help="L1 distance from the iterative ranks to reach")
+    converge.add_argument("--processes", type=int, nargs="+",
+                          default=sorted({1, 2, os.cpu_count() or 1}))
+    converge.add_argument("--seed", type=int, default=0)
+
+    crawl = subparsers.add_parser(
+        "crawl", help="compare crawlers on a synthetic corpus of HTML files")
+    crawl.add_argument("--pages", type=int, default=10 ** 4)
+    crawl.add_argument("--degree", type=int, default=8)
+    crawl.add_argument("--processes", type=int, nargs="+",
+                       default=sorted({1, 2, os.cpu_count() or 1}))
+    crawl.add_argument("--seed", type=int, default=0)
+
+    update = subparsers.add_parser(
+        "update", help="compare incremental updates with cold solves after edits")
+    update.add_argument("--nodes", type=int, default=10 ** 5)
+    update.add_argument("--degree", type=int, default=8)
+    update.add_argument("--links", type=int, nargs="+", default=[1, 10, 100],
+                        help="numbers of links added in each edit")
+    update.add_argument("--tolerance", type=float, default=1e-6)
+    update.add_argument("--seed", type=int, default=0)
+
+    cached = subparsers.add_parser(
+        "cache", help="compare cold, cached and partly modified corpus runs")
+    cached.add_argument("--pages", type=int, default=10 ** 4)
+    cached.add_argument("--degree", type=int, default=8)
+    cached.add_argument("--modified", type=int, default=10,
+                        help="number of pages modified before the last run")
+    cached.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def random_edges(n, degree, rng, dangling=0.1):
+    """
+    Returns (sources, targets) arrays of random links between `n`
+    pages. A `dangling` fraction of pages have no links, and targets
+    are skewed towards low indices so that a few pages are popular.
+    """
+    sources, targets = array("q"), array("q")
+    for i in range(n):
+        if rng.random() < dangling:
+            continue
+        links = rng.randint(1, 2 * degree)
+        sources.extend([i] * links)
+        targets.extend([int(n * rng.random() ** 2) for _ in range(links)])
+    return sources, targets
+
+
+def benchmark_iterate(nodes, degree, tolerance, seed):
+    for n in nodes:
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        graph = LinkGraph.from_edges(list(range(n)), *random_edges(n, degree, rng))
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ranks, iterations = graph.pagerank(DAMPING, tolerance)
+        elapsed = time.perf_counter() - start
+        print(f"{n} pages, {len(graph.out_targets)} links: built in {built:.2f} s, "
+              f"{iterations} iterations in {elapsed:.2f} s "
+              f"({elapsed / iterations * 1000:.1f} ms per iteration), "
+              f"sum of ranks {sum(ranks):.6f}")
+
+
+def benchmark_sample(nodes, degree, samples, walkers, seed):
+    rng = random.Random(seed)
+    graph = LinkGraph.from_edges(list(range(nodes)), *random_edges(nodes, degree, rng))
+
+    # Sample as `transition_model` does, building the distribution every step
+    corpus = {page: {graph.pages[target] for target in graph.out_targets[
+        graph.out_offsets[page]:graph.out_offsets[page + 1]]} for page in graph.pages}
+    steps = min(samples, 1000)
+    page = rng.choice(graph.pages)
+    start = time.perf_counter()
+    for _ in range(steps):
+        model = pagerank.transition_model(corpus, page, DAMPING)
+        page = rng.choices(list(model.keys()), list(model.values()))[0]
+    elapsed = time.perf_counter() - start
+    print(f"transition model: {steps / elapsed:,.0f} samples per second")
+
+    sampler = Sampler(graph, DAMPING, rng)
+    for count in walkers:
+        start = time.perf_counter()
+        visits = sampler.sample(samples, count)
+        elapsed = time.perf_counter() - start
+        print(f"sampler, {count} walkers: {sum(visits) / elapsed:,.0f} samples per second")
+
+
+def benchmark_converge(nodes, degree, target, processes, seed):
+    rng = random.Random(seed)
+    graph = LinkGraph.from_edges(list(range(nodes)), *random_edges(nodes, degree, rng))
+    reference, _ = graph.pagerank(DAMPING)
+    for count in processes:
+        with sampling.make_pool(graph, DAMPING, count) as pool:
+            start = time.perf_counter()
+            for samples, distance, _ in sampling.converge(
+                    graph, DAMPING, reference, pool, target, max_samples=10 ** 9,
+                    round_samples=nodes * 10, chunks=count, seed=seed):
+                pass
+            elapsed = time.perf_counter() - start
+        print(f"{count} processes: L1 distance {distance:.4f} after {samples:,} samples "
+              f"in {elapsed:.2f} s")
+
+
+def write_corpus(directory, pages, degree, rng):
+    """
+    Write `pages` HTML files with random links and some text to `directory`.
+    """
+    sources, targets = random_edges(pages, degree, rng)
+    links = [[] for _ in range(pages)]
+    for source, target in zip(sources, targets):
+        links[source].append(target)
+    for i in range(pages):
+        with open(os.path.join(directory, f"{i}.html"), "w", encoding="utf-8") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<head><title>{i}</title></head>\n<body>\n")
+            for target in links[i]:
+                f.write(f"<p>{'Lorem ipsum dolor sit amet. ' * 20}</p>\n")
+                f.write(f'<a href="{target}.html">Page {target}</a>\n')
+            f.write("</body>\n</html>\n")
+
+
+def regex_crawl(directory):
+    """
+    Crawl by reading every file whole and matching links with
+    a regular expression, as `crawl` used to.
+    """
+    pages = dict()
+    for filename in os.listdir(directory):
+        if not filename.endswith(".html"):
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            contents = f.read()
+            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
+            pages[filename] = set(links) - {filename}
+    for filename in pages:
+        pages[filename] = set(link for link in pages[filename] if link in pages)
+    return pages
+
+
+def benchmark_crawl(pages, degree, processes, seed):
+    directory = tempfile.mkdtemp()
+    try:
+        write_corpus(directory, pages, degree, random.Random(seed))
+
+        start = time.perf_counter()
+        corpus = regex_crawl(directory)
+        graph = LinkGraph.from_corpus(corpus)
+        elapsed = time.perf_counter() - start
+        print(f"regex crawl and graph: {elapsed:.2f} s, {len(graph.out_targets)} links")
+
+        for count in processes:
+            start = time.perf_counter()
+            graph = crawler.crawl_graph(directory, count)
+            elapsed = time.perf_counter() - start
+            print(f"crawler, {count} processes: {elapsed:.2f} s, "
+                  f"{len(graph.out_targets)} links")
+    finally:
+        shutil.rmtree(directory)
+
+
+def benchmark_update(nodes, degree, links, tolerance, seed):
+    rng = random.Random(seed)
+    graph = LinkGraph.from_edges(list(range(nodes)), *random_edges(nodes, degree, rng))
+    ranks, _ = graph.pagerank(DAMPING, tolerance)
+
+    edits = [(f"{count} links added", {"added_links": [
+        (rng.randrange(nodes), rng.randrange(nodes)) for _ in range(count)]})
+        for count in links]
+    edits.append(("1 page added", {"added_pages": [nodes], "added_links": [(nodes, 0)]}))
+    for name, edit in edits:
+        start = time.perf_counter()
+        edited, _ = update_pagerank(graph, ranks, DAMPING, tolerance=tolerance, **edit)
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        edited.pagerank(DAMPING, tolerance)
+        cold = time.perf_counter() - start
+        print(f"{name}: update {elapsed:.2f} s, cold solve {cold:.2f} s")
+
+
+def benchmark_cache(pages, degree, modified, seed):
+    rng = random.Random(seed)
+    directory = tempfile.mkdtemp()
+    try:
+        write_corpus(directory, pages, degree, rng)
+
+        def run(name):
+            start = time.perf_counter()
+            corpus_cache = cache.CorpusCache(directory)
+            graph = corpus_cache.graph()
+            corpus_cache.iterate_pagerank(graph, DAMPING)
+            corpus_cache.save()
+            elapsed = time.perf_counter() - start
+            print(f"{name}: {elapsed:.2f} s, {corpus_cache.parsed} pages parsed")
+
+        start = time.perf_counter()
+        pagerank.iterate_pagerank(crawler.crawl_graph(directory), DAMPING)
+        elapsed = time.perf_counter() - start
+        print(f"uncached: {elapsed:.2f} s")
+
+        run("cold cache")
+        run("unchanged")
+        for i in rng.sample(range(pages), modified):
+            with open(os.path.join(directory, f"{i}.html"), "a", encoding="utf-8") as f:
+                f.write(f'<a href="{rng.randrange(pages)}.html">New</a>\n')
+        run(f"{modified} pages modified")
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.benchmark == "iterate":
+        benchmark_iterate(args.nodes, args.degree, args.tolerance, args.seed)
+    elif args.benchmark == "sample":
+        benchmark_sample(args.nodes, args.degree, args.samples, args.walkers, args.seed)
+    elif args.benchmark == "converge":
+        benchmark_converge(args.nodes, args.degree, args.target, args.processes, args.seed)
+    elif args.benchmark == "crawl":
+        benchmark_crawl(args.pages, args.degree, args.processes, args.seed)
+    elif args.benchmark == "update":
+        benchmark_update(args.nodes, args.degree, args.links, args.tolerance, args.seed)
+    elif args.benchmark == "cache":
+        benchmark_cache(args.pages, args.degree, args.modified, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import base64
+import hashlib
+import json
+import os
+from array import array
+
+import crawler
+from graph import LinkGraph, TOLERANCE, warm_pagerank
+
+# Bump whenever the cache layout changes
+VERSION = 1
+
+CACHE_NAME = ".pagerank.cache"
+
+
+def scan_file(path):
+    """
+    Returns the size, modification time, SHA-256 digest and sorted link
+    targets of the HTML file at `path`, reading it once a chunk at a time
+    and finding links as `crawler.extract_links` does.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        links = crawler.read_links(f, digest.update)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest.hexdigest(),
+        "links": sorted(links),
+    }
+
+
+def read_cache(path):
+    """
+    Read the cache file at `path`.
+
+    Returns None if the file is missing, out of date or corrupt.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data["version"] != VERSION:
+            return None
+        files = {page: {"size": int(entry["size"]),
+                        "mtime_ns": int(entry["mtime_ns"]),
+                        "sha256": str(entry["sha256"]),
+                        "links": [str(link) for link in entry["links"]]}
+                 for page, entry in data["files"].items()}
+        ranks = {}
+        for method, entry in data["ranks"].items():
+            pages, values = list(entry["pages"]), [float(rank) for rank in entry["ranks"]]
+            if len(pages) != len(values):
+                return None
+            ranks[method] = {"key": str(entry["key"]), "damping": float(entry["damping"]),
+                             "parameters": dict(entry["parameters"]),
+                             "pages": pages, "ranks": values}
+        graph = data.get("graph")
+        if graph is not None:
+            # Decode once to reject corrupt arrays before they are trusted
+            if len(decode_arrays(graph["arrays"])) != 4:
+                return None
+            graph = {"key": str(graph["key"]), "arrays": list(graph["arrays"])}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return {"version": VERSION, "files": files, "ranks": ranks, "graph": graph}
+
+
+def write_cache(data, path):
+    """
+    Write cache `data` to `path`.
+    """
+    # Write to a temporary file first so readers never see a partial file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(temporary, path)
+
+
+def corpus_key(files):
+    """
+    Returns a hash of the name and content hash of every page
+    of a dictionary of cached files.
+    """
+    hashes = json.dumps([[page, files[page]["sha256"]] for page in sorted(files)])
+    return hashlib.sha256(hashes.encode()).hexdigest()
+
+
+def encode_arrays(arrays):
+    """
+    Returns a list of the contents of integer arrays as base 64 strings.
+    """
+    return [base64.b64encode(values.tobytes()).decode("ascii") for values in arrays]
+
+
+def decode_arrays(strings):
+    """
+    Returns the integer arrays encoded by `encode_arrays`.
+    """
+    arrays = []
+    for string in strings:
+        values = array("q")
+        values.frombytes(base64.b64decode(string))
+        arrays.append(values)
+    return arrays
+
+
+class CorpusCache():
+    """
+    Parsed links and computed ranks of a corpus directory, kept in a
+    cache file inside it between runs.
+
+    Every page is stored with its size, modification time, content
+    hash and links. A page whose size and modification time are
+    unchanged is not read again, and one whose content hash is
+    unchanged is not parsed again. Ranks are stored per method
+    with the corpus key, a hash of every page's name and content
+    hash, and the damping factor and parameters used. The link graph
+    of the corpus is stored too, so that an unchanged corpus is not
+    rebuilt.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, CACHE_NAME)
+        data = read_cache(self.path) or {"files": {}, "ranks": {}}
+        self.files = data["files"]
+        self.stored_ranks = data["ranks"]
+        self.stored_graph = data.get("graph")
+        self.key = None
+        self.previous_key = None
+        self.changed = None
+        self.dangling = set()
+        self.parsed = 0
+
+    def graph(self, processes=1):
+        """
+        Returns the `LinkGraph` of the corpus, parsing only the pages
+        that are new or modified since the cache was written, with a
+        pool of `processes` worker processes if more than one.
+
+        Sets `changed` to the pages whose links may differ from the
+        cached ones, or None if pages were added or removed, `dangling`
+        to those of them that had no links to other pages, and `key`
+        and `previous_key` to the keys of the corpus and cached corpus.
+        """
+        stats = {entry.name: entry.stat() for entry in os.scandir(self.directory)
+                 if entry.name.endswith(".html")}
+        pages = sorted(stats)
+        stale = []
+        for page in pages:
+            entry = self.files.get(page)
+            if (entry is None or entry["size"] != stats[page].st_size
+                    or entry["mtime_ns"] != stats[page].st_mtime_ns):
+                stale.append(page)
+        scanned = crawler.map_files(
+            scan_file, [os.path.join(self.directory, page) for page in stale], processes)
+        self.parsed = len(stale)
+
+        previous = self.files
+        self.files = {page: previous[page] for page in pages if page in previous}
+        self.changed = set() if len(self.files) == len(previous) == len(pages) else None
+        for page, entry in zip(stale, scanned):
+            old = previous.get(page)
+            if self.changed is not None and old["sha256"] != entry["sha256"]:
+                self.changed.add(page)
+                self.changed.update(link for link in (*old["links"], *entry["links"])
+                                    if link in self.files)
+            self.files[page] = entry
+        self.dangling = set() if self.changed is None else {
+            page for page in self.changed if not any(
+                link != page and link in self.files for link in previous[page]["links"])}
+
+        self.previous_key = corpus_key(previous)
+        self.key = corpus_key(self.files)
+
+        if self.stored_graph is not None and self.stored_graph["key"] == self.key:
+            return LinkGraph(pages, *decode_arrays(self.stored_graph["arrays"]))
+
+        page_index = {page: i for i, page in enumerate(pages)}
+        sources, targets = crawler.link_arrays(
+            (self.files[page]["links"] for page in pages), page_index)
+        graph = LinkGraph.from_edges(pages, sources, targets)
+        self.stored_graph = {"key": self.key, "arrays": encode_arrays(
+            (graph.out_offsets, graph.out_targets, graph.in_offsets, graph.in_sources))}
+        return graph
+
+    def ranks(self, method, damping_factor, parameters, compute):
+        """
+        Returns the dictionary of ranks computed by `method` with
+        `damping_factor` and a dictionary of other `parameters` for the
+        corpus read by `graph`, from the cache if stored for the same
+        corpus, otherwise stored from `compute(previous)`, where
+        `previous` is the entry stored for an earlier version of the
+        corpus with the same settings, or None.
+        """
+        entry = self.stored_ranks.get(method)
+        if (entry is None or entry["damping"] != damping_factor
+                or entry["parameters"] != parameters):
+            entry = None
+        elif entry["key"] == self.key:
+            return dict(zip(entry["pages"], entry["ranks"]))
+
+        page_rank = compute(entry)
+        self.stored_ranks[method] = {
+            "key": self.key,
+            "damping": damping_factor,
+            "parameters": parameters,
+            "pages": list(page_rank),
+            "ranks": list(page_rank.values()),
+        }
+        return page_rank
+
+    def iterate_pagerank(self, graph, damping_factor, tolerance=TOLERANCE):
+        """
+        Returns the PageRank dictionary of `graph` by power iteration,
+        from the cache, or by updating the cached ranks of an earlier
+        version of the corpus as in `warm_pagerank` if there are any.
+        """
+        def compute(previous):
+            if previous is None:
+                ranks, _ = graph.pagerank(damping_factor, tolerance)
+            else:
+                # Changed pages are only known relative to the cached files
+                changed, dangling = None, ()
+                if previous["key"] == self.previous_key:
+                    changed, dangling = self.changed, self.dangling
+                ranks = warm_pagerank(graph, damping_factor,
+                                      dict(zip(previous["pages"], previous["ranks"])),
+                                      changed, dangling, tolerance)
+            return graph.to_dict(ranks)
+
+        return self.ranks("iterate", damping_factor, {"tolerance": tolerance}, compute)
+
+    def save(self):
+        """
+        Write the cache file, ignoring a directory that is not writable.
+        """
+        try:
+            write_cache({"version": VERSION, "files": self.files,
+                         "ranks": self.stored_ranks, "graph": self.stored_graph},
+                        self.path)
+        except OSError:
+            pass
@@ -0,0 +1,146 @@
+import codecs
+import html
+import multiprocessing
+import os
+import re
+from array import array
+
+from graph import LinkGraph
+
+# Bytes of HTML read and parsed at a time
+CHUNK_SIZE = 1 << 16
+
+
+class LinkParser():
+    """
+    Streaming tokenizer collecting the `href` targets of the `<a>` tags
+    of a page as it is fed, skipping comments, scripts and styles.
+
+    Input is split into markup tokens with a regular expression. A
+    token cut off at the end of the input fed so far is kept and
+    completed by the next chunk.
+    """
+
+    # Every alternative follows a literal "<", which keeps the scan fast
+    TOKEN = re.compile(r"""
+        <(?:
+            !--.*?-->                       # comment
+          | (script|style)\b.*?</\1\s*>      # raw text element
+          | a\s+href\s*=\s*"(?P<href>[^"&]*)"\s*>
+                                            # link start tag with only a plain href
+          | a(?=[\s/>])(?P<attributes>[^>]*)>
+                                            # any other link start tag
+          | (?P<partial>!--|(?:script|style)\b|(?![^>]*>))
+                                            # markup cut off by the end of the input
+        )
+    """, re.IGNORECASE | re.DOTALL | re.VERBOSE)
+
+    ATTRIBUTE = re.compile(r"""([^\s/>=]+)(?:\s*=\s*('[^']*'|"[^"]*"|[^\s>]*))?""")
+
+    def __init__(self):
+        self.links = set()
+        self.pending = ""
+
+    def feed(self, data):
+        data = self.pending + data
+        self.pending = ""
+        for match in self.TOKEN.finditer(data):
+            kind = match.lastgroup
+            if kind == "href":
+                self.links.add(match.group(kind))
+            elif kind == "attributes":
+                self.handle_attributes(match.group(kind))
+            elif kind == "partial":
+                self.pending = data[match.start():]
+                break
+
+    def handle_attributes(self, attributes):
+        for name, value in self.ATTRIBUTE.findall(attributes):
+            if name.lower() == "href" and value:
+                if value[0] in "'\"":
+                    value = value[1:-1]
+                self.links.add(html.unescape(value))
+
+    def close(self):
+        self.pending = ""
+
+
+def read_links(f, consume=None):
+    """
+    Returns the set of link targets in the HTML of binary file `f`,
+    decoding and parsing it a chunk at a time, and passing every
+    chunk read to `consume` too if given.
+    """
+    parser = LinkParser()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if consume is not None:
+            consume(chunk)
+        parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return parser.links
+
+
+def extract_links(path):
+    """
+    Returns the set of link targets in the HTML file at `path`.
+    """
+    with open(path, "rb") as f:
+        return read_links(f)
+
+
+def crawl_edges(directory, processes=1, chunksize=64):
+    """
+    Parse a directory of HTML pages with `extract_links`, using a pool
+    of `processes` worker processes if more than one.
+
+    Returns the sorted list of pages and parallel (sources, targets)
+    arrays of the page index of every link between two different
+    pages of the corpus.
+    """
+    pages = sorted(filename for filename in os.listdir(directory)
+                   if filename.endswith(".html"))
+    page_index = {page: i for i, page in enumerate(pages)}
+    paths = [os.path.join(directory, page) for page in pages]
+    page_links = map_files(extract_links, paths, processes, chunksize)
+    sources, targets = link_arrays(page_links, page_index)
+    return pages, sources, targets
+
+
+def map_files(function, paths, processes=1, chunksize=64):
+    """
+    Returns the list of results of `function` on every path, computed
+    by a pool of `processes` worker processes if more than one.
+    """
+    if processes <= 1:
+        return [function(path) for path in paths]
+    context = multiprocessing.get_context(
+        "fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    with context.Pool(processes) as pool:
+        return pool.map(function, paths, chunksize)
+
+
+def link_arrays(page_links, page_index):
+    """
+    Returns (sources, targets) arrays of the links to pages in
+    `page_index` from each page's set of links, in page order.
+    """
+    sources, targets = array("q"), array("q")
+    for source, links in enumerate(page_links):
+        links = sorted(page_index[link] for link in links if link in page_index)
+        for target in links:
+            if target != source:
+                sources.append(source)
+                targets.append(target)
+    return sources, targets
+
+
+def crawl_graph(directory, processes=1):
+    """
+    Returns the `LinkGraph` of a directory of HTML pages.
+    """
+    return LinkGraph.from_edges(*crawl_edges(directory, processes))
@@ -0,0 +1,319 @@
+from array import array
+from collections import deque
+from operator import mul, sub
+
+# Default L1 distance between successive rank vectors at which
+# power iteration stops, and the most iterations it runs
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
+
+class LinkGraph():
+    """
+    Compact directed graph of links between pages.
+
+    Pages are interned to dense integer indices, and links are stored
+    twice in compressed sparse row form: the pages linked to by page
+    `i` are `out_targets[out_offsets[i]:out_offsets[i + 1]]`, and the
+    pages linking to it are `in_sources[in_offsets[i]:in_offsets[i + 1]]`.
+    """
+
+    def __init__(self, pages, out_offsets, out_targets, in_offsets, in_sources):
+        self.pages = pages
+        self.out_offsets = out_offsets
+        self.out_targets = out_targets
+        self.in_offsets = in_offsets
+        self.in_sources = in_sources
+        self.page_index = {page: i for i, page in enumerate(pages)}
+
+    @classmethod
+    def from_edges(cls, pages, sources, targets):
+        """
+        Build a graph from a list of pages and parallel sequences of the
+        source and target index of each link. Links from a page to
+        itself and repeated links are dropped.
+        """
+        offsets, values = csr(len(pages), sources, targets)
+        sources, targets = array("q"), array("q")
+        for i in range(len(pages)):
+            links = set(values[offsets[i]:offsets[i + 1]])
+            links.discard(i)
+            sources.extend([i] * len(links))
+            targets.extend(sorted(links))
+
+        out_offsets, out_targets = csr(len(pages), sources, targets)
+        in_offsets, in_sources = csr(len(pages), targets, sources)
+        return cls(pages, out_offsets, out_targets, in_offsets, in_sources)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a graph from a dictionary mapping each page to the set
+        of pages it links to, as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        page_index = {page: i for i, page in enumerate(pages)}
+        sources, targets = array("q"), array("q")
+        for page in pages:
+            for link in corpus[page]:
+                if link in page_index:
+                    sources.append(page_index[page])
+                    targets.append(page_index[link])
+        return cls.from_edges(pages, sources, targets)
+
+    def out_degree(self, i):
+        """
+        Returns the number of pages linked to by page `i`.
+        """
+        return self.out_offsets[i + 1] - self.out_offsets[i]
+
+    def pagerank(self, damping_factor, tolerance=TOLERANCE,
+                 max_iterations=MAX_ITERATIONS, ranks=None):
+        """
+        Returns the PageRank of every page as a list indexed like
+        `pages`, and the number of iterations run.
+
+        Runs power iteration from `ranks`, or from a uniform
+        distribution, until the L1 distance between successive rank
+        vectors is below `tolerance` or `max_iterations` is reached.
+        Pages without links are treated as linking to every page, so
+        their rank is spread evenly in a single term.
+        """
+        n = len(self.pages)
+        if ranks is None:
+            ranks = [1 / n] * n
+        else:
+            ranks = list(ranks)
+
+        inverse_degrees = [1 / self.out_degree(i) if self.out_degree(i) else 0
+                           for i in range(n)]
+        dangling = [i for i in range(n) if not self.out_degree(i)]
+        in_ranges = list(zip(self.in_offsets, self.in_offsets[1:]))
+        in_sources = self.in_sources
+
+        iterations = 0
+        while iterations < max_iterations:
+            iterations += 1
+
+            # Rank passed along each link, gathered in order of link target
+            contributions = list(map(mul, ranks, inverse_degrees))
+            incoming = list(map(contributions.__getitem__, in_sources))
+
+            dangling_rank = sum(ranks[i] for i in dangling)
+            base = (1 - damping_factor) / n + damping_factor * dangling_rank / n
+            new_ranks = [base + damping_factor * sum(incoming[start:end])
+                         for start, end in in_ranges]
+
+            distance = sum(map(abs, map(sub, new_ranks, ranks)))
+            ranks = new_ranks
+            if distance < tolerance:
+                break
+
+        return ranks, iterations
+
+    def out_links(self, i):
+        """
+        Returns the indices of the pages linked to by page `i`.
+        """
+        return self.out_targets[self.out_offsets[i]:self.out_offsets[i + 1]]
+
+    def edit(self, added_pages=(), removed_pages=(), added_links=(), removed_links=()):
+        """
+        Returns a new graph with pages and (source, target) links, given
+        by page, added or removed. Removing a page removes its links.
+        Remaining pages keep their order, followed by added pages.
+
+        Only the rows of the pages whose links change are rebuilt;
+        the others are copied, renumbered if pages were removed.
+        """
+        removed_pages = {page for page in removed_pages if page in self.page_index}
+        pages = [page for page in self.pages if page not in removed_pages]
+        pages.extend(page for page in dict.fromkeys(added_pages)
+                     if page not in self.page_index and page not in removed_pages)
+        page_index = {page: i for i, page in enumerate(pages)}
+
+        # New index of every old page, or -1 if it was removed
+        renumber = array("q", [page_index.get(page, -1) for page in self.pages])
+        origins = array("q", [self.page_index.get(page, -1) for page in pages])
+
+        # Changed links by new index, per source and per target
+        out_changes, in_changes = {}, {}
+        for links, kind in ((removed_links, 0), (added_links, 1)):
+            for source, target in links:
+                if source in page_index and target in page_index and source != target:
+                    source, target = page_index[source], page_index[target]
+                    out_changes.setdefault(source, (set(), set()))[kind].add(target)
+                    in_changes.setdefault(target, (set(), set()))[kind].add(source)
+
+        out_offsets, out_targets = edit_rows(
+            self.out_offsets, self.out_targets, origins, renumber, out_changes, removed_pages)
+        in_offsets, in_sources = edit_rows(
+            self.in_offsets, self.in_sources, origins, renumber, in_changes, removed_pages)
+        return LinkGraph(pages, out_offsets, out_targets, in_offsets, in_sources)
+
+    def local_pagerank(self, damping_factor, ranks, changed, dangling=(),
+                       tolerance=TOLERANCE, max_updates=None):
+        """
+        Returns the PageRank of every page, starting from `ranks` for
+        a graph that differs from this one only in the links of the
+        pages in `changed`, of which those in `dangling` had no links,
+        and whether they converged within `max_updates` page updates.
+
+        Ranks are updated one page at a time from a queue holding
+        the changed pages and the pages they link to. A page whose
+        rank moves by more than `tolerance` / pages queues the pages
+        it links to, so updates stay near the change. Moving rank to
+        or from pages without links, including changed pages that gain
+        their first links or lose all of them, shifts every page evenly,
+        so all pages are queued once that shift adds up to `tolerance`.
+        """
+        n = len(self.pages)
+        ranks = list(ranks)
+        degrees = [self.out_degree(i) for i in range(n)]
+        inverse_degrees = [1 / degree if degree else 0 for degree in degrees]
+        in_offsets, in_sources = self.in_offsets, self.in_sources
+        threshold = tolerance / n
+
+        dangling_rank = sum(ranks[i] for i in range(n) if not degrees[i])
+        # Rank of the pages without links in the earlier graph, which
+        # `ranks` already spread to every page
+        dangling = set(dangling)
+        applied_dangling_rank = dangling_rank + sum(
+            ranks[i] * ((i in dangling) - (not degrees[i])) for i in changed)
+
+        queue = deque()
+        queued = bytearray(n)
+        if damping_factor * abs(dangling_rank - applied_dangling_rank) > tolerance:
+            applied_dangling_rank = dangling_rank
+            start = range(n)
+        else:
+            start = (i for page in changed for i in (page, *self.out_links(page)))
+        for i in start:
+            if not queued[i]:
+                queued[i] = 1
+                queue.append(i)
+
+        updates = 0
+        while queue:
+            if max_updates is not None and updates == max_updates:
+                return ranks, False
+            i = queue.popleft()
+            queued[i] = 0
+            updates += 1
+            sources = in_sources[in_offsets[i]:in_offsets[i + 1]]
+            incoming = sum(ranks[j] * inverse_degrees[j] for j in sources)
+            rank = (1 - damping_factor + damping_factor * dangling_rank) / n + damping_factor * incoming
+            change = rank - ranks[i]
+            if abs(change) <= threshold:
+                continue
+            ranks[i] = rank
+
+            if degrees[i]:
+                for j in self.out_links(i):
+                    if not queued[j]:
+                        queued[j] = 1
+                        queue.append(j)
+            else:
+                dangling_rank += change
+                if damping_factor * abs(dangling_rank - applied_dangling_rank) > tolerance:
+                    applied_dangling_rank = dangling_rank
+                    for j in range(n):
+                        if not queued[j]:
+                            queued[j] = 1
+                            queue.append(j)
+
+        return ranks, True
+
+    def to_dict(self, ranks):
+        """
+        Returns a dictionary mapping each page to its rank.
+        """
+        return dict(zip(self.pages, ranks))
+
+
+def edit_rows(offsets, values, origins, renumber, changes, renumbered):
+    """
+    Returns (offsets, values) compressed sparse row arrays for new rows
+    copied from the old row `origins[i]`, or empty if -1, with values
+    mapped through `renumber` if `renumbered`, dropping removed ones.
+    `changes` maps rows to the (removed, added) sets of values.
+    """
+    new_offsets, new_values = array("q", [0]), array("q")
+    for i, origin in enumerate(origins):
+        row = values[offsets[origin]:offsets[origin + 1]] if origin != -1 else array("q")
+        if renumbered:
+            row = array("q", [renumber[value] for value in row if renumber[value] != -1])
+        if i in changes:
+            removed, added = changes[i]
+            row = sorted((set(row) - removed) | added)
+        new_values.extend(row)
+        new_offsets.append(len(new_values))
+    return new_offsets, new_values
+
+
+def csr(size, rows, columns):
+    """
+    Returns (offsets, values) compressed sparse row arrays grouping
+    `columns` by their matching entry in `rows`, for rows 0 to size - 1.
+    """
+    offsets = array("q", [0]) * (size + 1)
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    position = offsets[:-1]
+    values = array("q", [0]) * len(columns)
+    for row, column in zip(rows, columns):
+        values[position[row]] = column
+        position[row] += 1
+    return offsets, values
+
+
+def update_pagerank(graph, ranks, damping_factor, added_pages=(), removed_pages=(),
+                    added_links=(), removed_links=(), tolerance=TOLERANCE):
+    """
+    Returns the edited graph and its PageRank, given the PageRank
+    `ranks` of `graph` and the pages and links added and removed.
+
+    The solve starts from the previous ranks. When only links change,
+    only the pages around them are updated, as in `local_pagerank`,
+    until that has cost about as much as a few iterations over the
+    whole graph. Adding or removing pages changes the rank every page
+    receives from random jumps, so then, or if the change spreads too
+    far, all pages are iterated from the ranks so far.
+    """
+    new_graph = graph.edit(added_pages, removed_pages, added_links, removed_links)
+    changed, dangling = None, ()
+    if new_graph.pages == graph.pages:
+        changed = {page for link in (*added_links, *removed_links) for page in link
+                   if page in new_graph.page_index}
+        dangling = {page for page in changed if not graph.out_degree(graph.page_index[page])}
+    return new_graph, warm_pagerank(new_graph, damping_factor, graph.to_dict(ranks),
+                                    changed, dangling, tolerance)
+
+
+def warm_pagerank(graph, damping_factor, previous, changed=None, dangling=(),
+                  tolerance=TOLERANCE):
+    """
+    Returns the PageRank of every page of `graph` as a list, starting
+    from `previous`, a dictionary of the ranks of an earlier version
+    of the graph. If it had the same pages, `changed` holds the pages
+    whose links may differ, and `dangling` those of them that had no
+    links; None means pages were added or removed.
+    """
+    n = len(graph.pages)
+    ranks = [previous.get(page, 1 / n) for page in graph.pages]
+
+    if changed is not None:
+        changed = [graph.page_index[page] for page in changed]
+        dangling = [graph.page_index[page] for page in dangling]
+        ranks, converged = graph.local_pagerank(
+            damping_factor, ranks, changed, dangling, tolerance, max_updates=n // 2)
+        if converged:
+            return ranks
+
+    total = sum(ranks)
+    ranks = [rank / total for rank in ranks]
+    ranks, _ = graph.pagerank(damping_factor, tolerance, ranks=ranks)
+    return ranks
@@ -1,21 +1,67 @@
-import os
-import random
-import re
+import argparse
 import sys
 
+import cache
+import crawler
+from graph import LinkGraph, MAX_ITERATIONS, TOLERANCE
+import sampling
+from sampling import Sampler
+
 DAMPING = 0.85
 SAMPLES = 10000
 
 
+def parse_args(argv):
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="pagerank.py")
+    parser.add_argument("corpus")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="number of pages to sample, or the most to "
+                             "sample when sampling in parallel")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="sample in parallel with this many worker processes, "
+                             "reporting the distance from the iterative ranks")
+    parser.add_argument("--target", type=float,
+                        help="sample in parallel until the L1 distance from "
+                             "the iterative ranks is at most this")
+    parser.add_argument("--crawlers", type=int, default=1,
+                        help="number of worker processes parsing pages")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="crawl and rank the corpus without reading or "
+                             "writing its cache file")
+    return parser.parse_args(argv)
+
+
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    args = parse_args(sys.argv[1:])
+    if args.no_cache:
+        corpus_cache = None
+        corpus = crawler.crawl_graph(args.corpus, args.crawlers)
+    else:
+        corpus_cache = cache.CorpusCache(args.corpus)
+        corpus = corpus_cache.graph(args.crawlers)
+
+    if args.processes > 1 or args.target is not None:
+        ranks, samples = converge_pagerank(corpus, DAMPING, args.samples,
+                                           args.processes, args.target)
+    elif corpus_cache is not None:
+        ranks = corpus_cache.ranks(
+            "sample", DAMPING, {"samples": args.samples},
+            lambda previous: sample_pagerank(corpus, DAMPING, args.samples))
+        samples = args.samples
+    else:
+        ranks, samples = sample_pagerank(corpus, DAMPING, args.samples), args.samples
+    print(f"PageRank Results from Sampling (n = {samples})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+
+    if corpus_cache is not None:
+        ranks = corpus_cache.iterate_pagerank(corpus, DAMPING)
+        corpus_cache.save()
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -27,25 +73,21 @@ def crawl(directory):
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
     """
-    pages = dict()
+    pages, sources, targets = crawler.crawl_edges(directory)
+    corpus = {page: set() for page in pages}
+    for source, target in zip(sources, targets):
+        corpus[pages[source]].add(pages[target])
+    return corpus
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
 
-    return pages
+def link_graph(corpus):
+    """
+    Returns the `LinkGraph` of a corpus, given either as a graph
+    or as a dictionary returned by `crawl`.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph.from_corpus(corpus)
 
 
 def transition_model(corpus, page, damping_factor):
@@ -80,76 +122,68 @@ def transition_model(corpus, page, damping_factor):
     return pages
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, walkers=1):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
 
+    Samples are split as evenly as possible between `walkers`
+    independent random surfers, each starting at a page chosen at
+    random, which are moved together one step at a time.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    page_visits = dict()
-    for k in corpus.keys():
-        page_visits[k] = 0
-
-    # Choose first page at random
-    page = random.choice(list(corpus.keys()))
-    page_visits[page] += 1
-
-    # Choose other pages according to the transition model
-    for _ in range(n - 1):
-        transition_prob = transition_model(corpus, page, damping_factor)
-        page = random.choices(list(transition_prob.keys()), list(transition_prob.values()))[0]
-        page_visits[page] += 1
+    graph = link_graph(corpus)
+    visits = Sampler(graph, damping_factor).sample(n, walkers)
 
     # Calculate PageRank
-    page_rank = {p: page_visits[p] / n for p in page_visits.keys()}
+    samples = sum(visits)
+    page_rank = graph.to_dict(count / samples for count in visits)
     assert 0.99 < sum(page_rank.values()) < 1.01
 
     return page_rank
 
 
-def iterate_pagerank(corpus, damping_factor):
+def converge_pagerank(corpus, damping_factor, max_samples, processes=None, target=None):
+    """
+    Return PageRank values for each page by sampling with random
+    surfers in parallel worker processes, printing the L1 distance
+    from the iterative PageRank values as samples accumulate.
+
+    Sampling stops once the distance is at most `target`, or after
+    about `max_samples` samples. Return the PageRank dictionary and
+    the number of samples taken.
+    """
+    graph = link_graph(corpus)
+    reference, _ = graph.pagerank(damping_factor)
+    round_samples = max(1000, max_samples // 10)
+    with sampling.make_pool(graph, damping_factor, processes) as pool:
+        for samples, distance, ranks in sampling.converge(
+                graph, damping_factor, reference, pool, target, max_samples,
+                round_samples, walkers=min(1000, round_samples), chunks=processes):
+            print(f"Samples: {samples}, L1 distance from iteration: {distance:.4f}")
+    return graph.to_dict(ranks), samples
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     max_iterations=MAX_ITERATIONS):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
 
+    Ranks are updated by power iteration over a sparse link graph
+    until the L1 distance between successive rank vectors is below
+    `tolerance`, or for at most `max_iterations` iterations.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    DIFF_THRESHOLD = 0.001
-
-    # Assign initial PageRank score
-    page_rank = dict()
-    initial_score = 1 / len(corpus)
-    for k in corpus.keys():
-        page_rank[k] = initial_score
-
-    # Update PageRank scores
-    damping_update_factor = (1 - damping_factor) / len(corpus)
-    while True:
-        new_page_rank = dict()
-        for page in corpus.keys():
-            new_page_rank[page] = damping_update_factor
-
-            for linking_page in corpus.keys():
-                if page in corpus[linking_page]:
-                    new_page_rank[page] += damping_factor * page_rank[linking_page] / len(corpus[linking_page])
-                elif not len(corpus[linking_page]):
-                    # A page without links is interpreted as having links to every page in the corpus
-                    new_page_rank[page] += damping_factor * page_rank[linking_page] / len(corpus.keys())
-
-        # Stop looping when updates converge
-        last_update = True
-        for page in corpus.keys():
-            if abs(new_page_rank[page] - page_rank[page]) > DIFF_THRESHOLD:
-                last_update = False
-
-        page_rank = new_page_rank
-        if last_update:
-            break
+    graph = link_graph(corpus)
+    ranks, _ = graph.pagerank(damping_factor, tolerance, max_iterations)
+    page_rank = graph.to_dict(ranks)
 
     assert 0.99 < sum(page_rank.values()) < 1.01
 
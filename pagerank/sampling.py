@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import random
+from array import array
+from operator import add
+
+
+class Sampler():
+    """
+    Random surfer over a `LinkGraph` taking each step in constant time.
+
+    With probability `damping_factor` the surfer follows a link of
+    the current page chosen uniformly, and otherwise, or if the page
+    has no links, jumps to a page chosen uniformly from the corpus.
+    This draws from the same distribution as `transition_model`
+    without building it.
+    """
+
+    def __init__(self, graph, damping_factor, rng=random):
+        self.graph = graph
+        self.damping_factor = damping_factor
+        self.rng = rng
+
+        n = len(graph.pages)
+        self.starts = graph.out_offsets[:-1]
+        self.degrees = [graph.out_degree(i) for i in range(n)]
+        self.thresholds = [damping_factor if degree else 0 for degree in self.degrees]
+
+    def walk(self, steps, walkers=1, pages=None):
+        """
+        Returns the number of visits to each page, as a list indexed
+        like `graph.pages`, of `walkers` surfers visiting `steps` pages
+        each. Surfers start at the given `pages`, or at pages chosen
+        uniformly, and are all moved one step at a time.
+        """
+        n = len(self.graph.pages)
+        visits = [0] * n
+        if steps <= 0:
+            return visits
+        if pages is None:
+            pages = [int(self.rng.random() * n) for _ in range(walkers)]
+        for page in pages:
+            visits[page] += 1
+        self.advance(pages, steps - 1, visits)
+        return visits
+
+    def sample(self, samples, walkers=1):
+        """
+        Returns the number of visits to each page, as in `walk`, of
+        `samples` pages visited by `walkers` surfers starting at pages
+        chosen uniformly. Samples are split between surfers as evenly
+        as possible, the first `samples % walkers` visiting one more.
+        """
+        n = len(self.graph.pages)
+        walkers = max(1, min(walkers, samples))
+        steps, extra = divmod(samples, walkers)
+        visits = [0] * n
+        if steps <= 0:
+            return visits
+        pages = [int(self.rng.random() * n) for _ in range(walkers)]
+        for page in pages:
+            visits[page] += 1
+        pages = self.advance(pages, steps - 1, visits)
+        self.advance(pages[:extra], 1, visits)
+        return visits
+
+    def advance(self, pages, steps, visits):
+        """
+        Moves surfers at `pages` by `steps` steps, adding every page
+        they visit to `visits`. Returns the pages they end at.
+        """
+        random = self.rng.random
+        n = len(self.graph.pages)
+        out_targets = self.graph.out_targets
+        starts, degrees, thresholds = self.starts, self.degrees, self.thresholds
+
+        for _ in range(steps):
+            pages = [
+                out_targets[starts[page] + int(random() * degrees[page])]
+                if random() < thresholds[page] else int(random() * n)
+                for page in pages
+            ]
+            for page in pages:
+                visits[page] += 1
+        return pages
+
+
+# Sampler used by pool worker processes, set by `init_worker`
+worker_sampler = None
+
+
+def init_worker(graph, damping_factor):
+    """
+    Prepare a pool worker. Forked workers share the parent's graph
+    copy-on-write instead of receiving a copy.
+    """
+    global worker_sampler
+    worker_sampler = Sampler(graph, damping_factor)
+
+
+def worker_advance(task):
+    """
+    Moves a chunk of surfers as in `Sampler.advance` with its own seed.
+    Returns their visit counts and the pages they end at.
+    """
+    seed, pages, steps = task
+    worker_sampler.rng = random.Random(seed)
+    visits = [0] * len(worker_sampler.graph.pages)
+    pages = worker_sampler.advance(pages, steps, visits)
+    return array("q", visits), pages
+
+
+def make_pool(graph, damping_factor, processes=None):
+    """
+    Returns a process pool whose workers sample random surfers over
+    `graph`, forked where possible so the graph is not copied.
+    """
+    start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+    context = multiprocessing.get_context(start_method)
+    return context.Pool(processes, initializer=init_worker,
+                        initargs=(graph, damping_factor))
+
+
+def converge(graph, damping_factor, reference, pool, target=None, max_samples=10 ** 7,
+             round_samples=10 ** 5, walkers=1000, chunks=None, seed=None):
+    """
+    Samples PageRank with `walkers` random surfers split into `chunks`
+    moved by pool workers, by default one per CPU, each chunk with its
+    own seed for every round. After every round of
+    about `round_samples` samples, yields (samples, distance, ranks):
+    the samples so far, the L1 distance of the merged estimate from the
+    `reference` ranks and the estimate itself.
+
+    Stops once the distance is at most `target`, or after `max_samples`.
+    """
+    rng = random.Random(seed)
+    n = len(graph.pages)
+    pages = [int(rng.random() * n) for _ in range(walkers)]
+    chunk_count = max(1, min(chunks or os.cpu_count() or 1, walkers))
+    chunks = [pages[i::chunk_count] for i in range(chunk_count)]
+    steps = max(1, round_samples // walkers)
+
+    visits = [0] * n
+    for page in pages:
+        visits[page] += 1
+    samples = walkers
+
+    while True:
+        tasks = [(rng.getrandbits(64), chunk, steps) for chunk in chunks]
+        chunks = []
+        for chunk_visits, chunk in pool.imap(worker_advance, tasks):
+            visits = list(map(add, visits, chunk_visits))
+            chunks.append(chunk)
+        samples += walkers * steps
+
+        ranks = [count / samples for count in visits]
+        distance = sum(abs(rank - expected) for rank, expected in zip(ranks, reference))
+        yield samples, distance, ranks
+        if (target is not None and distance <= target) or samples >= max_samples:
+            return
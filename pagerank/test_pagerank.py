@@ -0,0 +1,278 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import cache
+import crawler
+import pagerank
+from graph import LinkGraph, update_pagerank
+import sampling
+from sampling import Sampler
+
+
+def dense_pagerank(corpus, damping_factor, iterations=200):
+    """
+    Returns PageRank values computed directly from the definition.
+    """
+    n = len(corpus)
+    ranks = {page: 1 / n for page in corpus}
+    for _ in range(iterations):
+        ranks = {
+            page: (1 - damping_factor) / n + damping_factor * sum(
+                ranks[other] / len(corpus[other]) if corpus[other] else ranks[other] / n
+                for other in corpus
+                if page in corpus[other] or not corpus[other]
+            )
+            for page in corpus
+        }
+    return ranks
+
+
+def random_corpus(n, seed=0):
+    """
+    Returns a corpus of `n` pages with random links, some without any.
+    """
+    rng = random.Random(seed)
+    pages = [f"{i}.html" for i in range(n)]
+    return {
+        page: set(rng.sample(pages, rng.randint(0, 4))) - {page}
+        for page in pages
+    }
+
+
+class TestPageRank(unittest.TestCase):
+    def test_corpus0(self):
+        corpus = pagerank.crawl("corpus0")
+        ranks = pagerank.iterate_pagerank(corpus, pagerank.DAMPING)
+        expected = dense_pagerank(corpus, pagerank.DAMPING)
+        for page in corpus:
+            self.assertAlmostEqual(ranks[page], expected[page], places=5)
+
+    def test_matches_definition(self):
+        corpus = random_corpus(30)
+        ranks = pagerank.iterate_pagerank(corpus, pagerank.DAMPING, tolerance=1e-12)
+        expected = dense_pagerank(corpus, pagerank.DAMPING)
+        self.assertAlmostEqual(sum(ranks.values()), 1)
+        for page in corpus:
+            self.assertAlmostEqual(ranks[page], expected[page], places=9)
+
+    def test_max_iterations(self):
+        graph = LinkGraph.from_corpus(random_corpus(30))
+        _, iterations = graph.pagerank(pagerank.DAMPING, tolerance=0, max_iterations=5)
+        self.assertEqual(iterations, 5)
+
+    def test_from_edges(self):
+        # Links to the page itself and repeated links are dropped
+        graph = LinkGraph.from_edges(["a", "b", "c"], [0, 0, 0, 1, 2], [1, 1, 0, 2, 0])
+        self.assertEqual(list(graph.out_offsets), [0, 1, 2, 3])
+        self.assertEqual(list(graph.out_targets), [1, 2, 0])
+        self.assertEqual(list(graph.in_sources), [2, 0, 1])
+
+    def test_edit(self):
+        corpus = random_corpus(30)
+        graph = LinkGraph.from_corpus(corpus)
+        added_links = [("0.html", "1.html"), ("2.html", "new.html"), ("new.html", "3.html")]
+        removed_links = [("4.html", link) for link in corpus["4.html"]]
+        edited = graph.edit(["new.html"], ["5.html"], added_links, removed_links)
+
+        corpus["new.html"] = {"3.html"}
+        corpus["0.html"].add("1.html")
+        corpus["2.html"].add("new.html")
+        corpus["4.html"] = set()
+        del corpus["5.html"]
+        for page in corpus:
+            corpus[page].discard("5.html")
+        expected = LinkGraph.from_corpus(corpus)
+        self.assertEqual(edited.pages[-1], "new.html")
+        for graph in (edited, expected):
+            self.assertEqual(
+                {(graph.pages[source], graph.pages[target])
+                 for source in range(len(graph.pages)) for target in graph.out_links(source)},
+                {(page, link) for page in corpus for link in corpus[page]})
+            self.assertEqual(
+                {(graph.pages[source], graph.pages[target])
+                 for target in range(len(graph.pages))
+                 for source in graph.in_sources[graph.in_offsets[target]:graph.in_offsets[target + 1]]},
+                {(page, link) for page in corpus for link in corpus[page]})
+
+    def test_update_pagerank(self):
+        graph = LinkGraph.from_corpus(random_corpus(200))
+        ranks, _ = graph.pagerank(pagerank.DAMPING, tolerance=1e-12)
+        edits = [
+            {"added_links": [("0.html", "1.html")]},
+            {"removed_links": [("7.html", graph.pages[graph.out_links(graph.page_index["7.html"])[0]])]},
+            {"added_pages": ["new.html"], "added_links": [("new.html", "1.html")]},
+            {"removed_pages": ["2.html"]},
+        ]
+        for edit in edits:
+            edited, new_ranks = update_pagerank(
+                graph, ranks, pagerank.DAMPING, tolerance=1e-10, **edit)
+            expected, _ = edited.pagerank(pagerank.DAMPING, tolerance=1e-12)
+            self.assertLess(sum(abs(a - b) for a, b in zip(new_ranks, expected)), 1e-8)
+
+        # A page that gains its first links, or loses all of them, moves its
+        # rank out of or into what pages without links spread to every page
+        pages = [f"{i}.html" for i in range(2000)]
+        corpus = {page: set(pages[:10]) - {page} for page in pages[:10]}
+        corpus.update({page: {pages[i + 1 if i + 1 < len(pages) else 10]}
+                       for i, page in enumerate(pages) if i >= 10})
+        links = [("0.html", link) for link in corpus["0.html"]]
+        for linked, edit in ((False, "added_links"), (True, "removed_links")):
+            corpus["0.html"] = {link for _, link in links} if linked else set()
+            graph = LinkGraph.from_corpus(corpus)
+            ranks, _ = graph.pagerank(pagerank.DAMPING, tolerance=1e-12)
+            edited, new_ranks = update_pagerank(
+                graph, ranks, pagerank.DAMPING, tolerance=1e-10, **{edit: links})
+            expected, _ = edited.pagerank(pagerank.DAMPING, tolerance=1e-12)
+            self.assertLess(sum(abs(a - b) for a, b in zip(new_ranks, expected)), 1e-8)
+
+    def test_sampler(self):
+        corpus = random_corpus(30)
+        graph = LinkGraph.from_corpus(corpus)
+        expected = dense_pagerank(corpus, pagerank.DAMPING)
+        for walkers in (1, 50):
+            sampler = Sampler(graph, pagerank.DAMPING, random.Random(walkers))
+            visits = sampler.walk(200000 // walkers, walkers)
+            self.assertEqual(sum(visits), 200000)
+            distance = sum(abs(count / 200000 - expected[page])
+                           for page, count in zip(graph.pages, visits))
+            self.assertLess(distance, 0.03)
+
+    def test_sample_pagerank(self):
+        # Samples not divisible between surfers are all taken
+        sampler = Sampler(LinkGraph.from_corpus(random_corpus(30)), pagerank.DAMPING)
+        self.assertEqual(sum(sampler.sample(1000, 7)), 1000)
+        ranks = pagerank.sample_pagerank(random_corpus(30), pagerank.DAMPING, 1000, walkers=7)
+        self.assertEqual(len(ranks), 30)
+        self.assertAlmostEqual(sum(ranks.values()), 1)
+
+    def test_converge(self):
+        graph = LinkGraph.from_corpus(random_corpus(30))
+        reference, _ = graph.pagerank(pagerank.DAMPING)
+        with sampling.make_pool(graph, pagerank.DAMPING, 2) as pool:
+            rounds = [list(sampling.converge(
+                graph, pagerank.DAMPING, reference, pool, target=0.05,
+                round_samples=10000, walkers=100, chunks=2, seed=0))
+                for _ in range(2)]
+        # Every chunk is seeded, so runs with the same seed agree
+        self.assertEqual(rounds[0], rounds[1])
+        samples, distance, ranks = rounds[0][-1]
+        self.assertLessEqual(distance, 0.05)
+        self.assertEqual(samples, 100 + 100 * 100 * len(rounds[0]))
+        self.assertAlmostEqual(sum(ranks), 1)
+
+    def test_link_parser(self):
+        page = (
+            '<html><!-- <a href="comment.html"> -->'
+            '<script>var s = \'<a href="script.html">\';</script>'
+            '<A HREF=\'single.html\' class=x>1</A><a class="y" href=bare.html>2</a>'
+            '<a href="amp&amp;.html">3</a><abbr href="abbr.html"></abbr>'
+            '<a\n href = "spaced.html">4</a><a href="last.html"/></html>'
+        )
+        expected = {"single.html", "bare.html", "amp&.html", "spaced.html", "last.html"}
+        # Tokens cut off between chunks are completed by the next chunk
+        for size in (1, 7, len(page)):
+            parser = crawler.LinkParser()
+            for i in range(0, len(page), size):
+                parser.feed(page[i:i + size])
+            parser.close()
+            self.assertEqual(parser.links, expected)
+
+    def test_crawl_edges(self):
+        for processes in (1, 2):
+            pages, sources, targets = crawler.crawl_edges("corpus0", processes)
+            self.assertEqual(pages, ["1.html", "2.html", "3.html", "4.html"])
+            self.assertEqual(list(zip(sources, targets)),
+                             [(0, 1), (1, 0), (1, 2), (2, 1), (2, 3), (3, 1)])
+        self.assertEqual(pagerank.crawl("corpus0")["2.html"], {"1.html", "3.html"})
+
+        # Links are found by the same rules however many processes crawl
+        with tempfile.TemporaryDirectory() as directory:
+            for page, body in [
+                    ("1.html", "<a href='2.html'>2</a><!-- <a href=\"3.html\">3</a> -->"),
+                    ("2.html", '<a href="1.html">1</a><a class=x href=3.html>3</a>'),
+                    ("3.html", '<script>"<a href="1.html">"</script>')]:
+                with open(os.path.join(directory, page), "w") as f:
+                    f.write(body)
+            crawls = [crawler.crawl_edges(directory, processes) for processes in (1, 2)]
+            self.assertEqual(crawls[0], crawls[1])
+            self.assertEqual(list(zip(*crawls[0][1:])), [(0, 1), (1, 0), (1, 2)])
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for page in os.listdir("corpus0"):
+                shutil.copy(os.path.join("corpus0", page), directory)
+
+            corpus_cache = cache.CorpusCache(directory)
+            graph = corpus_cache.graph()
+            ranks = corpus_cache.iterate_pagerank(graph, pagerank.DAMPING)
+            self.assertEqual(corpus_cache.parsed, 4)
+            self.assertEqual(graph.to_dict(graph.pagerank(pagerank.DAMPING)[0]), ranks)
+            corpus_cache.save()
+
+            # Unchanged pages are neither parsed nor ranked again
+            corpus_cache = cache.CorpusCache(directory)
+            graph = corpus_cache.graph()
+            computed = corpus_cache.ranks("iterate", pagerank.DAMPING,
+                                          {"tolerance": cache.TOLERANCE}, self.fail)
+            self.assertEqual(corpus_cache.parsed, 0)
+            self.assertEqual(computed, ranks)
+            self.assertEqual(list(graph.in_sources), list(crawler.crawl_graph(directory).in_sources))
+
+            # Only the modified page is parsed, and ranks are updated from the cache
+            with open(os.path.join(directory, "4.html"), "a") as f:
+                f.write('<a href="3.html">3</a>')
+            corpus_cache = cache.CorpusCache(directory)
+            graph = corpus_cache.graph()
+            ranks = corpus_cache.iterate_pagerank(graph, pagerank.DAMPING)
+            self.assertEqual(corpus_cache.parsed, 1)
+            self.assertEqual(corpus_cache.changed, {"4.html", "2.html", "3.html"})
+            self.assertEqual(list(graph.out_links(3)), [1, 2])
+            expected = dense_pagerank(pagerank.crawl(directory), pagerank.DAMPING)
+            for page in expected:
+                self.assertAlmostEqual(ranks[page], expected[page], places=4)
+
+            # A cache with a malformed page entry is ignored rather than trusted
+            corpus_cache.save()
+            data = cache.read_cache(corpus_cache.path)
+            del data["files"]["1.html"]["sha256"]
+            cache.write_cache(data, corpus_cache.path)
+            self.assertIsNone(cache.read_cache(corpus_cache.path))
+            self.assertEqual(cache.CorpusCache(directory).files, {})
+
+    def test_cache_update(self):
+        # A clique and a ring, where a page without links gains some
+        pages = [f"{i}.html" for i in range(2000)]
+        links = {page: set(pages[:10]) - {page} for page in pages[:10]}
+        links.update({page: {pages[i + 1 if i + 1 < len(pages) else 10]}
+                      for i, page in enumerate(pages) if i >= 10})
+        with tempfile.TemporaryDirectory() as directory:
+            for page in pages:
+                with open(os.path.join(directory, page), "w") as f:
+                    if page != "0.html":
+                        f.write("".join(f'<a href="{link}">{link}</a>' for link in sorted(links[page])))
+
+            corpus_cache = cache.CorpusCache(directory)
+            corpus_cache.iterate_pagerank(corpus_cache.graph(), pagerank.DAMPING, 1e-10)
+            corpus_cache.save()
+
+            # Links are found as without the cache, whatever their quotes
+            with open(os.path.join(directory, "0.html"), "w") as f:
+                f.write("".join(f"<a href='{link}'>{link}</a>" for link in sorted(links["0.html"])))
+                f.write('<!-- <a href="10.html">10</a> -->')
+            corpus_cache = cache.CorpusCache(directory)
+            graph = corpus_cache.graph()
+            ranks = corpus_cache.iterate_pagerank(graph, pagerank.DAMPING, 1e-10)
+            self.assertEqual(corpus_cache.dangling, {"0.html"})
+
+            uncached = crawler.crawl_graph(directory)
+            self.assertEqual(list(graph.out_targets), list(uncached.out_targets))
+            expected, _ = uncached.pagerank(pagerank.DAMPING, 1e-10)
+            self.assertLess(sum(abs(ranks[page] - rank)
+                                for page, rank in zip(uncached.pages, expected)), 1e-8)
+
+
+if __name__ == "__main__":
+    unittest.main()
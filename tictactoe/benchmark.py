@@ -0,0 +1,94 @@
+import argparse
+import random
+import sys
+import time
+
+import engine
+import tictactoe as ttt
+
+# Searches compared by the searches benchmark
+SEARCHES = {
+    "minimax": lambda board: ttt.minimax(board, use_book=False),
+    "alphabeta": ttt.alphabeta,
+    "book": ttt.minimax,
+}
+
+
+def parse_args(argv):
+    """
+    Parse command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="benchmark.py")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    searches = subparsers.add_parser(
+        "searches", help="compare 3x3 searches over games against a random player")
+    searches.add_argument("--games", type=int, default=50)
+
+    game = subparsers.add_parser(
+        "engine", help="time the bitboard engine playing itself on a larger board")
+    game.add_argument("--size", type=int, default=4)
+    game.add_argument("--k", type=int, default=4,
+                       help="number of marks in a row that wins")
+    game.add_argument("--max-depth", type=int, default=None)
+    game.add_argument("--time-limit", type=float, default=1.0,
+                       help="seconds of search per move")
+    return parser.parse_args(argv)
+
+
+def play(search, rng):
+    """
+    Plays a game where O moves with `search` and X moves with `search`
+    or at random. Returns the time spent searching and nodes visited.
+    """
+    board = ttt.initial_state()
+    elapsed, nodes = 0, 0
+    while not ttt.terminal(board):
+        if ttt.player(board) == ttt.X and rng.random() < 0.5:
+            move = rng.choice(sorted(ttt.actions(board)))
+        else:
+            start = time.perf_counter()
+            move = search(board)
+            elapsed += time.perf_counter() - start
+            nodes += ttt.node_count
+        board = ttt.result(board, move)
+    return elapsed, nodes
+
+
+def benchmark_searches(games):
+    for name, search in SEARCHES.items():
+        ttt.transpositions.clear()
+        ttt.bounds.clear()
+        ttt.opening_book = None
+        rng = random.Random(0)
+        results = [play(search, rng) for _ in range(games)]
+        first_elapsed, first_nodes = results[0]
+        total_elapsed = sum(elapsed for elapsed, _ in results)
+        total_nodes = sum(nodes for _, nodes in results)
+        print(f"{name}: first game {first_elapsed * 1000:.1f} ms, {first_nodes} nodes; "
+              f"{games} games {total_elapsed * 1000:.1f} ms, {total_nodes} nodes")
+
+
+def benchmark_engine(size, k, max_depth, time_limit):
+    game = engine.Game(size, k)
+    x = o = 0
+    while not game.terminal(x, o):
+        start = time.perf_counter()
+        cell = game.best_move(x, o, max_depth, time_limit)
+        elapsed = time.perf_counter() - start
+        print(f"{game.player(x, o)} plays {divmod(cell, size)}: depth {game.depth}, "
+              f"{game.nodes} nodes, {elapsed * 1000:.1f} ms")
+        x, o = game.play(x, o, cell)
+    print(f"Winner: {game.winner(x, o) or 'tie'}")
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.benchmark == "searches":
+        benchmark_searches(args.games)
+    else:
+        benchmark_engine(args.size, args.k, args.max_depth, args.time_limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Opening book of solved 3x3 tic-tac-toe positions
+"""
+
+import bisect
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+import engine
+
+# Bump whenever the book layout changes
+MAGIC = b"TTTBOOK\0"
+VERSION = 2
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tictactoe.book")
+
+# Magic, version, number of positions, CRC32 of the codes and utilities
+HEADER = struct.Struct("<8sIII")
+
+# Stored utilities of a loss, a draw and a win
+UTILITY_CODES = frozenset(range(3))
+
+GAME = engine.Game(3, 3)
+
+
+def symmetries():
+    """
+    Returns the 8 rotations and reflections of the board, each as the
+    list of the cells that cells 0 to 8 are moved to.
+    """
+    cells = [(i, j) for i in range(3) for j in range(3)]
+    maps = [
+        lambda i, j: (i, j), lambda i, j: (j, 2 - i),
+        lambda i, j: (2 - i, 2 - j), lambda i, j: (2 - j, i),
+        lambda i, j: (i, 2 - j), lambda i, j: (2 - i, j),
+        lambda i, j: (j, i), lambda i, j: (2 - j, 2 - i),
+    ]
+    return [[3 * k + l for k, l in (f(i, j) for i, j in cells)] for f in maps]
+
+
+def bit_tables(permutation):
+    """
+    Returns a table mapping every 9-bit bitboard to its image
+    under a permutation of cells.
+    """
+    return array("H", [
+        sum(1 << permutation[cell] for cell in range(9) if bits >> cell & 1)
+        for bits in range(1 << 9)
+    ])
+
+
+# Bitboard image tables of every symmetry
+TRANSFORMS = [bit_tables(permutation) for permutation in symmetries()]
+
+# Base 3 value of the cells set in every 9-bit bitboard
+TERNARY = array("H", [sum(3 ** cell for cell in range(9) if bits >> cell & 1)
+                      for bits in range(1 << 9)])
+
+
+def canonical_code(x, o):
+    """
+    Returns the code of a position, the smallest base 3 encoding
+    of its cells under the board symmetries, with X as 1 and O as 2.
+    """
+    return min(TERNARY[table[x]] + 2 * TERNARY[table[o]] for table in TRANSFORMS)
+
+
+class Book():
+    """
+    Minimax utilities of every reachable position up to symmetry.
+
+    `codes` is the sorted array of canonical codes and `utilities[i]`
+    is one more than the utility of the position with code `codes[i]`.
+    """
+
+    def __init__(self, codes, utilities):
+        self.codes = codes
+        self.utilities = utilities
+
+    @classmethod
+    def build(cls):
+        """
+        Solve every position reachable from the empty board,
+        once per class of symmetric positions.
+        """
+        solved = {}
+        solve(0, 0, solved)
+        codes = sorted(solved)
+        return cls(array("H", codes), bytes(solved[code] + 1 for code in codes))
+
+    def utility(self, x, o):
+        """
+        Returns the minimax utility of a position,
+        or None if it is not reachable.
+        """
+        code = canonical_code(x, o)
+        i = bisect.bisect_left(self.codes, code)
+        if i == len(self.codes) or self.codes[i] != code:
+            return None
+        return self.utilities[i] - 1
+
+
+def solve(x, o, solved):
+    """
+    Returns the minimax utility of a position, adding it and every
+    position reachable from it to `solved` by canonical code.
+    """
+    code = canonical_code(x, o)
+    utility = solved.get(code)
+    if utility is not None:
+        return utility
+
+    winner = GAME.winner(x, o)
+    if winner is not None:
+        utility = 1 if winner == engine.X else -1
+    elif (x | o) == GAME.full:
+        utility = 0
+    elif GAME.player(x, o) == engine.X:
+        utility = max(solve(x | 1 << cell, o, solved) for cell in GAME.moves(x, o))
+    else:
+        utility = min(solve(x, o | 1 << cell, solved) for cell in GAME.moves(x, o))
+
+    solved[code] = utility
+    return utility
+
+
+def write_book(book, path):
+    """
+    Write an opening book to `path`.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    body = book.codes.tobytes() + bytes(book.utilities)
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(book.codes), zlib.crc32(body)))
+        f.write(body)
+    os.replace(temporary, path)
+
+
+def read_book(path):
+    """
+    Read the opening book at `path`.
+
+    Returns None if the file is missing, out of date or corrupt.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, count, checksum = HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+    codes = array("H")
+    body = data[HEADER.size:]
+    if (magic != MAGIC or version != VERSION
+            or len(body) != count * (codes.itemsize + 1)
+            or zlib.crc32(body) != checksum):
+        return None
+    codes.frombytes(body[:count * codes.itemsize])
+    utilities = body[count * codes.itemsize:]
+    # minimax trusts the book, so never load a utility it could not store
+    if not UTILITY_CODES.issuperset(utilities):
+        return None
+    return Book(codes, utilities)
+
+
+def load(path=BOOK_PATH):
+    """
+    Load the opening book, building and saving it if missing.
+    """
+    book = read_book(path)
+    if book is not None:
+        return book
+
+    book = Book.build()
+    try:
+        write_book(book, path)
+    except OSError:
+        pass
+    return book
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python book.py [path]")
+    path = sys.argv[1] if len(sys.argv) == 2 else BOOK_PATH
+    book = Book.build()
+    write_book(book, path)
+    print(f"Wrote {len(book.codes)} positions to {path}")
+
+
+if __name__ == "__main__":
+    main()
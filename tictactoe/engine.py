@@ -0,0 +1,256 @@
+"""
+Bitboard engine for tic-tac-toe on larger boards
+"""
+
+import math
+import time
+
+X = "X"
+O = "O"
+
+# Score of a win; faster wins score higher by the number of empty cells left
+WIN = 1_000_000
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a search once its time budget is spent.
+    """
+
+
+class Game():
+    """
+    Rules and search for tic-tac-toe on a `size` by `size` board,
+    won by the first player with `k` marks in a row.
+
+    A position is a pair (x, o) of bitboards: integers whose bit
+    `size * i + j` is set when that player has a mark in cell (i, j).
+    Every row, column and diagonal of `k` cells is precomputed as
+    a bit mask, so finding a winner is a few integer operations.
+    """
+
+    def __init__(self, size=3, k=3):
+        if not 1 <= k <= size:
+            raise ValueError("k must be between 1 and the board size")
+        self.size = size
+        self.k = k
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+
+        self.lines = []
+        for i in range(size):
+            for j in range(size):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                    if 0 <= end_i < size and 0 <= end_j < size:
+                        self.lines.append(sum(
+                            1 << (size * (i + di * n) + j + dj * n) for n in range(k)))
+        self.cell_lines = [[line for line in self.lines if line >> cell & 1]
+                           for cell in range(self.cells)]
+
+        # Cells on more lines are tried first: the center, then corners, then edges
+        self.move_order = sorted(range(self.cells),
+                                 key=lambda cell: -len(self.cell_lines[cell]))
+
+        # Maps (to move, opponent) bitboards to
+        # (depth, score, flag, best cell) of earlier searches
+        self.table = {}
+        self.nodes = 0
+
+    def player(self, x, o):
+        """
+        Returns the player who has the next turn.
+        """
+        return X if (x | o).bit_count() % 2 == 0 else O
+
+    def moves(self, x, o):
+        """
+        Returns the empty cells, in the order search tries them.
+        """
+        taken = x | o
+        return [cell for cell in self.move_order if not taken >> cell & 1]
+
+    def play(self, x, o, cell):
+        """
+        Returns the position after the next player marks `cell`.
+        """
+        bit = 1 << cell
+        if not 0 <= cell < self.cells or (x | o) & bit:
+            raise RuntimeError("Invalid move")
+        return (x | bit, o) if self.player(x, o) == X else (x, o | bit)
+
+    def completes(self, bits, cell):
+        """
+        Returns True if `bits` fill one of the lines through `cell`.
+        """
+        return any(bits & line == line for line in self.cell_lines[cell])
+
+    def winner(self, x, o):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        for line in self.lines:
+            if x & line == line:
+                return X
+            if o & line == line:
+                return O
+        return None
+
+    def terminal(self, x, o):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return (x | o) == self.full or self.winner(x, o) is not None
+
+    def evaluate(self, me, them):
+        """
+        Returns a heuristic score of a position for the player to
+        move, counting the marks on lines still open to each side.
+        """
+        score = 0
+        for line in self.lines:
+            mine, theirs = me & line, them & line
+            if not theirs and mine:
+                score += 4 ** mine.bit_count()
+            elif not mine and theirs:
+                score -= 4 ** theirs.bit_count()
+        return score
+
+    def best_move(self, x, o, max_depth=None, time_limit=None):
+        """
+        Returns the best cell for the player to move, searching with
+        iterative deepening up to `max_depth` plies and for at most
+        `time_limit` seconds. With neither limit the search is exact.
+
+        The deepest search that completes in time decides the move;
+        the first ply is always searched in full.
+        """
+        if self.terminal(x, o):
+            return None
+        me, them = (x, o) if self.player(x, o) == X else (o, x)
+        empty = self.cells - (x | o).bit_count()
+        max_depth = empty if max_depth is None else min(max_depth, empty)
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+        self.nodes = 0
+        self.depth = 0
+        best = None
+        for depth in range(1, max_depth + 1):
+            try:
+                score, best = self.search_root(
+                    me, them, depth, deadline if depth > 1 else None, best)
+            except SearchTimeout:
+                break
+            self.depth = depth
+
+            # A forced win or loss does not change with more depth
+            if abs(score) > WIN - self.cells:
+                break
+        return best
+
+    def search_root(self, me, them, depth, deadline, first=None):
+        """
+        Returns (score, cell) of the best move found searching `depth`
+        plies, trying the best move of a shallower search first.
+        """
+        moves = self.moves(me, them)
+        if first is not None:
+            moves.remove(first)
+            moves.insert(0, first)
+
+        alpha, best = -math.inf, None
+        for cell in moves:
+            score = self.score_move(me, them, cell, depth, -math.inf, -alpha, deadline)
+            if best is None or score > alpha:
+                alpha, best = score, cell
+        return alpha, best
+
+    def score_move(self, me, them, cell, depth, alpha, beta, deadline):
+        """
+        Returns the score for the player to move of marking `cell`,
+        where alpha and beta bound the search of the opponent's reply.
+        """
+        mine = me | 1 << cell
+        if self.completes(mine, cell):
+            return WIN + self.cells - (mine | them).bit_count()
+        return -self.negamax(them, mine, depth - 1, alpha, beta, deadline)
+
+    def negamax(self, me, them, depth, alpha, beta, deadline):
+        """
+        Returns the score of a position for the player to move, searched
+        `depth` plies deep with alpha-beta pruning, if it lies between
+        alpha and beta, or else a bound beyond the one it exceeds.
+        """
+        self.nodes += 1
+        if deadline is not None and self.nodes % 1024 == 0 and time.perf_counter() > deadline:
+            raise SearchTimeout
+
+        if (me | them) == self.full:
+            return 0
+        if depth == 0:
+            return self.evaluate(me, them)
+
+        key = (me, them)
+        first = None
+        entry = self.table.get(key)
+        if entry is not None:
+            entry_depth, score, flag, first = entry
+            if entry_depth >= depth:
+                if flag == 0:
+                    return score
+                elif flag > 0:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        moves = self.moves(me, them)
+        if first is not None:
+            moves.remove(first)
+            moves.insert(0, first)
+
+        original_alpha = alpha
+        best_score, best = -math.inf, None
+        for cell in moves:
+            score = self.score_move(me, them, cell, depth, -beta, -alpha, deadline)
+            if score > best_score:
+                best_score, best = score, cell
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    break
+
+        # Scores outside the window are only bounds on the true score
+        if best_score <= original_alpha:
+            flag = -1
+        elif best_score >= beta:
+            flag = 1
+        else:
+            flag = 0
+        self.table[key] = (depth, best_score, flag, best)
+        return best_score
+
+
+def from_board(board):
+    """
+    Returns the (x, o) bitboards of a board given as a list of rows.
+    """
+    x = o = 0
+    bit = 1
+    for row in board:
+        for cell in row:
+            if cell == X:
+                x |= bit
+            elif cell == O:
+                o |= bit
+            bit <<= 1
+    return x, o
+
+
+def to_board(x, o, size):
+    """
+    Returns the board of (x, o) bitboards as a list of rows.
+    """
+    return [[X if x >> (size * i + j) & 1 else O if o >> (size * i + j) & 1 else None
+             for j in range(size)]
+            for i in range(size)]
@@ -1,4 +1,10 @@
-from tictactoe import initial_state, player, actions, result, winner, terminal, utility, extermum
+from tictactoe import initial_state, player, actions, result, winner, terminal, utility, extermum, minimax, alphabeta
+from engine import Game
+import book
+import engine
+import os
+import tempfile
+import tictactoe
 import unittest
 
 class TestTTTMethods(unittest.TestCase):
@@ -54,6 +60,120 @@ class TestTTTMethods(unittest.TestCase):
         self.board[0][0] = None
         self.assertEqual(extermum(self.board), 0)
 
+    def test_minimax(self):
+        self.assertEqual(minimax(self.board), (2, 2))
+        self.board = result(self.board, (0, 0))
+        self.assertEqual(minimax(self.board), (1, 1))
+        # O must block X from completing the top row
+        self.board[0][1] = "X"
+        self.board[1][1] = "O"
+        self.assertEqual(minimax(self.board), (0, 2))
+        self.fill_top_row_with_x()
+        self.assertIsNone(minimax(self.board))
+
+    def test_alphabeta(self):
+        tictactoe.transpositions.clear()
+        tictactoe.bounds.clear()
+        move = alphabeta(self.board)
+        alphabeta_nodes = tictactoe.node_count
+        self.assertEqual(move, minimax(self.board))
+        tictactoe.transpositions.clear()
+        minimax(self.board, use_book=False)
+        self.assertLess(alphabeta_nodes, tictactoe.node_count)
+
+        boards = [self.board]
+        while boards:
+            board = boards.pop()
+            if terminal(board):
+                self.assertIsNone(alphabeta(board))
+                continue
+            self.assertEqual(alphabeta(board), minimax(board))
+            if sum(cell is None for row in board for cell in row) > 5:
+                boards.extend(result(board, action) for action in actions(board))
+
+    def test_book(self):
+        opening_book = book.Book.build()
+        # Positions that are the same up to symmetry are solved once
+        self.assertEqual(len(opening_book.codes), 765)
+        self.assertEqual(opening_book.utility(0, 0), 0)
+        self.assertEqual(book.canonical_code(1 << 0, 0), book.canonical_code(1 << 8, 0))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book")
+            book.write_book(opening_book, path)
+            self.assertEqual(book.read_book(path).codes, opening_book.codes)
+
+            # A book corrupted without changing its size is rejected
+            with open(path, "r+b") as f:
+                f.seek(-1, os.SEEK_END)
+                f.write(b"\x07")
+            self.assertIsNone(book.read_book(path))
+
+        tictactoe.opening_book = opening_book
+        boards = [self.board]
+        while boards:
+            board = boards.pop()
+            if terminal(board):
+                continue
+            move = minimax(board)
+            self.assertEqual(tictactoe.node_count, 0)
+            self.assertEqual(move, minimax(board, use_book=False))
+            if sum(cell is None for row in board for cell in row) > 5:
+                boards.extend(result(board, action) for action in actions(board))
+
+    def test_transpositions(self):
+        tictactoe.transpositions.clear()
+        extermum(self.board)
+        # Every reachable position is solved once from the empty board
+        self.assertEqual(len(tictactoe.transpositions), 5478)
+        self.board = result(self.board, (1, 1))
+        self.assertIn(tictactoe.board_key(self.board), tictactoe.transpositions)
+
+
+class TestEngine(unittest.TestCase):
+    def test_lines(self):
+        self.assertEqual(len(Game(3, 3).lines), 8)
+        self.assertEqual(len(Game(4, 3).lines), 24)
+        self.assertEqual(len(Game(5, 4).lines), 28)
+        with self.assertRaises(ValueError):
+            Game(3, 4)
+
+    def test_board_conversion(self):
+        board = [["X", None, None, None],
+                 [None, "O", None, None],
+                 [None, None, None, None],
+                 [None, None, None, "X"]]
+        x, o = engine.from_board(board)
+        self.assertEqual(engine.to_board(x, o, 4), board)
+        game = Game(4, 4)
+        self.assertEqual(game.player(x, o), "O")
+        self.assertIsNone(game.winner(x, o))
+        # X fills the main diagonal, cells 0, 5, 10 and 15
+        self.assertEqual(game.winner(x | 1 << 5 | 1 << 10, o), "X")
+
+    def test_best_move(self):
+        game = Game(4, 4)
+        # X completes the top row rather than block O
+        x, o = 0b0111, 0b0111_0000
+        self.assertEqual(game.best_move(x, o, max_depth=2), 3)
+        # O must block X
+        x, o = 0b0111, 0b0001_0000_0000
+        self.assertEqual(game.best_move(x, o, max_depth=2), 3)
+
+    def test_exact_search_draws(self):
+        game = Game(3, 3)
+        x = o = 0
+        while not game.terminal(x, o):
+            x, o = game.play(x, o, game.best_move(x, o))
+        self.assertIsNone(game.winner(x, o))
+
+    def test_time_limit(self):
+        game = Game(5, 4)
+        cell = game.best_move(0, 0, time_limit=0.05)
+        self.assertIn(cell, range(25))
+        self.assertGreaterEqual(game.depth, 1)
+        self.assertLess(game.depth, 25)
+
 
 if __name__ == '__main__':
     unittest.main()
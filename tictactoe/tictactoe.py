@@ -3,12 +3,32 @@ Tic Tac Toe Player
 """
 
 import math
-from copy import deepcopy
+
+import book
+import engine
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Rules of the 3x3 game over bitboards. The functions below adapt
+# boards given as lists of rows, as used by the runner, to it.
+GAME = engine.Game(3, 3)
+
+# Maps board keys to their minimax utility. Kept at module level so
+# that it is reused across moves and games.
+transpositions = {}
+
+# Maps board keys to (lower, upper) bounds on their utility found by
+# alpha-beta searches, reused across moves and games like `transpositions`
+bounds = {}
+
+# Number of positions visited by the last call to `minimax` or `alphabeta`
+node_count = 0
+
+# Solved positions up to symmetry, loaded by the first call to `minimax`
+opening_book = None
+
 
 def initial_state():
     """
@@ -23,74 +43,37 @@ def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    flat_board = [cell for row in board for cell in row]
-    if flat_board.count(X) <= flat_board.count(O):
-        return X
-    else:
-        return O
+    return GAME.player(*board_key(board))
 
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    possible_actions = set()
-
-    for row in range(3):
-        for col in range(3):
-            if board[row][col] == EMPTY:
-                possible_actions.add((row, col))
-
-    return possible_actions
+    return {divmod(cell, 3) for cell in GAME.moves(*board_key(board))}
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    if board[action[0]][action[1]] != EMPTY or action[0] < 0 or action[0] > 2 or action[1] < 0 or action[1] > 2:
+    if action[0] < 0 or action[0] > 2 or action[1] < 0 or action[1] > 2:
         raise RuntimeError('Invalid move')
 
-    new_board = deepcopy(board)
-    new_board[action[0]][action[1]] = player(board)
-    return new_board
+    x, o = GAME.play(*board_key(board), 3 * action[0] + action[1])
+    return engine.to_board(x, o, 3)
 
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # Check horizontal and vertical axes
-    for i in range(3):
-        if board[i][0] != EMPTY and board[i][0] == board[i][1] == board[i][2]:
-            return board[i][0]
-        if board[0][i] != EMPTY and board[0][i] == board[1][i] == board[2][i]:
-            return board[0][i]
-
-    # Check diagonal axes
-    if board[0][0] != EMPTY and board[0][0] == board[1][1] == board[2][2]:
-        return board[0][0]
-    if board[0][2] != EMPTY and board[0][2] == board[1][1] == board[2][0]:
-        return board[0][2]
-
-    # No winner found
-    return None
+    return GAME.winner(*board_key(board))
 
 
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    # If there's a winner, game is over
-    if winner(board) is not None:
-        return True
-
-    # If there's any empty cell left and no winner, game is not over
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == EMPTY:
-                return False
-
-    # If there are no empty cells, game is over
-    return True
+    return GAME.terminal(*board_key(board))
 
 def utility(board):
     """
@@ -110,39 +93,170 @@ def extermum(board):
     """
     Returns the maximal or minimal utility for a given board
     """
-    # For terminal boards, return utility
-    if terminal(board):
-        return utility(board)
+    return key_utility(board_key(board))
+
+
+def board_key(board):
+    """
+    Returns a hashable encoding of the board, its (x, o) bitboards.
+    """
+    return engine.from_board(board)
+
+
+def key_utility(key):
+    """
+    Returns the minimax utility of a board key, looking it up in or
+    adding it to the transposition table.
+    """
+    global node_count
+    node_count += 1
+
+    utility = transpositions.get(key)
+    if utility is not None:
+        return utility
+
+    utility = key_terminal_utility(key)
+    if utility is None:
+        # Iterate over all possible actions and keep best utility
+        x, o = key
+        if GAME.player(x, o) == X:
+            utility = max(key_utility((x | 1 << cell, o)) for cell in GAME.moves(x, o))
+        else:
+            utility = min(key_utility((x, o | 1 << cell)) for cell in GAME.moves(x, o))
+
+    transpositions[key] = utility
+    return utility
+
+
+def key_terminal_utility(key):
+    """
+    Returns the utility of a finished board key, or None if the
+    game is not over.
+    """
+    winner = GAME.winner(*key)
+    if winner is not None:
+        return 1 if winner == X else -1
+    if (key[0] | key[1]) == GAME.full:
+        return 0
+    return None
+
+
+def key_alphabeta(key, alpha, beta):
+    """
+    Returns the minimax utility of a board key if it lies between
+    alpha and beta, or else a bound beyond the one it exceeds.
+    """
+    global node_count
+    node_count += 1
+
+    # Exact utilities and bounds found by earlier searches can be reused
+    utility = transpositions.get(key)
+    if utility is None:
+        utility = key_terminal_utility(key)
+    if utility is not None:
+        return utility
+    lower, upper = bounds.get(key, (-1, 1))
+    if lower >= beta or lower == upper:
+        return lower
+    if upper <= alpha:
+        return upper
+    alpha, beta = max(alpha, lower), min(beta, upper)
+    window = (alpha, beta)
+
+    # Try winning moves first, then center, corners and edges
+    x, o = key
+    next_player = GAME.player(x, o)
+    bits = x if next_player == X else o
+    moves = GAME.moves(x, o)
+    moves.sort(key=lambda cell: not GAME.completes(bits | 1 << cell, cell))
 
-    # Initialize best move and best utility
-    next_player = player(board)
     if next_player == X:
         best_utility = -math.inf
+        for cell in moves:
+            best_utility = max(best_utility, key_alphabeta((x | 1 << cell, o), alpha, beta))
+            alpha = max(alpha, best_utility)
+            if alpha >= beta:
+                break
     else:
         best_utility = math.inf
+        for cell in moves:
+            best_utility = min(best_utility, key_alphabeta((x, o | 1 << cell), alpha, beta))
+            beta = min(beta, best_utility)
+            if alpha >= beta:
+                break
 
-    # Iterate over all possible actions and keep best utility
-    for action in actions(board):
-        next_board = result(board, action)
-        next_utility = extermum(next_board)
-        if (next_player == X and next_utility > best_utility) or (
-           (next_player == O and next_utility < best_utility)):
-            best_utility = next_utility
-
+    # Utilities outside the window only bound the true utility
+    if best_utility <= window[0]:
+        upper = best_utility
+    elif best_utility >= window[1]:
+        lower = best_utility
+    else:
+        lower = upper = best_utility
+    bounds[key] = (lower, upper)
     return best_utility
 
-def minimax(board):
+
+def alphabeta(board):
+    """
+    Returns the optimal action for the current player on the board,
+    using alpha-beta pruning. Ties are broken as in `minimax`, so
+    both return the same action.
+    """
+    global node_count
+    node_count = 0
+
+    # If game ended, return None
+    if terminal(board):
+        return None
+
+    # Try actions in the order minimax prefers among equal utilities,
+    # only replacing the best action with a strictly better one
+    key = board_key(board)
+    current_player = player(board)
+    best_action, best_utility = None, None
+    alpha, beta = -math.inf, math.inf
+    for action in sorted(actions(board), reverse=(current_player == X)):
+        next_key = GAME.play(*key, 3 * action[0] + action[1])
+        next_utility = key_alphabeta(next_key, alpha, beta)
+        if current_player == X and (best_action is None or next_utility > best_utility):
+            best_action, best_utility = action, next_utility
+            alpha = next_utility
+        elif current_player == O and (best_action is None or next_utility < best_utility):
+            best_action, best_utility = action, next_utility
+            beta = next_utility
+
+        # Nothing beats a win
+        if best_utility == (1 if current_player == X else -1):
+            break
+
+    return best_action
+
+
+def minimax(board, use_book=True):
     """
     Returns the optimal action for the current player on the board.
+
+    Utilities are read from the opening book, unless `use_book` is
+    False, and only searched for positions missing from it.
     """
+    global node_count, opening_book
+    node_count = 0
+    if use_book and opening_book is None:
+        opening_book = book.load()
+
     # If game ended, return None
     if terminal(board):
         return None
 
     # Evaluate all possible actions
+    key = board_key(board)
     action_scores = []
     for action in actions(board):
-        action_scores.append((extermum(result(board, action)), action))
+        next_key = GAME.play(*key, 3 * action[0] + action[1])
+        utility = opening_book.utility(*next_key) if use_book else None
+        if utility is None:
+            utility = key_utility(next_key)
+        action_scores.append((utility, action))
 
     # Return action with highest utility for maximizing player, or lowest utility for minimizing player
     action_scores.sort(reverse=(player(board) == X))